@@ -0,0 +1,483 @@
+"""
+Checkpointer of the conversation workflow.
+
+The checkpointer is created once per event loop, either on top of the shared
+Motor client or, with `CHECKPOINTER_BACKEND="sqlite"`, on an embedded SQLite
+database for single-node deployments. It is wrapped in a write-through cache
+of the latest checkpoint of every active thread, so a turn doesn't read and
+deserialize the thread's whole history from the database when this worker
+served the thread recently.
+"""
+
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.mongodb.aio import AsyncMongoDBSaver
+
+from src.application.metrics import metrics
+from src.config import settings
+from .mongo import get_mongo_client
+from .sqlite import CHECKPOINTS_TABLE, close_sqlite_checkpointer, get_sqlite_checkpointer
+
+_checkpointers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, BaseCheckpointSaver]" = (
+    weakref.WeakKeyDictionary()
+)
+_creation_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# Rough per-entry overhead of the cache bookkeeping, in bytes.
+_ENTRY_OVERHEAD = 512
+
+
+@dataclass
+class CachedThread:
+    """Latest checkpoint of a thread, kept serialized."""
+
+    checkpoint_id: str
+    parent_checkpoint_id: str | None
+    checkpoint: tuple[str, bytes]
+    metadata: tuple[str, bytes]
+    # (task_id, idx) -> (task_id, channel, serialized value), keyed like the
+    # stored writes so a write is cached once whether it came from the database
+    # or from `aput_writes`.
+    writes: dict[tuple[str, int], tuple[str, str, tuple[str, bytes]]] = field(
+        default_factory=dict
+    )
+
+    @property
+    def size(self) -> int:
+        return (
+            _ENTRY_OVERHEAD
+            + len(self.checkpoint[1])
+            + len(self.metadata[1])
+            + sum(len(value[1]) for _, _, value in self.writes.values())
+        )
+
+
+class CheckpointCache:
+    """LRU cache of the latest checkpoint per thread, bounded by bytes.
+
+    Entries are stored in their serialized form: it is compact, its size is
+    known exactly, and cached checkpoints can't be mutated by the graph.
+
+    Args:
+        max_bytes: Maximum total size of the cached entries.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[tuple[str, str], CachedThread] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, thread_id: str, checkpoint_ns: str) -> CachedThread | None:
+        entry = self._entries.get((thread_id, checkpoint_ns))
+        if entry is not None:
+            self._entries.move_to_end((thread_id, checkpoint_ns))
+
+        return entry
+
+    def put(self, thread_id: str, checkpoint_ns: str, entry: CachedThread) -> None:
+        self.discard(thread_id, checkpoint_ns)
+        if entry.size > self.max_bytes:
+            return
+
+        self._entries[(thread_id, checkpoint_ns)] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+            metrics.increment("checkpoint_cache.evictions")
+        self._update_gauges()
+
+    def resize(self, thread_id: str, checkpoint_ns: str, old_size: int) -> None:
+        """Account for an entry that changed in place, e.g. got new writes."""
+
+        entry = self._entries[(thread_id, checkpoint_ns)]
+        self.size += entry.size - old_size
+        if entry.size > self.max_bytes:
+            self.discard(thread_id, checkpoint_ns)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+            metrics.increment("checkpoint_cache.evictions")
+        self._update_gauges()
+
+    def discard(self, thread_id: str, checkpoint_ns: str) -> None:
+        entry = self._entries.pop((thread_id, checkpoint_ns), None)
+        if entry is not None:
+            self.size -= entry.size
+            self._update_gauges()
+
+    def invalidate(self, match: Callable[[str], bool]) -> int:
+        """Drop the entries of every thread whose ID matches.
+
+        Returns:
+            int: Number of dropped entries.
+        """
+
+        keys = [key for key in self._entries if match(key[0])]
+        for thread_id, checkpoint_ns in keys:
+            self.discard(thread_id, checkpoint_ns)
+        metrics.increment("checkpoint_cache.invalidations", len(keys))
+
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("checkpoint_cache.bytes", self.size)
+        metrics.set_gauge("checkpoint_cache.entries", len(self._entries))
+
+
+class CachedCheckpointSaver(BaseCheckpointSaver):
+    """Write-through cache in front of another async checkpointer.
+
+    Every write goes to the wrapped checkpointer first and then updates the
+    cached latest checkpoint of the thread. Reads of a thread's latest
+    checkpoint are served from the cache. When `get_latest_checkpoint_id` is
+    given, the cached checkpoint ID is first compared with the latest one in
+    the database, an index-only query that reads no history, so checkpoints
+    written by other workers are never hidden. Without it, the cache is
+    trusted, which is only safe when each thread is served by a single worker.
+
+    Args:
+        checkpointer: Checkpointer the cache writes through to.
+        cache: Cache shared by all the checkpointers of the process.
+        get_latest_checkpoint_id: Returns the ID of the latest stored checkpoint
+            of a (thread ID, namespace) pair, or None if there is none.
+    """
+
+    def __init__(
+        self,
+        checkpointer: BaseCheckpointSaver,
+        cache: CheckpointCache,
+        get_latest_checkpoint_id: Callable[[str, str], Awaitable[str | None]] | None = None,
+    ) -> None:
+        super().__init__(serde=checkpointer.serde)
+        self.checkpointer = checkpointer
+        self.cache = cache
+        self.get_latest_checkpoint_id = get_latest_checkpoint_id
+
+    @property
+    def config_specs(self) -> list:
+        return self.checkpointer.config_specs
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        start = time.perf_counter()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        entry = self.cache.get(thread_id, checkpoint_ns)
+        checkpoint_id = get_checkpoint_id(config)
+        if entry is not None and checkpoint_id in (None, entry.checkpoint_id):
+            if await self._is_latest(thread_id, checkpoint_ns, entry):
+                checkpoint_tuple = self._to_tuple(thread_id, checkpoint_ns, entry)
+                self._record_hit(time.perf_counter() - start)
+                return checkpoint_tuple
+
+            metrics.increment("checkpoint_cache.stale")
+            self.cache.discard(thread_id, checkpoint_ns)
+
+        checkpoint_tuple = await self.checkpointer.aget_tuple(config)
+        metrics.increment("checkpoint_cache.misses")
+        metrics.observe("checkpoint_cache.load_seconds", time.perf_counter() - start)
+
+        if checkpoint_tuple is not None and checkpoint_id is None:
+            self._cache_tuple(thread_id, checkpoint_ns, checkpoint_tuple)
+
+        return checkpoint_tuple
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        async for checkpoint_tuple in self.checkpointer.alist(
+            config, filter=filter, before=before, limit=limit
+        ):
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config = await self.checkpointer.aput(config, checkpoint, metadata, new_versions)
+
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        entry = self.cache.get(thread_id, checkpoint_ns)
+        # Checkpoint IDs increase monotonically: keep whichever is the latest,
+        # like the database does when asked for the latest checkpoint.
+        if entry is None or checkpoint["id"] >= entry.checkpoint_id:
+            self.cache.put(
+                thread_id,
+                checkpoint_ns,
+                CachedThread(
+                    checkpoint_id=checkpoint["id"],
+                    parent_checkpoint_id=config["configurable"].get("checkpoint_id"),
+                    checkpoint=self.serde.dumps_typed(checkpoint),
+                    metadata=self.serde.dumps_typed(metadata),
+                ),
+            )
+
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self.checkpointer.aput_writes(config, writes, task_id, task_path)
+
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        entry = self.cache.get(thread_id, checkpoint_ns)
+        if entry is None or entry.checkpoint_id != config["configurable"]["checkpoint_id"]:
+            return
+
+        # Same semantics as the stored writes: special channels replace earlier
+        # writes, other writes are only inserted once.
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        old_size = entry.size
+        for idx, (channel, value) in enumerate(writes):
+            key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+            if replace or key not in entry.writes:
+                entry.writes[key] = (task_id, channel, self.serde.dumps_typed(value))
+        self.cache.resize(thread_id, checkpoint_ns, old_size)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.checkpointer.adelete_thread(thread_id)
+        self.cache.invalidate(lambda cached_thread_id: cached_thread_id == thread_id)
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.checkpointer.get_tuple(config)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        return self.checkpointer.list(config, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        self.cache.discard(
+            config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns", "")
+        )
+        return self.checkpointer.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.cache.discard(
+            config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns", "")
+        )
+        return self.checkpointer.put_writes(config, writes, task_id, task_path)
+
+    def get_next_version(self, current: Any, channel: None) -> Any:
+        return self.checkpointer.get_next_version(current, channel)
+
+    async def _is_latest(self, thread_id: str, checkpoint_ns: str, entry: CachedThread) -> bool:
+        if self.get_latest_checkpoint_id is None:
+            return True
+
+        return await self.get_latest_checkpoint_id(thread_id, checkpoint_ns) == entry.checkpoint_id
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, entry: CachedThread) -> CheckpointTuple:
+        def get_config(checkpoint_id: str) -> RunnableConfig:
+            return {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            }
+
+        return CheckpointTuple(
+            config=get_config(entry.checkpoint_id),
+            checkpoint=self.serde.loads_typed(entry.checkpoint),
+            metadata=self.serde.loads_typed(entry.metadata),
+            parent_config=(
+                get_config(entry.parent_checkpoint_id) if entry.parent_checkpoint_id else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(value))
+                for task_id, channel, value in entry.writes.values()
+            ],
+        )
+
+    def _cache_tuple(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_tuple: CheckpointTuple
+    ) -> None:
+        parent_config = checkpoint_tuple.parent_config
+        self.cache.put(
+            thread_id,
+            checkpoint_ns,
+            CachedThread(
+                checkpoint_id=checkpoint_tuple.config["configurable"]["checkpoint_id"],
+                parent_checkpoint_id=(
+                    parent_config["configurable"]["checkpoint_id"] if parent_config else None
+                ),
+                checkpoint=self.serde.dumps_typed(checkpoint_tuple.checkpoint),
+                metadata=self.serde.dumps_typed(checkpoint_tuple.metadata),
+                writes=self._cache_writes(checkpoint_tuple.pending_writes or []),
+            ),
+        )
+
+    def _cache_writes(
+        self, pending_writes: Sequence[tuple[str, str, Any]]
+    ) -> dict[tuple[str, int], tuple[str, str, tuple[str, bytes]]]:
+        # Stored writes come back without their index, in index order within
+        # each task: rebuild it the way `aput_writes` computes it.
+        writes = {}
+        task_counts: dict[str, int] = {}
+        for task_id, channel, value in pending_writes:
+            if channel in WRITES_IDX_MAP:
+                idx = WRITES_IDX_MAP[channel]
+            else:
+                idx = task_counts.get(task_id, 0)
+                task_counts[task_id] = idx + 1
+            writes[(task_id, idx)] = (task_id, channel, self.serde.dumps_typed(value))
+
+        return writes
+
+    def _record_hit(self, seconds: float) -> None:
+        metrics.increment("checkpoint_cache.hits")
+        metrics.observe("checkpoint_cache.hit_seconds", seconds)
+
+        load_seconds = metrics.histogram("checkpoint_cache.load_seconds")
+        if load_seconds.count:
+            saved_seconds = load_seconds.total / load_seconds.count - seconds
+            metrics.increment("checkpoint_cache.saved_seconds", max(0.0, saved_seconds))
+
+
+@lru_cache(maxsize=1)
+def get_checkpoint_cache() -> CheckpointCache:
+    """
+    Get the checkpoint cache shared by every request of the process.
+    """
+    return CheckpointCache(max_bytes=settings.CHECKPOINT_CACHE_MAX_BYTES)
+
+
+@asynccontextmanager
+async def get_checkpointer() -> AsyncIterator[BaseCheckpointSaver]:
+    """
+    Get the checkpointer bound to the running event loop.
+
+    The checkpointer and its client are shared by every request on the loop
+    and stay open when the context exits.
+    """
+    loop = asyncio.get_running_loop()
+    checkpointer = _checkpointers.get(loop)
+    if checkpointer is None:
+        # Concurrent first requests wait for the same checkpointer to be built.
+        async with _creation_locks.setdefault(loop, asyncio.Lock()):
+            checkpointer = _checkpointers.get(loop)
+            if checkpointer is None:
+                checkpointer = await _build_checkpointer()
+                _checkpointers[loop] = checkpointer
+
+    yield checkpointer
+
+
+async def close_checkpointer() -> None:
+    """
+    Close the checkpointer of the running event loop, e.g. on shutdown.
+
+    Pending SQLite writes are committed. The Mongo client stays open.
+    """
+    _checkpointers.pop(asyncio.get_running_loop(), None)
+    await close_sqlite_checkpointer()
+
+
+async def _build_checkpointer() -> BaseCheckpointSaver:
+    backend = settings.CHECKPOINTER_BACKEND
+    if backend == "mongo":
+        checkpointer = AsyncMongoDBSaver(
+            get_mongo_client(),
+            db_name=settings.MONGO_DB_NAME,
+            checkpoint_collection_name=settings.MONGO_STATE_CHECKPOINT_COLLECTION,
+            writes_collection_name=settings.MONGO_STATE_WRITES_COLLECTION,
+        )
+
+        async def get_latest_checkpoint_id(thread_id: str, checkpoint_ns: str) -> str | None:
+            # Covered by the (thread_id, checkpoint_ns, checkpoint_id) index.
+            doc = await checkpointer.checkpoint_collection.find_one(
+                {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns},
+                {"checkpoint_id": 1, "_id": 0},
+                sort=[("checkpoint_id", -1)],
+            )
+            return doc["checkpoint_id"] if doc else None
+
+    elif backend == "sqlite":
+        checkpointer = await get_sqlite_checkpointer()
+
+        async def get_latest_checkpoint_id(thread_id: str, checkpoint_ns: str) -> str | None:
+            # Covered by the (thread_id, checkpoint_ns, checkpoint_id) primary key.
+            async with checkpointer.lock, checkpointer.conn.execute(
+                f"SELECT checkpoint_id FROM {CHECKPOINTS_TABLE} "
+                "WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ) as cursor:
+                row = await cursor.fetchone()
+            return row[0] if row else None
+
+    else:
+        raise ValueError(f"Unknown checkpointer backend: {backend}")
+
+    if not settings.CHECKPOINT_CACHE_ENABLED:
+        return checkpointer
+
+    validation = settings.CHECKPOINT_CACHE_VALIDATION
+    if validation not in ("version", "none"):
+        raise ValueError(f"Unknown checkpoint cache validation: {validation}")
+
+    return CachedCheckpointSaver(
+        checkpointer,
+        cache=get_checkpoint_cache(),
+        get_latest_checkpoint_id=get_latest_checkpoint_id if validation == "version" else None,
+    )
@@ -0,0 +1,251 @@
+"""
+Bulk export of the conversation histories for analytics.
+
+Each exported record is the latest state of one thread: its messages, summary
+and agent, as one JSON line. Threads are exported in `thread_id` order. The
+latest checkpoint of every thread is found through the `thread_id` index, one
+index entry per thread, and streamed in batches with only its serialized state
+(no metadata, no pending writes), which is decoded as each record is written.
+The checkpoints are read past the checkpoint cache, which is kept for the
+threads being played.
+
+Every record carries a cursor token. Passing the token of the last received
+record resumes the export right after that thread.
+"""
+
+import base64
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, NamedTuple
+
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.base.id import UUID
+
+from src.config import settings
+from .checkpointer import CachedCheckpointSaver, get_checkpointer
+from .mongo import CHECKPOINT_INDEX, get_mongo_database
+from .reset_conversation import get_thread_clause, get_thread_filter
+from .sqlite import CHECKPOINTS_TABLE, get_sqlite_checkpointer
+
+# 100-ns intervals between the UUID epoch, 1582-10-15, and the Unix epoch.
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+class _LatestCheckpoint(NamedTuple):
+    thread_id: str
+    checkpoint_id: str
+    # Serialized checkpoint, as (type, bytes) for the saver's serde.
+    checkpoint: tuple[str, bytes]
+
+
+async def export_conversations(
+    agent_id: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Stream the latest message history of every matching thread.
+
+    Args:
+        agent_id (str | None): Only export the agent's threads
+        since (datetime | None): Only export threads last updated at or after this time
+        until (datetime | None): Only export threads last updated before this time
+        cursor (str | None): Cursor token of the last record of a previous export
+
+    Yields:
+        dict: One record per thread
+
+    Raises:
+        ValueError: If the cursor token is invalid
+    """
+    after_thread_id = decode_cursor(cursor) if cursor else None
+    until_checkpoint_id = get_checkpoint_id_bound(until) if until else None
+
+    async with get_checkpointer() as checkpointer:
+        # A bulk read would evict the hot threads from the cache.
+        if isinstance(checkpointer, CachedCheckpointSaver):
+            checkpointer = checkpointer.checkpointer
+
+        async for latest in _iter_latest_checkpoints(
+            agent_id=agent_id,
+            since_checkpoint_id=get_checkpoint_id_bound(since) if since else None,
+            after_thread_id=after_thread_id,
+        ):
+            if until_checkpoint_id is not None and latest.checkpoint_id >= until_checkpoint_id:
+                continue
+
+            checkpoint = checkpointer.serde.loads_typed(latest.checkpoint)
+            yield _to_record(latest.thread_id, latest.checkpoint_id, checkpoint["channel_values"])
+
+
+async def encode_ndjson(records: AsyncIterator[dict], compress: bool = False) -> AsyncIterator[bytes]:
+    """
+    Encode records as NDJSON, optionally as a gzip stream, chunk by chunk.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    async for record in records:
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode()
+        if compressor is None:
+            yield line
+        else:
+            chunk = compressor.compress(line)
+            if chunk:
+                yield chunk
+
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def encode_cursor(thread_id: str) -> str:
+    payload = json.dumps({"thread_id": thread_id}).encode()
+
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return json.loads(payload)["thread_id"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid export cursor: {cursor}") from e
+
+
+def get_checkpoint_time(checkpoint_id: str) -> datetime:
+    """
+    Time a checkpoint was written at, decoded from its time-ordered UUIDv6 ID.
+    """
+    timestamp = UUID(checkpoint_id).time - _UUID_EPOCH_OFFSET
+
+    return datetime.fromtimestamp(timestamp / 10_000_000, tz=timezone.utc)
+
+
+def get_checkpoint_id_bound(moment: datetime) -> str:
+    """
+    Smallest checkpoint ID written at `moment`.
+
+    UUIDv6 IDs start with their timestamp, so they sort by time as strings and
+    time ranges become ID ranges. Naive datetimes are taken as UTC.
+    """
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    delta = moment - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    timestamp = (
+        delta.days * 86_400 * 10_000_000
+        + delta.seconds * 10_000_000
+        + delta.microseconds * 10
+        + _UUID_EPOCH_OFFSET
+    )
+
+    uuid_int = ((timestamp >> 12) & 0xFFFFFFFFFFFF) << 80
+    uuid_int |= (timestamp & 0x0FFF) << 64
+
+    return str(UUID(int=uuid_int, version=6))
+
+
+async def _iter_latest_checkpoints(
+    agent_id: str | None,
+    since_checkpoint_id: str | None,
+    after_thread_id: str | None,
+) -> AsyncIterator[_LatestCheckpoint]:
+    if settings.CHECKPOINTER_BACKEND == "sqlite":
+        iterator = _iter_latest_sqlite_checkpoints
+    else:
+        iterator = _iter_latest_mongo_checkpoints
+
+    async for latest in iterator(agent_id, since_checkpoint_id, after_thread_id):
+        yield latest
+
+
+async def _iter_latest_mongo_checkpoints(
+    agent_id: str | None,
+    since_checkpoint_id: str | None,
+    after_thread_id: str | None,
+) -> AsyncIterator[_LatestCheckpoint]:
+    conditions = [{"checkpoint_ns": ""}]
+    if agent_id is not None:
+        conditions.append(get_thread_filter(agent_id=agent_id))
+    if after_thread_id is not None:
+        conditions.append({"thread_id": {"$gt": after_thread_id}})
+    # A thread whose latest checkpoint is older has no checkpoint left in the scan.
+    if since_checkpoint_id is not None:
+        conditions.append({"checkpoint_id": {"$gte": since_checkpoint_id}})
+
+    # Sorted like the (thread_id, checkpoint_ns, checkpoint_id) index, the
+    # first checkpoint of each thread is its latest one, which lets the server
+    # jump from thread to thread in the index instead of scanning every key.
+    # Only the serialized state of that checkpoint is carried along.
+    pipeline = [
+        {"$match": {"$and": conditions}},
+        {"$sort": dict(CHECKPOINT_INDEX)},
+        {"$project": {"_id": 0, "thread_id": 1, "checkpoint_id": 1, "type": 1, "checkpoint": 1}},
+        {
+            "$group": {
+                "_id": "$thread_id",
+                "checkpoint_id": {"$first": "$checkpoint_id"},
+                "type": {"$first": "$type"},
+                "checkpoint": {"$first": "$checkpoint"},
+            }
+        },
+        {"$sort": {"_id": 1}},
+    ]
+    cursor = get_mongo_database()[settings.MONGO_STATE_CHECKPOINT_COLLECTION].aggregate(
+        pipeline, allowDiskUse=True, batchSize=settings.CONVERSATION_EXPORT_BATCH_SIZE
+    )
+
+    async for doc in cursor:
+        yield _LatestCheckpoint(doc["_id"], doc["checkpoint_id"], (doc["type"], doc["checkpoint"]))
+
+
+async def _iter_latest_sqlite_checkpoints(
+    agent_id: str | None,
+    since_checkpoint_id: str | None,
+    after_thread_id: str | None,
+) -> AsyncIterator[_LatestCheckpoint]:
+    checkpointer = await get_sqlite_checkpointer()
+    clause, params = get_thread_clause(agent_id=agent_id) if agent_id else ("1 = 1", ())
+    if since_checkpoint_id is not None:
+        clause, params = f"{clause} AND checkpoint_id >= ?", (*params, since_checkpoint_id)
+
+    # Keyset pagination on the primary key, so the saver's lock is only held
+    # for one page at a time. With MAX(), SQLite takes the bare columns from
+    # the row holding the maximum, i.e. the latest checkpoint.
+    while True:
+        async with checkpointer.lock, checkpointer.conn.execute(
+            f"SELECT thread_id, MAX(checkpoint_id), type, checkpoint FROM {CHECKPOINTS_TABLE} "
+            f"WHERE checkpoint_ns = '' AND thread_id > ? AND {clause} "
+            "GROUP BY thread_id ORDER BY thread_id LIMIT ?",
+            (after_thread_id or "", *params, settings.CONVERSATION_EXPORT_BATCH_SIZE),
+        ) as cursor:
+            rows = await cursor.fetchall()
+
+        for thread_id, checkpoint_id, type_, checkpoint in rows:
+            yield _LatestCheckpoint(thread_id, checkpoint_id, (type_, checkpoint))
+
+        if len(rows) < settings.CONVERSATION_EXPORT_BATCH_SIZE:
+            return
+        after_thread_id = rows[-1][0]
+
+
+def _to_record(thread_id: str, checkpoint_id: str, values: dict) -> dict:
+    return {
+        "thread_id": thread_id,
+        "checkpoint_id": checkpoint_id,
+        "updated_at": get_checkpoint_time(checkpoint_id).isoformat(),
+        "agent_id": values.get("agent_id"),
+        "agent_name": values.get("agent_name"),
+        "player_id": values.get("player_id") or None,
+        "summary": values.get("summary") or None,
+        "messages": [_to_message_record(message) for message in values.get("messages", [])],
+        "cursor": encode_cursor(thread_id),
+    }
+
+
+def _to_message_record(message: BaseMessage) -> dict:
+    record = {"type": message.type, "content": message.content}
+    if message.name:
+        record["name"] = message.name
+
+    return record
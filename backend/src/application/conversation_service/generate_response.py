@@ -4,9 +4,8 @@ from typing import Union, Any, AsyncGenerator
 from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
 from opik.integrations.langchain import OpikTracer
 
+from .checkpointer import get_checkpointer
 from .workflow import AgentState, create_workflow_graph
-from src.config import settings
-from langgraph.checkpoint.mongodb.aio import AsyncMongoDBSaver
 
 
 
@@ -18,6 +17,7 @@ async def get_response(
     agent_perspective: str,
     agent_style: str,
     agent_context: str,
+    player_id: str | None = None,
     new_thread: bool = False,
 ) -> tuple[str, AgentState]:
     """Run a conversation through the workflow graph.
@@ -29,6 +29,8 @@ async def get_response(
         agent_perspective: agent's perspective on the topic.
         agent_style: Style of conversation (e.g., "Socratic").
         agent_context: Additional context about the agent.
+        player_id: Player talking to the agent. Each player gets their own thread.
+        new_thread: Whether to create a new conversation thread.
 
     Returns:
         tuple[str, agentState]: A tuple containing:
@@ -42,18 +44,11 @@ async def get_response(
     graph_builder = create_workflow_graph()
 
     try:
-        async with AsyncMongoDBSaver.from_conn_string(
-            conn_string=settings.MONGO_URI,
-            db_name=settings.MONGO_DB_NAME,
-            checkpoint_collection_name=settings.MONGO_STATE_CHECKPOINT_COLLECTION,
-            writes_collection_name=settings.MONGO_STATE_WRITES_COLLECTION,
-        ) as checkpointer:            
+        async with get_checkpointer() as checkpointer:
             graph = graph_builder.compile(checkpointer=checkpointer)
             opik_tracer = OpikTracer(graph=graph.get_graph(xray=True))
 
-            thread_id = (
-                agent_id if not new_thread else f"{agent_id}-{uuid.uuid4()}"
-            )
+            thread_id = get_thread_id(agent_id, player_id, new_thread=new_thread)
             config = {
                 "configurable": {"thread_id": thread_id},
                 "callbacks": [opik_tracer],
@@ -61,6 +56,8 @@ async def get_response(
             output_state = await graph.ainvoke(
                 input={
                     "messages": __format_messages(messages=messages),
+                    "agent_id": agent_id,
+                    "player_id": player_id or "",
                     "agent_name": agent_name,
                     "agent_perspective": agent_perspective,
                     "agent_style": agent_style,
@@ -80,6 +77,7 @@ async def get_streaming_response(
     agent_perspective: str,
     agent_style: str,
     agent_context: str,
+    player_id: str | None = None,
     new_thread: bool = False,
 ) -> AsyncGenerator[str, None]:
     """Run a conversation through the workflow graph with streaming response.
@@ -91,6 +89,7 @@ async def get_streaming_response(
         agent_perspective: agent's perspective on the topic.
         agent_style: Style of conversation (e.g., "Socratic").
         agent_context: Additional context about the agent.
+        player_id: Player talking to the agent. Each player gets their own thread.
         new_thread: Whether to create a new conversation thread.
 
     Yields:
@@ -102,19 +101,12 @@ async def get_streaming_response(
     graph_builder = create_workflow_graph()
 
     try:
-        async with AsyncMongoDBSaver.from_conn_string(
-            conn_string=settings.MONGO_URI,
-            db_name=settings.MONGO_DB_NAME,
-            checkpoint_collection_name=settings.MONGO_STATE_CHECKPOINT_COLLECTION,
-            writes_collection_name=settings.MONGO_STATE_WRITES_COLLECTION,
-        ) as checkpointer:
+        async with get_checkpointer() as checkpointer:
             # Set up the database tables if they don't exist            
             graph = graph_builder.compile(checkpointer=checkpointer)
             opik_tracer = OpikTracer(graph=graph.get_graph(xray=True))
 
-            thread_id = (
-                agent_id if not new_thread else f"{agent_id}-{uuid.uuid4()}"
-            )
+            thread_id = get_thread_id(agent_id, player_id, new_thread=new_thread)
             config = {
                 "configurable": {"thread_id": thread_id},
                 "callbacks": [opik_tracer],
@@ -123,6 +115,8 @@ async def get_streaming_response(
             async for chunk in graph.astream(
                 input={
                     "messages": __format_messages(messages=messages),
+                    "agent_id": agent_id,
+                    "player_id": player_id or "",
                     "agent_name": agent_name,
                     "agent_perspective": agent_perspective,
                     "agent_style": agent_style,
@@ -142,6 +136,32 @@ async def get_streaming_response(
         ) from e
 
 
+def get_thread_id(agent_id: str, player_id: str | None = None, new_thread: bool = False) -> str:
+    """Build the checkpoint thread ID of a player's session with an agent.
+
+    Sessions are keyed by agent and player, so each player has their own
+    checkpoint chain and summary, and checkpoints spread over many threads
+    (and shards) instead of piling up on one thread per agent. Without a player
+    ID the agent's shared thread is used. Every thread ID of an agent starts
+    with `{agent_id}-`, apart from the shared one, so an agent's conversations
+    can be reset by prefix.
+
+    Args:
+        agent_id: Unique identifier for the agent.
+        player_id: Player talking to the agent.
+        new_thread: Whether to start a new thread instead of resuming the session.
+
+    Returns:
+        str: The thread ID.
+    """
+
+    thread_id = agent_id if player_id is None else f"{agent_id}-{player_id}"
+    if new_thread:
+        thread_id = f"{thread_id}-{uuid.uuid4()}"
+
+    return thread_id
+
+
 def __format_messages(
     messages: Union[str, list[dict[str, Any]]],
 ) -> list[Union[HumanMessage, AIMessage]]:
@@ -0,0 +1,79 @@
+"""
+Shared MongoDB client for the conversation state.
+
+Like the Qdrant clients, the Motor client is created once per event loop, so
+every request reuses the same connection pool instead of connecting per call.
+
+Checkpoints are partitioned by thread, and threads are per player session, so
+on a sharded cluster the checkpoint collections are sharded on a hash of
+`thread_id` to spread sessions evenly over the shards.
+"""
+
+import asyncio
+import weakref
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+from src.config import settings
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncIOMotorClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# Same indexes as the ones `AsyncMongoDBSaver` creates on first use, so they can
+# be recreated right after a collection is dropped. Both start with `thread_id`,
+# so lookups by thread id and by anchored thread-id prefix use them too.
+CHECKPOINT_INDEX = [("thread_id", 1), ("checkpoint_ns", 1), ("checkpoint_id", -1)]
+WRITES_INDEX = CHECKPOINT_INDEX + [("task_id", 1), ("idx", 1)]
+
+
+def get_mongo_client() -> AsyncIOMotorClient:
+    """
+    Get the Motor client bound to the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncIOMotorClient(settings.MONGO_URI)
+        _clients[loop] = client
+
+    return client
+
+
+def get_mongo_database() -> AsyncIOMotorDatabase:
+    return get_mongo_client()[settings.MONGO_DB_NAME]
+
+
+async def ensure_conversation_indexes() -> None:
+    """
+    Create the thread-id indexes of the checkpoint collections if missing.
+    """
+    db = get_mongo_database()
+    await asyncio.gather(
+        db[settings.MONGO_STATE_CHECKPOINT_COLLECTION].create_index(
+            CHECKPOINT_INDEX, unique=True
+        ),
+        db[settings.MONGO_STATE_WRITES_COLLECTION].create_index(WRITES_INDEX, unique=True),
+    )
+
+
+async def shard_conversation_collections() -> None:
+    """
+    Shard the checkpoint collections on a hash of `thread_id`.
+
+    Requires a connection to a `mongos` router. The unique thread indexes start
+    with the shard key field, so they remain valid once sharded.
+    """
+    admin = get_mongo_client().admin
+    await ensure_conversation_indexes()
+    await admin.command("enableSharding", settings.MONGO_DB_NAME)
+    collection_names = (
+        settings.MONGO_STATE_CHECKPOINT_COLLECTION,
+        settings.MONGO_STATE_WRITES_COLLECTION,
+    )
+    for name in collection_names:
+        await admin.command(
+            "shardCollection",
+            f"{settings.MONGO_DB_NAME}.{name}",
+            key={"thread_id": "hashed"},
+        )
@@ -1,115 +1,458 @@
 """
-Reset conversation state functionality for clearing MongoDB checkpoints
+Reset conversation state functionality for clearing the stored checkpoints.
+
+Only the checkpoint and writes collections are keyed by `thread_id`, so only
+those are cleared. On MongoDB both are cleared concurrently through the shared
+Motor client. A full wipe drops and recreates the collections, which takes
+constant time, while thread and thread-prefix deletions go through the
+`thread_id` indexes. With the SQLite backend the same operations run on the
+`checkpoints` and `writes` tables, through their primary keys, which start
+with `thread_id`. Large deletions can also run as background jobs that report
+their progress.
 """
 
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable
+
+from src.application.metrics import metrics
 from src.config import settings
+from .checkpointer import get_checkpoint_cache
+from .mongo import (
+    ensure_conversation_indexes,
+    get_mongo_database,
+    shard_conversation_collections,
+)
+from .sqlite import CHECKPOINTS_TABLE, WRITES_TABLE, get_prefix_range, get_sqlite_checkpointer
+
+CONVERSATION_COLLECTIONS = (
+    settings.MONGO_STATE_CHECKPOINT_COLLECTION,
+    settings.MONGO_STATE_WRITES_COLLECTION,
+)
+CONVERSATION_TABLES = (CHECKPOINTS_TABLE, WRITES_TABLE)
+
+# Finished jobs kept for status queries.
+_MAX_FINISHED_JOBS = 100
+
+
+def get_conversation_collections() -> tuple[str, str]:
+    """
+    Names of the collections, or tables, holding the conversations of the configured backend.
+    """
+    if settings.CHECKPOINTER_BACKEND == "sqlite":
+        return CONVERSATION_TABLES
+
+    return CONVERSATION_COLLECTIONS
 
 
 async def reset_conversation_state() -> dict:
     """
-    Deletes all conversation checkpoints from MongoDB.
-    
+    Deletes all conversation checkpoints.
+
+    On MongoDB the collections are dropped and their indexes recreated, instead
+    of deleting documents one by one. Sharded collections are sharded again.
+
     Returns:
         dict: Summary of deleted data with counts
     """
     try:
-        # Connect to MongoDB
-        client = AsyncIOMotorClient(settings.MONGO_URI)
-        db = client[settings.MONGO_DB_NAME]
-        
-        # Use the correct collection names from settings
-        collections_to_clear = [
-            settings.MONGO_STATE_CHECKPOINT_COLLECTION,  # "agent_state_checkpoints"
-            settings.MONGO_STATE_WRITES_COLLECTION,      # "agent_state_writes"
-            settings.MONGO_LONG_TERM_MEMORY_COLLECTION   # "agent_long_term_memory"
-        ]
-        
-        deletion_summary = {}
-        total_deleted = 0
-        
-        for collection_name in collections_to_clear:
-            collection = db[collection_name]
-            
-            # Count documents before deletion
-            count_before = await collection.count_documents({})
-            
-            # Delete all documents in the collection
-            result = await collection.delete_many({})
-            
-            deletion_summary[collection_name] = {
-                "documents_before": count_before,
-                "documents_deleted": result.deleted_count
-            }
-            
-            total_deleted += result.deleted_count
-        
-        # Close the connection
-        client.close()
-        
-        return {
-            "success": True,
-            "message": f"Successfully deleted {total_deleted} checkpoint documents",
-            "details": deletion_summary
-        }
-        
+        if settings.CHECKPOINTER_BACKEND == "sqlite":
+            counts = await _clear_sqlite_tables()
+            get_checkpoint_cache().clear()
+            return _summarize_reset(dict(zip(CONVERSATION_TABLES, counts)))
+
+        db = get_mongo_database()
+
+        # Collection metadata only: no scan of the documents.
+        counts = await asyncio.gather(
+            *(db[name].estimated_document_count() for name in CONVERSATION_COLLECTIONS)
+        )
+        await asyncio.gather(*(db.drop_collection(name) for name in CONVERSATION_COLLECTIONS))
+        get_checkpoint_cache().clear()
+        await ensure_conversation_indexes()
+        if settings.MONGO_SHARD_CONVERSATIONS:
+            await shard_conversation_collections()
+
+        return _summarize_reset(dict(zip(CONVERSATION_COLLECTIONS, counts)))
+
     except Exception as e:
         return {
             "success": False,
             "message": f"Error resetting conversation state: {str(e)}",
-            "details": {}
+            "details": {},
         }
 
 
+def _summarize_reset(counts: dict[str, int]) -> dict:
+    deletion_summary = {
+        name: {"documents_before": count, "documents_deleted": count}
+        for name, count in counts.items()
+    }
+    total_deleted = sum(counts.values())
+    metrics.increment("conversation_reset.documents_deleted", total_deleted)
+
+    return {
+        "success": True,
+        "message": f"Successfully deleted {total_deleted} checkpoint documents",
+        "details": deletion_summary,
+    }
+
+
 async def reset_specific_conversation(thread_id: str) -> dict:
     """
     Deletes checkpoints for a specific conversation thread.
-    
+
     Args:
         thread_id (str): The thread ID to delete
-        
+
     Returns:
         dict: Summary of deleted data
     """
+    return await _reset_matching(f"thread {thread_id}", thread_id=thread_id)
+
+
+async def reset_conversations_with_prefix(prefix: str) -> dict:
+    """
+    Deletes checkpoints for every conversation thread whose ID starts with `prefix`.
+
+    Args:
+        prefix (str): The thread ID prefix
+
+    Returns:
+        dict: Summary of deleted data
+    """
+    return await _reset_matching(f"threads starting with '{prefix}'", prefix=prefix)
+
+
+async def reset_agent_conversations(agent_id: str) -> dict:
+    """
+    Deletes checkpoints for an agent's main thread and its `{agent_id}-{uuid}` threads.
+
+    Args:
+        agent_id (str): The agent ID
+
+    Returns:
+        dict: Summary of deleted data
+    """
+    return await _reset_matching(f"agent {agent_id}", agent_id=agent_id)
+
+
+def get_thread_filter(
+    thread_id: str | None = None,
+    prefix: str | None = None,
+    agent_id: str | None = None,
+) -> dict:
+    """
+    Build the query matching the checkpoints of one thread, a thread-id prefix or an agent.
+
+    Prefixes are matched with an anchored, case-sensitive regex, which MongoDB
+    turns into a range scan of the `thread_id` index.
+    """
+    if thread_id is not None:
+        return {"thread_id": thread_id}
+    if prefix is not None:
+        return {"thread_id": {"$regex": f"^{re.escape(prefix)}"}}
+    if agent_id is not None:
+        return {
+            "$or": [
+                {"thread_id": agent_id},
+                {"thread_id": {"$regex": f"^{re.escape(agent_id)}-"}},
+            ]
+        }
+
+    raise ValueError("One of thread_id, prefix or agent_id is required.")
+
+
+def get_thread_clause(
+    thread_id: str | None = None,
+    prefix: str | None = None,
+    agent_id: str | None = None,
+) -> tuple[str, tuple[str, ...]]:
+    """
+    Build the SQL counterpart of `get_thread_filter`, as a WHERE clause and its parameters.
+
+    Prefixes are matched with a range of thread IDs, which SQLite scans on the
+    primary key.
+    """
+    if thread_id is not None:
+        return "thread_id = ?", (thread_id,)
+    if prefix is not None:
+        if not prefix:
+            return "1 = 1", ()
+        return _get_prefix_clause(prefix)
+    if agent_id is not None:
+        prefix_clause, prefix_params = _get_prefix_clause(f"{agent_id}-")
+        return f"(thread_id = ? OR ({prefix_clause}))", (agent_id, *prefix_params)
+
+    raise ValueError("One of thread_id, prefix or agent_id is required.")
+
+
+def _get_prefix_clause(prefix: str) -> tuple[str, tuple[str, ...]]:
+    lower, upper = get_prefix_range(prefix)
+    if upper is None:
+        return "thread_id >= ?", (lower,)
+
+    return "thread_id >= ? AND thread_id < ?", (lower, upper)
+
+
+def get_thread_matcher(
+    thread_id: str | None = None,
+    prefix: str | None = None,
+    agent_id: str | None = None,
+) -> Callable[[str], bool]:
+    """
+    Build the in-memory counterpart of `get_thread_filter`, e.g. to invalidate cached threads.
+    """
+    if thread_id is not None:
+        return lambda other_thread_id: other_thread_id == thread_id
+    if prefix is not None:
+        return lambda other_thread_id: other_thread_id.startswith(prefix)
+    if agent_id is not None:
+        return lambda other_thread_id: (
+            other_thread_id == agent_id or other_thread_id.startswith(f"{agent_id}-")
+        )
+
+    raise ValueError("One of thread_id, prefix or agent_id is required.")
+
+
+async def _reset_matching(description: str, **scope: str) -> dict:
     try:
-        # Connect to MongoDB
-        client = AsyncIOMotorClient(settings.MONGO_URI)
-        db = client[settings.MONGO_DB_NAME]
-        
-        collections_to_clear = [
-            settings.MONGO_STATE_CHECKPOINT_COLLECTION,
-            settings.MONGO_STATE_WRITES_COLLECTION,
-            settings.MONGO_LONG_TERM_MEMORY_COLLECTION
-        ]
-        
-        deletion_summary = {}
-        total_deleted = 0
-        
-        for collection_name in collections_to_clear:
-            collection = db[collection_name]
-            
-            # Delete documents for this specific thread
-            result = await collection.delete_many({"thread_id": thread_id})
-            
-            deletion_summary[collection_name] = {
-                "documents_deleted": result.deleted_count
+        if settings.CHECKPOINTER_BACKEND == "sqlite":
+            clause, params = get_thread_clause(**scope)
+            deleted = {
+                name: await _delete_sqlite_rows(name, clause, params)
+                for name in CONVERSATION_TABLES
+            }
+        else:
+            db = get_mongo_database()
+            query = get_thread_filter(**scope)
+            results = await asyncio.gather(
+                *(db[name].delete_many(query) for name in CONVERSATION_COLLECTIONS)
+            )
+            deleted = {
+                name: result.deleted_count
+                for name, result in zip(CONVERSATION_COLLECTIONS, results)
             }
-            
-            total_deleted += result.deleted_count
-        
-        # Close the connection
-        client.close()
-        
+        get_checkpoint_cache().invalidate(get_thread_matcher(**scope))
+
+        deletion_summary = {name: {"documents_deleted": count} for name, count in deleted.items()}
+        total_deleted = sum(deleted.values())
+        metrics.increment("conversation_reset.documents_deleted", total_deleted)
+
         return {
             "success": True,
-            "message": f"Successfully deleted {total_deleted} documents for thread {thread_id}",
-            "details": deletion_summary
+            "message": f"Successfully deleted {total_deleted} documents for {description}",
+            "details": deletion_summary,
         }
-        
+
     except Exception as e:
         return {
             "success": False,
-            "message": f"Error resetting thread {thread_id}: {str(e)}",
-            "details": {}
+            "message": f"Error resetting {description}: {str(e)}",
+            "details": {},
         }
+
+
+@dataclass
+class ResetJob:
+    """Progress of a conversation reset running in the background."""
+
+    id: str
+    scope: dict[str, str | None] | None
+    match: Callable[[str], bool] | None = field(default=None, repr=False)
+    status: str = "pending"
+    documents_total: dict[str, int] = field(default_factory=dict)
+    documents_deleted: dict[str, int] = field(default_factory=dict)
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+    def to_dict(self) -> dict:
+        total = sum(self.documents_total.values())
+        deleted = sum(self.documents_deleted.values())
+
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "scope": "all" if self.scope is None else "matching",
+            "documents_total": total,
+            "documents_deleted": deleted,
+            "progress": min(1.0, deleted / total) if total else float(self.status == "completed"),
+            "details": {
+                name: {
+                    "documents_total": self.documents_total.get(name, 0),
+                    "documents_deleted": self.documents_deleted.get(name, 0),
+                }
+                for name in get_conversation_collections()
+            },
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+_jobs: dict[str, ResetJob] = {}
+_job_tasks: dict[str, asyncio.Task] = {}
+
+
+def start_reset_job(
+    thread_id: str | None = None,
+    prefix: str | None = None,
+    agent_id: str | None = None,
+) -> ResetJob:
+    """
+    Start resetting conversations in the background.
+
+    Without a thread ID, prefix or agent ID every conversation is reset. Matching
+    documents, or rows, are deleted in batches of `settings.MONGO_RESET_BATCH_SIZE`
+    so the job reports its progress and never holds a long-running delete.
+    Jobs live in the memory of the worker that started them.
+
+    Returns:
+        ResetJob: The started job
+    """
+    if thread_id is None and prefix is None and agent_id is None:
+        job = ResetJob(id=str(uuid.uuid4()), scope=None)
+    else:
+        scope = {"thread_id": thread_id, "prefix": prefix, "agent_id": agent_id}
+        job = ResetJob(id=str(uuid.uuid4()), scope=scope, match=get_thread_matcher(**scope))
+
+    _jobs[job.id] = job
+    _job_tasks[job.id] = asyncio.create_task(_run_reset_job(job))
+    _prune_jobs()
+
+    return job
+
+
+def get_reset_job(job_id: str) -> ResetJob | None:
+    return _jobs.get(job_id)
+
+
+def list_reset_jobs() -> list[ResetJob]:
+    return sorted(_jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+
+async def _run_reset_job(job: ResetJob) -> None:
+    job.status = "running"
+    try:
+        if job.scope is None:
+            result = await reset_conversation_state()
+            if not result["success"]:
+                raise RuntimeError(result["message"])
+            for name, counts in result["details"].items():
+                job.documents_total[name] = counts["documents_before"]
+                job.documents_deleted[name] = counts["documents_deleted"]
+        elif settings.CHECKPOINTER_BACKEND == "sqlite":
+            clause, params = get_thread_clause(**job.scope)
+            for name in CONVERSATION_TABLES:
+                job.documents_total[name] = await _count_sqlite_rows(name, clause, params)
+            for name in CONVERSATION_TABLES:
+                await _delete_sqlite_rows_in_batches(job, name, clause, params)
+            get_checkpoint_cache().invalidate(job.match)
+        else:
+            db = get_mongo_database()
+            query = get_thread_filter(**job.scope)
+            totals = await asyncio.gather(
+                *(db[name].count_documents(query) for name in CONVERSATION_COLLECTIONS)
+            )
+            job.documents_total = dict(zip(CONVERSATION_COLLECTIONS, totals))
+            await asyncio.gather(
+                *(_delete_in_batches(job, name, query) for name in CONVERSATION_COLLECTIONS)
+            )
+            get_checkpoint_cache().invalidate(job.match)
+
+        job.status = "completed"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+        _job_tasks.pop(job.id, None)
+
+
+async def _delete_in_batches(job: ResetJob, collection_name: str, query: dict) -> None:
+    collection = get_mongo_database()[collection_name]
+    job.documents_deleted[collection_name] = 0
+
+    while True:
+        batch = (
+            await collection.find(query, {"_id": 1})
+            .limit(settings.MONGO_RESET_BATCH_SIZE)
+            .to_list(length=None)
+        )
+        if not batch:
+            return
+
+        result = await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+        job.documents_deleted[collection_name] += result.deleted_count
+        metrics.increment("conversation_reset.documents_deleted", result.deleted_count)
+
+
+async def _delete_sqlite_rows_in_batches(
+    job: ResetJob, table: str, clause: str, params: tuple[str, ...]
+) -> None:
+    job.documents_deleted[table] = 0
+
+    while True:
+        deleted = await _delete_sqlite_rows(
+            table, clause, params, limit=settings.MONGO_RESET_BATCH_SIZE
+        )
+        if not deleted:
+            return
+
+        job.documents_deleted[table] += deleted
+        metrics.increment("conversation_reset.documents_deleted", deleted)
+
+
+async def _count_sqlite_rows(table: str, clause: str, params: tuple[str, ...]) -> int:
+    checkpointer = await get_sqlite_checkpointer()
+    async with checkpointer.lock, checkpointer.conn.execute(
+        f"SELECT COUNT(*) FROM {table} WHERE {clause}", params
+    ) as cursor:
+        (count,) = await cursor.fetchone()
+
+    return count
+
+
+async def _delete_sqlite_rows(
+    table: str, clause: str, params: tuple[str, ...], limit: int | None = None
+) -> int:
+    checkpointer = await get_sqlite_checkpointer()
+    query = f"DELETE FROM {table} WHERE {clause}"
+    if limit is not None:
+        query = (
+            f"DELETE FROM {table} WHERE rowid IN "
+            f"(SELECT rowid FROM {table} WHERE {clause} LIMIT {int(limit)})"
+        )
+
+    async with checkpointer.lock:
+        async with checkpointer.conn.execute(query, params) as cursor:
+            deleted = cursor.rowcount
+        # Resets are committed right away instead of with the next batch.
+        await checkpointer.conn.flush()
+
+    return deleted
+
+
+async def _clear_sqlite_tables() -> list[int]:
+    checkpointer = await get_sqlite_checkpointer()
+    counts = []
+    async with checkpointer.lock:
+        for name in CONVERSATION_TABLES:
+            async with checkpointer.conn.execute(f"SELECT COUNT(*) FROM {name}") as cursor:
+                (count,) = await cursor.fetchone()
+            counts.append(count)
+            # Without a WHERE clause SQLite drops the table pages at once.
+            await checkpointer.conn.execute(f"DELETE FROM {name}")
+        await checkpointer.conn.flush()
+
+    return counts
+
+
+def _prune_jobs() -> None:
+    finished = [job for job in list_reset_jobs() if job.finished_at is not None]
+    for job in finished[_MAX_FINISHED_JOBS:]:
+        del _jobs[job.id]
@@ -0,0 +1,189 @@
+"""
+Embedded SQLite storage for the conversation state.
+
+Single-node installs can keep LangGraph checkpoints in a local SQLite file
+instead of MongoDB. The database runs in WAL mode, so reads never block on the
+writer, and commits are batched: writes are committed together at most
+`SQLITE_COMMIT_INTERVAL_MS` after they were made instead of one fsync per
+checkpoint. A crash can lose the writes of that last interval.
+
+The checkpointer and its connection are created once per event loop and
+shared with the reset operations, so both see the same uncommitted writes.
+"""
+
+import asyncio
+import sys
+import weakref
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+from src.config import settings
+
+_checkpointers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+    weakref.WeakKeyDictionary()
+)
+# Serializes the creation of a loop's checkpointer, so concurrent first
+# requests share a single connection instead of each opening their own.
+_creation_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# Tables created by `AsyncSqliteSaver`. Their primary keys start with
+# `thread_id`, so lookups by thread id and thread-id range are indexed.
+CHECKPOINTS_TABLE = "checkpoints"
+WRITES_TABLE = "writes"
+
+
+class GroupCommitConnection:
+    """aiosqlite connection whose commits are batched.
+
+    `commit()` returns right away and schedules a single commit of everything
+    written in the next `commit_interval` seconds. Every other attribute is
+    forwarded to the wrapped connection.
+
+    The scheduled commit holds `lock`, the lock of the saver using the
+    connection, so it never lands in the middle of a multi-statement write,
+    e.g. a reset deleting a thread from both tables.
+
+    Args:
+        connection: Open aiosqlite connection.
+        commit_interval: Maximum delay of a commit, in seconds. 0 commits at
+            every call.
+        lock: Lock held by every user of the connection. Set it to the
+            saver's lock once the saver is created.
+    """
+
+    def __init__(
+        self, connection: Any, commit_interval: float, lock: asyncio.Lock | None = None
+    ) -> None:
+        self._connection = connection
+        self.commit_interval = commit_interval
+        self.lock = lock or asyncio.Lock()
+        self._commit_handle: asyncio.TimerHandle | None = None
+        self._commit_task: asyncio.Task | None = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+    async def commit(self) -> None:
+        if self.commit_interval <= 0:
+            await self._connection.commit()
+            return
+
+        if self._commit_handle is None:
+            self._commit_handle = asyncio.get_running_loop().call_later(
+                self.commit_interval, self._start_commit
+            )
+
+    async def flush(self) -> None:
+        """Commit pending writes now. The caller must hold `lock`."""
+
+        if self._commit_handle is not None:
+            self._commit_handle.cancel()
+            self._commit_handle = None
+        # A scheduled commit waiting for the lock has nothing left to commit.
+        if self._commit_task is not None and not self._commit_task.done():
+            self._commit_task.cancel()
+        await self._connection.commit()
+
+    def _start_commit(self) -> None:
+        self._commit_handle = None
+        self._commit_task = asyncio.create_task(self._commit())
+
+    async def _commit(self) -> None:
+        try:
+            async with self.lock:
+                await self._connection.commit()
+        except Exception:
+            logger.exception("Failed to commit the SQLite checkpoints")
+
+
+async def get_sqlite_checkpointer() -> Any:
+    """
+    Get the `AsyncSqliteSaver` bound to the running event loop, with its tables created.
+    """
+    loop = asyncio.get_running_loop()
+    checkpointer = _checkpointers.get(loop)
+    if checkpointer is not None:
+        return checkpointer
+
+    async with _creation_locks.setdefault(loop, asyncio.Lock()):
+        checkpointer = _checkpointers.get(loop)
+        if checkpointer is None:
+            checkpointer = await _create_sqlite_checkpointer()
+            _checkpointers[loop] = checkpointer
+
+    return checkpointer
+
+
+async def _create_sqlite_checkpointer() -> Any:
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError as e:
+        raise ImportError(
+            "The SQLite checkpointer requires `aiosqlite` and `langgraph-checkpoint-sqlite`. "
+            "Install them with `uv sync --extra sqlite`."
+        ) from e
+
+    path = Path(settings.SQLITE_CHECKPOINT_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = await aiosqlite.connect(path)
+    # In WAL mode, synchronous=NORMAL only syncs the WAL at checkpoints;
+    # busy_timeout lets other processes wait for the write lock.
+    await connection.executescript(
+        """
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA busy_timeout=5000;
+        """
+    )
+
+    group_commit_connection = GroupCommitConnection(
+        connection, settings.SQLITE_COMMIT_INTERVAL_MS / 1000
+    )
+    checkpointer = AsyncSqliteSaver(group_commit_connection)
+    group_commit_connection.lock = checkpointer.lock
+    try:
+        await checkpointer.setup()
+    except Exception:
+        await connection.close()
+        raise
+
+    return checkpointer
+
+
+async def close_sqlite_checkpointer() -> None:
+    """
+    Commit the pending writes and close the SQLite connection of the running event loop.
+    """
+    checkpointer = _checkpointers.pop(asyncio.get_running_loop(), None)
+    if checkpointer is None:
+        return
+
+    async with checkpointer.lock:
+        await checkpointer.conn.flush()
+        await checkpointer.conn.close()
+
+
+def get_prefix_range(prefix: str) -> tuple[str, str | None]:
+    """Bounds of the text values starting with `prefix`, for an indexed range scan.
+
+    Texts compare by their UTF-8 bytes, so incrementing the last code point of
+    the prefix gives the first value past every string starting with it. The
+    increment skips the surrogates, which UTF-8 can't encode, and trailing
+    U+10FFFF code points are dropped as they have no successor. The upper bound
+    is None when no code point is left, i.e. every value from `prefix` on matches.
+    """
+
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return prefix, None
+
+    successor = ord(stem[-1]) + 1
+    if 0xD800 <= successor <= 0xDFFF:
+        successor = 0xE000
+
+    return prefix, stem[:-1] + chr(successor)
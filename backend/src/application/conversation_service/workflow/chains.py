@@ -1,22 +1,26 @@
+from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.base import RunnableSequence
-from langchain_groq import ChatGroq
 
-from src.config import settings
+from src.application.llm_scheduler import ModelTier, Priority, get_routed_chat_model
 from .tools import tools
 from src.domain.prompts import AGENT_CHARACTER_CARD, SUMMARY_PROMPT, CONTEXT_SUMMARY_PROMPT
 
-def get_chat_model(temperature: float = 0.7, model_name: str = settings.GROQ_LLM_MODEL) -> ChatGroq:
-    return ChatGroq(
-        api_key=settings.GROQ_API_KEY,
-        model_name=model_name,
-        temperature=temperature,
+def get_chat_model(
+    route: str,
+    tier: ModelTier,
+    priority: Priority,
+    temperature: float = 0.7,
+) -> BaseChatModel:
+    return get_routed_chat_model(
+        route=route, tier=tier, priority=priority, temperature=temperature
     )
 
-def get_agent_response_chain() -> RunnableSequence:
+def get_agent_response_chain(with_tools: bool = True) -> RunnableSequence:
 
-    model = get_chat_model()
-    model = model.bind_tools(tools)
+    model = get_chat_model("conversation", ModelTier.QUALITY, Priority.INTERACTIVE)
+    if with_tools:
+        model = model.bind_tools(tools)
     system_message = AGENT_CHARACTER_CARD
 
     prompt = ChatPromptTemplate.from_messages(
@@ -33,7 +37,9 @@ def get_agent_response_chain() -> RunnableSequence:
     )
 
 def get_conversation_summary_chain() -> RunnableSequence:
-    model = get_chat_model()
+    model = get_chat_model(
+        "conversation_summary", ModelTier.FAST, Priority.CONVERSATION_SUMMARY
+    )
     system_message = SUMMARY_PROMPT
 
     prompt = ChatPromptTemplate.from_messages(
@@ -51,7 +57,7 @@ def get_conversation_summary_chain() -> RunnableSequence:
     )
 
 def get_context_summary_chain() -> RunnableSequence:
-    model = get_chat_model()
+    model = get_chat_model("context_summary", ModelTier.FAST, Priority.CONTEXT_SUMMARY)
     system_message = CONTEXT_SUMMARY_PROMPT
 
     prompt = ChatPromptTemplate.from_messages(
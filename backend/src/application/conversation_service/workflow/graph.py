@@ -11,10 +11,16 @@ from .nodes import (
     summarize_context_node, 
     connector_node,
     retriever_node,
+    rag_router_node,
+    routed_conversation_node,
 )   
+from src.config import settings
 
 @lru_cache(maxsize=1)
 def create_workflow_graph() -> StateGraph:
+    if settings.RAG_ROUTER_MODE == "on":
+        return create_routed_workflow_graph()
+
     graph_builder = StateGraph(AgentState)
 
     # add nodes
@@ -41,4 +47,28 @@ def create_workflow_graph() -> StateGraph:
     
     return graph_builder
 
+
+def create_routed_workflow_graph() -> StateGraph:
+    """
+    Workflow where the local RAG router decides up front whether to retrieve,
+    so the conversation model answers in a single call, without tools.
+    """
+    graph_builder = StateGraph(AgentState)
+
+    # add nodes
+    graph_builder.add_node("rag_router_node", rag_router_node)
+    # Same name as in the default workflow, so its tokens are still streamed.
+    graph_builder.add_node("conversation_node", routed_conversation_node)
+    graph_builder.add_node("summarize_conversation_node", summarize_conversation_node)
+    graph_builder.add_node("connector_node", connector_node)
+
+    # add edges
+    graph_builder.add_edge(START, "rag_router_node")
+    graph_builder.add_edge("rag_router_node", "conversation_node")
+    graph_builder.add_edge("conversation_node", "connector_node")
+    graph_builder.add_conditional_edges("connector_node", should_summarize_conversation)
+    graph_builder.add_edge("summarize_conversation_node", END)
+
+    return graph_builder
+
 graph = create_workflow_graph().compile()
\ No newline at end of file
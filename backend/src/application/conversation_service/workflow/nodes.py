@@ -1,49 +1,153 @@
+import asyncio
+import time
+
+from langchain_core.messages import BaseMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.prebuilt import ToolNode
 from loguru import logger
 
+from src.application.metrics import metrics
+from src.application.rag.retriever import get_agent_filter
+from src.application.rag.router import get_rag_router, log_rag_decision
 from src.config import settings
 
 from .state import AgentState
 from .chains import get_agent_response_chain, get_conversation_summary_chain, get_context_summary_chain
-from .tools import tools
+from .tools import retriever, tools
 
 
-def retriever_node(state):
+async def retriever_node(state):
     logger.info("🔍 RAG ACTIVATED: Retrieving knowledge from vector database")
-    result = ToolNode(tools).invoke(state)
+    result = await ToolNode(tools).ainvoke(state)
     logger.info("✅ RAG COMPLETED: Knowledge retrieved and ready for response")
     return result
 
-def conversation_node(state: AgentState, config: RunnableConfig) -> dict:
-    summary = state.get("summary", "")
-    conversation_chain = get_agent_response_chain()
-    response = conversation_chain.invoke(
-        {
-            "messages": state["messages"],
-            "agent_context": state.get("agent_context", ""),
-            "agent_name": state.get("agent_name", "Assistant"),
-            "agent_perspective": state.get("agent_perspective", ""),
-            "agent_style": state.get("agent_style", ""),
-            "summary": summary,
-        },
-        config,
+async def rag_router_node(state: AgentState) -> dict:
+    query = str(state["messages"][-1].content)
+    agent_id = state.get("agent_id", "")
+
+    vector, should_retrieve, score, seconds = await route_query(query, agent_id)
+    metrics.observe("rag_router.decision_seconds", seconds)
+    if not should_retrieve:
+        metrics.increment("rag_router.skipped")
+        logger.info(f"🤖 RAG ROUTER: Direct response (score {score:.2f})")
+        return {"retrieved_context": ""}
+
+    metrics.increment("rag_router.retrieved")
+    logger.info(f"🔍 RAG ROUTER: Retrieving knowledge (score {score:.2f})")
+    docs = await retriever.asearch(query, vector, filter=get_agent_filter(agent_id))
+
+    return {"retrieved_context": "\n\n".join(doc.page_content for doc in docs)}
+
+
+async def route_query(query: str, agent_id: str) -> tuple[list[float], bool, float, float]:
+    """Decide locally whether a player message needs the agent's documents.
+
+    Without a trained router, every message retrieves.
+
+    Returns:
+        tuple[list[float], bool, float, float]: The embedding of the message,
+            the decision, its score and the seconds it took.
+    """
+
+    start = time.perf_counter()
+    vector = await retriever.embedding.aembed_query(query)
+    router = get_rag_router()
+    should_retrieve, score = (
+        router.should_retrieve(agent_id, vector) if router is not None else (True, 1.0)
     )
-    
-    # Simple RAG detection logging
-    if hasattr(response, 'tool_calls') and response.tool_calls:
-        logger.info("🤖 AGENT DECISION: Using RAG (detected tool calls in response)")
-    else:
-        logger.info("🤖 AGENT DECISION: Direct response (no RAG needed)")
-    
+
+    return vector, should_retrieve, score, time.perf_counter() - start
+
+
+async def conversation_node(state: AgentState, config: RunnableConfig) -> dict:
+    # In shadow mode the router scores the player message while the model decides.
+    shadow_routing = None
+    if settings.RAG_ROUTER_MODE == "shadow" and isinstance(state["messages"][-1], HumanMessage):
+        shadow_routing = asyncio.create_task(
+            route_query(str(state["messages"][-1].content), state.get("agent_id", ""))
+        )
+
+    try:
+        conversation_chain = get_agent_response_chain()
+        start = time.perf_counter()
+        response = await conversation_chain.ainvoke(get_conversation_inputs(state), config)
+        decision_seconds = time.perf_counter() - start
+
+        # Simple RAG detection logging
+        if hasattr(response, 'tool_calls') and response.tool_calls:
+            logger.info("🤖 AGENT DECISION: Using RAG (detected tool calls in response)")
+        else:
+            logger.info("🤖 AGENT DECISION: Direct response (no RAG needed)")
+
+        if shadow_routing is not None:
+            await log_shadow_decision(state, response, shadow_routing, decision_seconds)
+    finally:
+        # Don't leave the router running when the model call failed or was cancelled.
+        if shadow_routing is not None and not shadow_routing.done():
+            shadow_routing.cancel()
+
     return {"messages": [response]}
 
 
-def summarize_conversation_node(state: AgentState) -> dict:
+async def routed_conversation_node(state: AgentState, config: RunnableConfig) -> dict:
+    # The RAG router already decided, so the model answers in a single call.
+    conversation_chain = get_agent_response_chain(with_tools=False)
+    response = await conversation_chain.ainvoke(get_conversation_inputs(state), config)
+
+    return {"messages": [response]}
+
+
+def get_conversation_inputs(state: AgentState) -> dict:
+    return {
+        "messages": state["messages"],
+        "agent_context": state.get("agent_context", ""),
+        "agent_name": state.get("agent_name", "Assistant"),
+        "agent_perspective": state.get("agent_perspective", ""),
+        "agent_style": state.get("agent_style", ""),
+        "summary": state.get("summary", ""),
+        "retrieved_context": state.get("retrieved_context", ""),
+    }
+
+
+async def log_shadow_decision(
+    state: AgentState,
+    response: BaseMessage,
+    shadow_routing: asyncio.Task,
+    decision_seconds: float,
+) -> None:
+    """
+    Log the model's retrieval decision next to the router's, without ever
+    failing the conversation.
+    """
+    try:
+        _, router_retrieved, router_score, router_seconds = await shadow_routing
+        llm_retrieved = bool(getattr(response, "tool_calls", None))
+        metrics.increment(
+            "rag_router.shadow_agreements" if router_retrieved == llm_retrieved
+            else "rag_router.shadow_disagreements"
+        )
+        await asyncio.to_thread(
+            log_rag_decision,
+            {
+                "agent_id": state.get("agent_id", ""),
+                "query": str(state["messages"][-1].content),
+                "llm_retrieved": llm_retrieved,
+                "router_retrieved": router_retrieved,
+                "router_score": router_score,
+                "decision_seconds": decision_seconds,
+                "router_seconds": router_seconds,
+            },
+        )
+    except Exception as e:
+        logger.warning(f"Failed to log the shadow RAG router decision: {e}")
+
+
+async def summarize_conversation_node(state: AgentState) -> dict:
     summary = state.get("summary", "")
     summary_chain = get_conversation_summary_chain()
 
-    response = summary_chain.invoke(
+    response = await summary_chain.ainvoke(
         {
             "messages": state["messages"],
             "agent_name": state.get("agent_name", "Assistant"),
@@ -58,10 +162,10 @@ def summarize_conversation_node(state: AgentState) -> dict:
     return {"summary": response.content, "messages": messages}
 
 
-def summarize_context_node(state: AgentState) -> dict:
+async def summarize_context_node(state: AgentState) -> dict:
     context_summary_chain = get_context_summary_chain()
 
-    response = context_summary_chain.invoke(
+    response = await context_summary_chain.ainvoke(
         {
             "context": state["messages"][-1].content,
         }
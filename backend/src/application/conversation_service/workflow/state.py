@@ -2,12 +2,16 @@ from langgraph.graph import MessagesState
 
 class AgentState(MessagesState):
 
+    agent_id: str
+    player_id: str
     agent_context: str
     agent_name: str
     agent_perspective: str
     agent_style: str
     # messages field is already properly defined in MessagesState - don't redefine it
     summary: str
+    # Documents the RAG router retrieved for the last player message, if any.
+    retrieved_context: str
 
 
 def state_to_string(state: AgentState) -> str:
@@ -19,7 +23,8 @@ def state_to_string(state: AgentState) -> str:
         conversation = ""
 
     return f"""
-agentState(agent_context={state["agent_context"]}, 
+agentState(agent_id={state.get("agent_id", "")}, 
+agent_context={state["agent_context"]}, 
 agent_name={state["agent_name"]}, 
 agent_perspective={state["agent_perspective"]}, 
 agent_style={state["agent_style"]}, 
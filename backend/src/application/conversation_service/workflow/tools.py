@@ -1,23 +1,31 @@
-from langchain.tools.retriever import create_retriever_tool
+from typing import Annotated
 
-from src.application.rag.retriever import get_retriever
+from langchain_core.tools import tool
+from langgraph.prebuilt import InjectedState
+
+from src.application.rag.retriever import get_agent_filter, get_async_retriever
 from src.config import settings
 
-retriever = get_retriever(
+retriever = get_async_retriever(
     embedding_model_id=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
     k=settings.RAG_TOP_K,
     device=settings.RAG_DEVICE,
 )
 
-retriever_tool = create_retriever_tool(
-    retriever,
+
+@tool(
     "retriever_agent_context",
-    "Search and return information about a specific innovator. Always use this tool when the user asks you about an innovator, their companies, innovations or technological contributions and theories.",
-    )
+    description="Search and return information about a specific innovator. Always use this tool when the user asks you about an innovator, their companies, innovations or technological contributions and theories.",
+)
+async def retriever_tool(
+    query: str,
+    agent_id: Annotated[str, InjectedState("agent_id")],
+) -> str:
+    # The agent id is injected from the graph state, so the model never sees it
+    # and searches are always scoped to the active agent's chunks.
+    docs = await retriever.ainvoke(query, filter=get_agent_filter(agent_id))
 
+    return "\n\n".join(doc.page_content for doc in docs)
 
 
 tools = [retriever_tool]
-
-
-
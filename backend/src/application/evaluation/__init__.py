@@ -0,0 +1,25 @@
+from .cache import ResponseCache
+from .evaluate import evaluate_agent
+from .generate_dataset import (
+    EvaluationDatasetGenerator,
+    get_generation_llm,
+    get_generation_requests_per_minute,
+    iter_extracted_chunks,
+    iter_memory_chunks,
+    merge_shards,
+)
+from .runner import EvaluationRunner
+from .upload_dataset import upload_dataset
+
+__all__ = [
+    "EvaluationDatasetGenerator",
+    "EvaluationRunner",
+    "ResponseCache",
+    "evaluate_agent",
+    "get_generation_llm",
+    "get_generation_requests_per_minute",
+    "iter_extracted_chunks",
+    "iter_memory_chunks",
+    "merge_shards",
+    "upload_dataset",
+]
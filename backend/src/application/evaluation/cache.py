@@ -0,0 +1,68 @@
+"""
+On-disk cache of the agent outputs produced during evaluations.
+
+Entries are keyed by the prompt version, the model and the sample input, so an
+evaluation only calls the model again for the samples whose prompt, model or
+input changed since the last run. Each entry is a small JSON file named after
+its key, written atomically, so concurrent runs can share the cache.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from src.domain.prompts import (
+    AGENT_CHARACTER_CARD,
+    CONTEXT_SUMMARY_PROMPT,
+    EXTEND_SUMMARY_PROMPT,
+    SUMMARY_PROMPT,
+)
+
+
+def get_prompt_version() -> str:
+    """
+    Hash of the prompts the conversation workflow renders.
+
+    Opik versions the prompts too, but it isn't always configured: the text
+    itself is what changes the outputs.
+    """
+    prompts = (AGENT_CHARACTER_CARD, SUMMARY_PROMPT, EXTEND_SUMMARY_PROMPT, CONTEXT_SUMMARY_PROMPT)
+    digest = hashlib.sha256("\0".join(prompt.prompt for prompt in prompts).encode())
+
+    return digest.hexdigest()[:16]
+
+
+def get_cache_key(prompt_version: str, model: str, sample_input: Any) -> str:
+    payload = json.dumps([prompt_version, model, sample_input], sort_keys=True, ensure_ascii=False)
+
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Agent outputs stored as one JSON file per key.
+
+    Args:
+        cache_dir: Directory of the cache entries.
+    """
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = Path(cache_dir)
+
+    def get(self, key: str) -> dict | None:
+        try:
+            return json.loads(self._get_path(key).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, value: dict) -> None:
+        path = self._get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(value, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def _get_path(self, key: str) -> Path:
+        # Two-level fan-out keeps directories small on large datasets.
+        return self.cache_dir / key[:2] / f"{key}.json"
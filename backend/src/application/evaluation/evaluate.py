@@ -0,0 +1,132 @@
+import asyncio
+from collections import defaultdict
+
+import numpy as np
+import opik
+from loguru import logger
+from opik.evaluation import evaluate
+from opik.evaluation.metrics import (
+    AnswerRelevance,
+    ContextPrecision,
+    ContextRecall,
+    Hallucination,
+    Moderation,
+)
+
+from src.application.conversation_service.checkpointer import close_checkpointer
+
+from .cache import get_prompt_version
+from .runner import EvaluationRunner, SampleResult, get_conversation_model, get_sample_key
+
+
+def evaluate_agent(
+    dataset: opik.Dataset,
+    runner: EvaluationRunner,
+    nb_samples: int | None = None,
+) -> dict[str, dict]:
+    """Replay the dataset through the agents and score their answers with Opik.
+
+    The agent outputs are produced first, concurrently and through the
+    runner's cache. The Opik experiment then only scores the precomputed
+    outputs, with the LLM-judge metrics running on `runner.workers` threads.
+    Samples the agents failed to answer are left out of the experiment and
+    listed in the report instead.
+
+    Args:
+        dataset: Opik dataset of `{agent_id, messages}` samples.
+        runner: Runner replaying the samples.
+        nb_samples: Number of samples to evaluate. All of them if None.
+
+    Returns:
+        dict[str, dict]: Latency, token usage and mean metric scores per agent.
+    """
+
+    samples = dataset.get_items(nb_samples)
+    results = asyncio.run(_run(runner, samples))
+    results_by_key = {result.key: result for result in results}
+    # Opik re-raises the errors of the task, so a single failed sample would abort the experiment.
+    dataset_item_ids = [
+        sample["id"] for sample, result in zip(samples, results) if result.error is None
+    ]
+    if not dataset_item_ids:
+        logger.warning("No sample was answered, skipping the scoring.")
+        return get_agent_report(results, {})
+
+    def evaluation_task(x: dict) -> dict:
+        return results_by_key[get_sample_key(x)].to_task_output()
+
+    experiment_config = {
+        "model_id": get_conversation_model(),
+        "prompt_version": get_prompt_version(),
+        "dataset_name": dataset.name,
+    }
+    scoring_metrics = [
+        Hallucination(),
+        AnswerRelevance(),
+        Moderation(),
+        ContextRecall(),
+        ContextPrecision(),
+    ]
+
+    logger.info("Scoring the agent outputs.")
+    evaluation = evaluate(
+        dataset=dataset,
+        task=evaluation_task,
+        scoring_metrics=scoring_metrics,
+        experiment_config=experiment_config,
+        task_threads=runner.workers,
+        dataset_item_ids=dataset_item_ids,
+    )
+
+    scores = defaultdict(lambda: defaultdict(list))
+    for test_result in evaluation.test_results:
+        agent_id = test_result.test_case.task_output["agent_id"]
+        for score_result in test_result.score_results:
+            if not score_result.scoring_failed:
+                scores[agent_id][score_result.name].append(score_result.value)
+
+    return get_agent_report(results, scores)
+
+
+async def _run(runner: EvaluationRunner, samples: list[dict]) -> list[SampleResult]:
+    try:
+        return await runner.run(samples)
+    finally:
+        await close_checkpointer()
+
+
+def get_agent_report(
+    results: list[SampleResult], scores: dict[str, dict[str, list[float]]]
+) -> dict[str, dict]:
+    """Aggregate the sample results and metric scores per agent.
+
+    Latencies of cached outputs are those of the call that produced them.
+    Failed samples are listed with their error, and left out of the scores.
+    """
+
+    results_by_agent = defaultdict(list)
+    for result in results:
+        results_by_agent[result.agent_id].append(result)
+
+    report = {}
+    for agent_id, agent_results in sorted(results_by_agent.items()):
+        latencies = [result.latency for result in agent_results if result.error is None]
+        failed = [result for result in agent_results if result.error is not None]
+        report[agent_id] = {
+            "samples": len(agent_results),
+            "cached": sum(result.cached for result in agent_results),
+            "failed": len(failed),
+            "failed_samples": [
+                {"key": result.key, "error": result.error} for result in failed
+            ],
+            "latency_p50": float(np.percentile(latencies, 50)) if latencies else None,
+            "latency_p95": float(np.percentile(latencies, 95)) if latencies else None,
+            "input_tokens": sum(result.input_tokens for result in agent_results),
+            "output_tokens": sum(result.output_tokens for result in agent_results),
+            "scores": {
+                name: float(np.mean(values))
+                for name, values in sorted(scores.get(agent_id, {}).items())
+            },
+        }
+
+    return report
@@ -0,0 +1,428 @@
+"""
+Generation of evaluation conversations from the agents' documents.
+
+Chunks are streamed from the long-term memory collection, or from the
+extraction stage when the memory isn't built, through a pipeline: a pool of
+workers asks the LLM for a conversation grounded in each chunk, paced by the
+LLM scheduler or, when it's disabled, by a shared rate limiter, and a single
+writer validates and appends each result to a sharded JSONL dataset as soon as
+it arrives. Chunks are identified by their long-term memory point ID, so a
+resumed run skips every chunk already in the shards and only generates the
+missing ones.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Literal
+
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_qdrant import QdrantVectorStore
+from loguru import logger
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from qdrant_client import models
+
+from src.application.llm_scheduler import ModelTier, Priority, get_routed_chat_model
+from src.application.metrics import metrics
+from src.application.pipeline import Pipeline, PipelineStage
+from src.application.rag import get_splitter
+from src.application.rag.qdrant import get_async_qdrant_client
+from src.application.rag.retriever import AGENT_ID_PAYLOAD_KEY
+from src.application.rate_limiter import AsyncRateLimiter
+from src.application.retry import get_retry_delay, is_rate_limit
+from src.config import settings
+from src.data.extract import extract
+from src.data.manifest import get_document_point_id
+from src.domain.adaptive_agent import AdaptiveAgent, AdaptiveAgentExtract
+from src.domain.agent_factory import AgentsFactory
+from src.domain.prompts import EVALUATION_DATASET_GENERATION_PROMPT
+
+
+
+class Message(BaseModel):
+    role: Literal["user", "assistant"]
+    content: str = Field(min_length=1)
+
+
+class GeneratedConversation(BaseModel):
+    """Conversation generated for a chunk, as the generation prompt asks for it."""
+
+    messages: list[Message] = Field(min_length=4, max_length=8)
+
+    @model_validator(mode="after")
+    def check_turns(self) -> "GeneratedConversation":
+        for i, message in enumerate(self.messages):
+            if message.role != ("user" if i % 2 == 0 else "assistant"):
+                raise ValueError("Messages must alternate, starting with the user.")
+        if self.messages[-1].role != "assistant":
+            raise ValueError("The conversation must end with an answer of the agent.")
+
+        return self
+
+
+def get_generation_llm() -> BaseChatModel:
+    """
+    Chat model of the dataset generation, in JSON mode and as batch work.
+    """
+    return get_routed_chat_model(
+        route="evaluation_generation",
+        tier=ModelTier.QUALITY,
+        priority=Priority.BATCH,
+        temperature=0.8,
+        model_kwargs={"response_format": {"type": "json_object"}},
+    )
+
+
+def get_generation_requests_per_minute() -> float | None:
+    """
+    Rate of the generation requests, or None when the LLM scheduler paces them.
+    """
+    if settings.LLM_SCHEDULER_ENABLED:
+        return None
+
+    return settings.EVALUATION_GENERATION_REQUESTS_PER_MINUTE
+
+
+class ShardedJsonlWriter:
+    """Appends records to numbered JSONL shards of at most `shard_size` lines.
+
+    Args:
+        output_dir: Directory of the shards.
+        shard_size: Maximum number of records per shard.
+    """
+
+    def __init__(self, output_dir: Path, shard_size: int) -> None:
+        self.output_dir = Path(output_dir)
+        self.shard_size = shard_size
+        self._shard_index = 0
+        self._shard_lines = 0
+        self._file = None
+
+    def load_ids(self) -> set[str]:
+        """Read the IDs of the records already written, line by line.
+
+        A record cut off by an interrupted run is truncated away, and new
+        records are appended to the last shard.
+        """
+
+        ids = set()
+        shards = self.get_shards()
+        for shard in shards:
+            end = 0
+            lines = 0
+            with shard.open("rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    ids.add(json.loads(line)["id"])
+                    end += len(line)
+                    lines += 1
+            if end < shard.stat().st_size:
+                with shard.open("r+b") as f:
+                    f.truncate(end)
+
+        if shards:
+            self._shard_index = int(shards[-1].stem.split("-")[-1])
+            self._shard_lines = lines
+
+        return ids
+
+    def write(self, record: dict) -> None:
+        if self._file is None or self._shard_lines >= self.shard_size:
+            self._open_next_shard()
+
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._shard_lines += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def get_shards(self) -> list[Path]:
+        return sorted(self.output_dir.glob("shard-*.jsonl"))
+
+    def iter_records(self) -> Iterator[dict]:
+        for shard in self.get_shards():
+            with shard.open("r", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+
+    def _open_next_shard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        if self._file is not None or self._shard_lines >= self.shard_size:
+            self._shard_index += 1
+            self._shard_lines = 0
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"shard-{self._shard_index:05d}.jsonl"
+        self._file = path.open("a", encoding="utf-8")
+
+
+@dataclass
+class GenerationStats:
+    generated: int = 0
+    skipped: int = 0
+    invalid_outputs: int = 0
+    failed: int = 0
+
+
+class EvaluationDatasetGenerator:
+    """Generates evaluation conversations from chunks, concurrently and resumably.
+
+    Args:
+        llm: Chat model generating the conversations, preferably in JSON mode.
+        output_dir: Directory of the JSONL shards.
+        workers: Number of generation requests in flight.
+        requests_per_minute: Maximum rate of generation requests, or None to
+            leave the pacing and the retries of failed requests to the LLM
+            scheduler.
+        shard_size: Maximum number of conversations per shard.
+        max_attempts: Number of requests per chunk before giving up on it.
+        min_chunk_chars: Chunks shorter than this are skipped, as they can't
+            ground a conversation.
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        output_dir: Path,
+        workers: int = 8,
+        requests_per_minute: float | None = None,
+        shard_size: int = 500,
+        max_attempts: int = 3,
+        min_chunk_chars: int = 300,
+    ) -> None:
+        self.llm = llm
+        self.output_dir = Path(output_dir)
+        self.workers = workers
+        self.requests_per_minute = requests_per_minute
+        self.shard_size = shard_size
+        self.max_attempts = max_attempts
+        self.min_chunk_chars = min_chunk_chars
+
+        prompt = ChatPromptTemplate.from_messages(
+            [("human", EVALUATION_DATASET_GENERATION_PROMPT.prompt)],
+            template_format="jinja2",
+        )
+        self.chain = prompt | self.llm
+
+    @classmethod
+    def build_from_settings(cls) -> "EvaluationDatasetGenerator":
+        return cls(
+            get_generation_llm(),
+            output_dir=settings.EVALUATION_GENERATION_DIR,
+            workers=settings.EVALUATION_GENERATION_WORKERS,
+            requests_per_minute=get_generation_requests_per_minute(),
+            shard_size=settings.EVALUATION_GENERATION_SHARD_SIZE,
+        )
+
+    async def generate(self, chunks: AsyncIterator[Document]) -> GenerationStats:
+        """Generate a conversation for every chunk that has none in the shards yet.
+
+        Args:
+            chunks: Chunks to generate conversations from, with their point ID
+                as `id` and their agent in `metadata["agent_id"]`.
+
+        Returns:
+            GenerationStats: Counts of generated, skipped and failed chunks.
+        """
+
+        writer = ShardedJsonlWriter(self.output_dir, self.shard_size)
+        done_ids = writer.load_ids()
+        if done_ids:
+            logger.info(f"Resuming: {len(done_ids)} conversations already generated.")
+
+        stats = GenerationStats()
+        rate_limiter = (
+            AsyncRateLimiter.per_minute(self.requests_per_minute, burst=self.workers)
+            if self.requests_per_minute is not None
+            else None
+        )
+        agents_factory = AgentsFactory()
+
+        async def pending_chunks() -> AsyncIterator[Document]:
+            async for chunk in chunks:
+                if chunk.id in done_ids or len(chunk.page_content) < self.min_chunk_chars:
+                    stats.skipped += 1
+                    continue
+                done_ids.add(chunk.id)
+                yield chunk
+
+        async def generate_chunk(chunk: Document) -> dict | None:
+            agent = agents_factory.get_agent(chunk.metadata["agent_id"])
+            conversation = await self._generate_conversation(agent, chunk, rate_limiter, stats)
+            if conversation is None:
+                stats.failed += 1
+                return None
+
+            return {
+                "id": chunk.id,
+                "agent_id": agent.id,
+                "source": chunk.metadata.get("source"),
+                "messages": [message.model_dump() for message in conversation.messages],
+            }
+
+        async def write_record(record: dict) -> None:
+            writer.write(record)
+            stats.generated += 1
+            if stats.generated % 50 == 0:
+                logger.info(f"Generated {stats.generated} conversations")
+
+        start = time.perf_counter()
+        pipeline = Pipeline(
+            name="evaluation_generation",
+            stages=[
+                PipelineStage("generate", generate_chunk, workers=self.workers),
+                PipelineStage("write", write_record, workers=1),
+            ],
+            queue_size=self.workers * 2,
+        )
+        try:
+            await pipeline.run(pending_chunks())
+        finally:
+            writer.close()
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Generated {stats.generated} conversations in {elapsed:.1f}s "
+            f"({stats.generated / elapsed * 60 if elapsed else 0:.1f}/min), "
+            f"skipped {stats.skipped}, failed {stats.failed}, "
+            f"{stats.invalid_outputs} invalid outputs retried."
+        )
+
+        return stats
+
+    async def _generate_conversation(
+        self,
+        agent: AdaptiveAgent,
+        chunk: Document,
+        rate_limiter: AsyncRateLimiter | None,
+        stats: GenerationStats,
+    ) -> GeneratedConversation | None:
+        attempt = 0
+        while attempt < self.max_attempts:
+            if rate_limiter is not None:
+                await rate_limiter.acquire()
+            try:
+                response = await self.chain.ainvoke(
+                    {"agent": str(agent), "document": chunk.page_content}
+                )
+            except Exception as e:
+                # The scheduled model has already retried the request.
+                if rate_limiter is None:
+                    logger.warning(f"Generation failed for chunk {chunk.id}: {e}")
+                    return None
+
+                delay = get_retry_delay(
+                    e,
+                    attempt,
+                    base_backoff=settings.EVALUATION_BASE_BACKOFF_SECONDS,
+                    max_backoff=settings.EVALUATION_MAX_BACKOFF_SECONDS,
+                )
+                if delay is None:
+                    logger.warning(f"Generation failed for chunk {chunk.id}: {e}")
+                    return None
+                if is_rate_limit(e):
+                    # Rate limits don't count as attempts: the request wasn't served.
+                    metrics.increment("evaluation_generation.rate_limited")
+                    rate_limiter.pause(delay)
+                else:
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                continue
+
+            attempt += 1
+            try:
+                return GeneratedConversation.model_validate_json(response.content)
+            except ValidationError as e:
+                stats.invalid_outputs += 1
+                metrics.increment("evaluation_generation.invalid_outputs")
+                logger.debug(f"Invalid conversation for chunk {chunk.id}: {e}")
+
+        return None
+
+
+def merge_shards(output_dir: Path, dataset_file: Path) -> int:
+    """Write the generated conversations as an evaluation dataset file.
+
+    The file has the format of `EVALUATION_DATASET_FILE_PATH`, and is written
+    one sample at a time instead of loading every shard in memory.
+
+    Returns:
+        int: Number of samples written.
+    """
+
+    num_samples = 0
+    with open(dataset_file, "w", encoding="utf-8") as f:
+        f.write('{\n    "samples": [')
+        for record in ShardedJsonlWriter(output_dir, shard_size=0).iter_records():
+            sample = {"agent_id": record["agent_id"], "messages": record["messages"]}
+            f.write(("," if num_samples else "") + "\n        ")
+            f.write(json.dumps(sample, ensure_ascii=False))
+            num_samples += 1
+        f.write("\n    ]\n}\n")
+
+    return num_samples
+
+
+async def iter_memory_chunks(
+    agent_ids: list[str] | None = None, batch_size: int = 256
+) -> AsyncIterator[Document]:
+    """
+    Stream the chunks of the long-term memory collection, page by page.
+    """
+    client = get_async_qdrant_client()
+    scroll_filter = None
+    if agent_ids:
+        scroll_filter = models.Filter(
+            must=[
+                models.FieldCondition(
+                    key=AGENT_ID_PAYLOAD_KEY, match=models.MatchAny(any=agent_ids)
+                )
+            ]
+        )
+
+    offset = None
+    while True:
+        points, offset = await client.scroll(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            scroll_filter=scroll_filter,
+            limit=batch_size,
+            offset=offset,
+            with_payload=[QdrantVectorStore.CONTENT_KEY, QdrantVectorStore.METADATA_KEY],
+            with_vectors=False,
+        )
+        for point in points:
+            yield Document(
+                id=str(point.id),
+                page_content=point.payload[QdrantVectorStore.CONTENT_KEY],
+                metadata=point.payload.get(QdrantVectorStore.METADATA_KEY) or {},
+            )
+
+        if offset is None:
+            return
+
+
+async def iter_extracted_chunks(
+    agents: list[AdaptiveAgentExtract], chunk_size: int
+) -> AsyncIterator[Document]:
+    """
+    Extract and split the agents' sources one agent at a time, like ingestion does.
+    """
+    agents_factory = AgentsFactory()
+    splitter = get_splitter(chunk_size)
+
+    for agent_extract in agents:
+        agent = agents_factory.get_agent(agent_extract.id)
+        documents = await asyncio.to_thread(extract, agent, agent_extract.urls)
+        chunks = await asyncio.to_thread(splitter.split_documents, documents)
+        for chunk in chunks:
+            chunk.id = get_document_point_id(chunk)
+            yield chunk
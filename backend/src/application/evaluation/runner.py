@@ -0,0 +1,215 @@
+"""
+Concurrent replay of evaluation samples through the conversation workflow.
+
+Samples run through `get_response` with at most `workers` conversations in
+flight, each on a new thread of a player ID unique to the run, so runs never
+see each other's history and their threads are deleted afterwards by prefix.
+Rate-limited calls are retried after the delay Groq asks for, and every worker
+waits for it too, instead of each hitting the limit again. Other transient
+errors are retried with jittered exponential backoff.
+"""
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+from loguru import logger
+
+from src.application.conversation_service.generate_response import get_response
+from src.application.conversation_service.reset_conversation import (
+    reset_conversations_with_prefix,
+)
+from src.application.conversation_service.workflow.state import state_to_string
+from src.application.llm_scheduler import ModelTier, Priority, get_route_models, llm_priority
+from src.application.metrics import metrics
+from src.application.retry import get_retry_delay, is_rate_limit
+from src.config import settings
+from src.domain.agent_factory import AgentsFactory
+
+from .cache import ResponseCache, get_cache_key, get_prompt_version
+
+
+@dataclass
+class SampleResult:
+    """Agent output for one evaluation sample."""
+
+    key: str
+    agent_id: str
+    input: list[dict]
+    expected_output: dict | None
+    output: str | None = None
+    context: str = ""
+    latency: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    attempts: int = 0
+    cached: bool = False
+    error: str | None = None
+
+    def to_task_output(self) -> dict:
+        return {
+            "agent_id": self.agent_id,
+            "input": self.input,
+            "context": self.context,
+            "output": self.output,
+            "expected_output": self.expected_output,
+        }
+
+
+def get_sample_key(sample: dict[str, Any]) -> str:
+    """
+    Cache key of a dataset sample with the current prompts and model.
+    """
+    sample_input = {"agent_id": sample["agent_id"], "messages": sample["messages"][:-1]}
+
+    return get_cache_key(get_prompt_version(), get_conversation_model(), sample_input)
+
+
+def get_conversation_model() -> str:
+    """
+    Model answering the players, unless it's falling back to another one.
+    """
+    return get_route_models("conversation", ModelTier.QUALITY)[0]
+
+
+class EvaluationRunner:
+    """Replays evaluation samples concurrently, with a shared cache and retries.
+
+    Args:
+        workers: Maximum number of conversations in flight.
+        cache: Cache of the agent outputs, or None to always call the model.
+        max_retries: Maximum number of retries of a sample.
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        cache: ResponseCache | None = None,
+        max_retries: int = 5,
+    ) -> None:
+        self.workers = workers
+        self.cache = cache
+        self.max_retries = max_retries
+        self.player_id = f"evaluation-{uuid.uuid4().hex[:8]}"
+        self._agent_factory = AgentsFactory()
+        self._resume_at = 0.0
+
+    async def run(self, samples: list[dict[str, Any]]) -> list[SampleResult]:
+        """Get the agent output of every sample, in the order of the samples."""
+
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def run_sample(sample: dict[str, Any]) -> SampleResult:
+            async with semaphore:
+                return await self._run_sample(sample)
+
+        start = time.perf_counter()
+        try:
+            # Evaluation traffic must not take the budget of the players' conversations.
+            with llm_priority(Priority.BATCH):
+                results = await asyncio.gather(*(run_sample(sample) for sample in samples))
+        finally:
+            await self._delete_threads({sample["agent_id"] for sample in samples})
+
+        num_cached = sum(result.cached for result in results)
+        num_failed = sum(result.error is not None for result in results)
+        logger.info(
+            f"Replayed {len(results)} samples in {time.perf_counter() - start:.1f}s "
+            f"({num_cached} cached, {num_failed} failed)"
+        )
+
+        return list(results)
+
+    async def _run_sample(self, sample: dict[str, Any]) -> SampleResult:
+        result = SampleResult(
+            key=get_sample_key(sample),
+            agent_id=sample["agent_id"],
+            input=sample["messages"][:-1],
+            expected_output=sample["messages"][-1] if sample["messages"] else None,
+        )
+
+        cached = self.cache.get(result.key) if self.cache is not None else None
+        if cached is not None:
+            result.output = cached["output"]
+            result.context = cached["context"]
+            result.latency = cached["latency"]
+            result.input_tokens = cached["input_tokens"]
+            result.output_tokens = cached["output_tokens"]
+            result.cached = True
+            metrics.increment("evaluation.cache_hits")
+            return result
+
+        agent = self._agent_factory.get_agent(result.agent_id)
+        while True:
+            await self._wait_for_rate_limit()
+            result.attempts += 1
+            start = time.perf_counter()
+            try:
+                output, state = await get_response(
+                    messages=result.input,
+                    agent_id=result.agent_id,
+                    agent_name=agent.name,
+                    agent_perspective=agent.perspective,
+                    agent_style=agent.style,
+                    agent_context="",
+                    player_id=self.player_id,
+                    new_thread=True,
+                )
+                break
+            except Exception as e:
+                delay = get_retry_delay(
+                    e,
+                    result.attempts - 1,
+                    base_backoff=settings.EVALUATION_BASE_BACKOFF_SECONDS,
+                    max_backoff=settings.EVALUATION_MAX_BACKOFF_SECONDS,
+                )
+                if delay is None or result.attempts > self.max_retries:
+                    result.error = str(e)
+                    metrics.increment("evaluation.failures")
+                    logger.warning(f"Sample of {result.agent_id} failed: {e}")
+                    return result
+
+                metrics.increment("evaluation.retries")
+                logger.debug(f"Retrying a sample of {result.agent_id} in {delay:.1f}s: {e}")
+                if is_rate_limit(e):
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                else:
+                    await asyncio.sleep(delay)
+
+        result.latency = time.perf_counter() - start
+        result.output = output
+        result.context = state_to_string(state)
+        for message in state["messages"]:
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                result.input_tokens += usage["input_tokens"]
+                result.output_tokens += usage["output_tokens"]
+        metrics.observe("evaluation.latency_seconds", result.latency)
+
+        if self.cache is not None:
+            self.cache.put(
+                result.key,
+                {
+                    "output": result.output,
+                    "context": result.context,
+                    "latency": result.latency,
+                    "input_tokens": result.input_tokens,
+                    "output_tokens": result.output_tokens,
+                },
+            )
+
+        return result
+
+    async def _wait_for_rate_limit(self) -> None:
+        while (delay := self._resume_at - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+
+    async def _delete_threads(self, agent_ids: set[str]) -> None:
+        await asyncio.gather(
+            *(
+                reset_conversations_with_prefix(f"{agent_id}-{self.player_id}-")
+                for agent_id in agent_ids
+            )
+        )
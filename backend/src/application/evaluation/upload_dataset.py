@@ -0,0 +1,32 @@
+import json
+from pathlib import Path
+
+import opik
+
+from src.infrastructure.opik_utils import create_dataset
+
+
+def upload_dataset(name: str, data_path: Path) -> opik.Dataset:
+    """Upload the evaluation samples of a JSON file as an Opik dataset.
+
+    Args:
+        name: Name of the dataset. An existing dataset with this name is replaced.
+        data_path: JSON file with a `samples` list of `{agent_id, messages}` items.
+
+    Returns:
+        opik.Dataset: The uploaded dataset.
+    """
+
+    with open(data_path, "r") as f:
+        evaluation_data = json.load(f)
+
+    dataset_items = [
+        {"agent_id": sample["agent_id"], "messages": sample["messages"]}
+        for sample in evaluation_data["samples"]
+    ]
+
+    return create_dataset(
+        name=name,
+        description="Dataset containing question-answer pairs for multiple agents.",
+        items=dataset_items,
+    )
@@ -0,0 +1,20 @@
+from .budget import MemoryBudgetStore, ModelLimits, SqliteBudgetStore
+from .chat_model import ScheduledChatModel, get_scheduled_chat_model
+from .routing import ModelTier, RoutedChatModel, get_route_models, get_routed_chat_model
+from .scheduler import LLMScheduler, Priority, get_llm_scheduler, llm_priority
+
+__all__ = [
+    "LLMScheduler",
+    "MemoryBudgetStore",
+    "ModelLimits",
+    "ModelTier",
+    "Priority",
+    "RoutedChatModel",
+    "ScheduledChatModel",
+    "SqliteBudgetStore",
+    "get_llm_scheduler",
+    "get_route_models",
+    "get_routed_chat_model",
+    "get_scheduled_chat_model",
+    "llm_priority",
+]
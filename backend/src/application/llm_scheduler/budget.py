@@ -0,0 +1,197 @@
+"""
+Rate-limit budgets of the LLM models, shared by the API workers of a node.
+
+Each model has two token buckets, one of requests and one of tokens per
+minute, refilled continuously at the model's limits. The buckets are stored
+in a small SQLite file, updated in one write transaction per request, so
+every uvicorn worker spends the same budget instead of each assuming the
+whole of Groq's limits for itself. A pause, after Groq answers with a rate
+limit, is stored the same way and holds every worker.
+
+Timestamps are wall-clock times, as monotonic clocks aren't comparable across
+processes.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+
+@dataclass(frozen=True)
+class ModelLimits:
+    requests_per_minute: float
+    tokens_per_minute: float
+
+
+@dataclass
+class Budget:
+    """Levels of the request and token buckets of a model."""
+
+    requests: float
+    tokens: float
+    updated_at: float
+    paused_until: float = 0.0
+
+    @classmethod
+    def full(cls, limits: ModelLimits, now: float) -> "Budget":
+        return cls(limits.requests_per_minute, limits.tokens_per_minute, now)
+
+    def refill(self, limits: ModelLimits, now: float) -> None:
+        elapsed = max(0.0, now - max(self.updated_at, self.paused_until))
+        self.requests = min(
+            limits.requests_per_minute,
+            self.requests + elapsed * limits.requests_per_minute / 60,
+        )
+        self.tokens = min(
+            limits.tokens_per_minute, self.tokens + elapsed * limits.tokens_per_minute / 60
+        )
+        self.updated_at = max(self.updated_at, now)
+
+    def take(self, limits: ModelLimits, now: float, tokens: float, reserve: float) -> float:
+        """Spend a request of `tokens` tokens if the budget allows it.
+
+        Args:
+            limits: Limits of the model.
+            now: Current wall-clock time.
+            tokens: Estimated tokens of the request.
+            reserve: Fraction of each bucket the request must leave untouched.
+
+        Returns:
+            float: 0 if the request was spent, else the seconds to wait for it.
+        """
+
+        if now < self.paused_until:
+            return self.paused_until - now
+
+        self.refill(limits, now)
+        # A request larger than the whole bucket waits for a full bucket.
+        # The reserve is capped the same way, or a large request with a reserve
+        # would wait forever.
+        needed_requests = min(
+            1 + reserve * limits.requests_per_minute, limits.requests_per_minute
+        )
+        needed_tokens = min(
+            min(tokens, limits.tokens_per_minute) + reserve * limits.tokens_per_minute,
+            limits.tokens_per_minute,
+        )
+        wait = max(
+            (needed_requests - self.requests) * 60 / limits.requests_per_minute,
+            (needed_tokens - self.tokens) * 60 / limits.tokens_per_minute,
+        )
+        if wait > 0:
+            return wait
+
+        self.requests -= 1
+        self.tokens -= tokens
+        return 0.0
+
+    def adjust(self, limits: ModelLimits, now: float, requests: float, tokens: float) -> None:
+        """
+        Give back (or, when negative, charge) budget after the fact.
+        """
+        self.refill(limits, now)
+        self.requests = min(limits.requests_per_minute, self.requests + requests)
+        self.tokens = min(limits.tokens_per_minute, self.tokens + tokens)
+
+    def pause(self, now: float, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.requests = 0.0
+        self.tokens = min(self.tokens, 0.0)
+
+
+class MemoryBudgetStore:
+    """
+    Budgets of the models in this process only.
+    """
+
+    def __init__(self) -> None:
+        self._budgets: dict[str, Budget] = {}
+        self._lock = threading.Lock()
+
+    def take(self, model: str, limits: ModelLimits, tokens: float, reserve: float) -> float:
+        with self._lock:
+            return self._get_budget(model, limits).take(limits, time.time(), tokens, reserve)
+
+    def adjust(self, model: str, limits: ModelLimits, requests: float, tokens: float) -> None:
+        with self._lock:
+            self._get_budget(model, limits).adjust(limits, time.time(), requests, tokens)
+
+    def pause(self, model: str, limits: ModelLimits, seconds: float) -> None:
+        with self._lock:
+            self._get_budget(model, limits).pause(time.time(), seconds)
+
+    def _get_budget(self, model: str, limits: ModelLimits) -> Budget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            budget = self._budgets[model] = Budget.full(limits, time.time())
+
+        return budget
+
+
+class SqliteBudgetStore:
+    """Budgets of the models in a SQLite file shared by the processes of a node.
+
+    Args:
+        path: Path of the SQLite file. It's created if missing.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Transactions are opened explicitly, as write transactions, so two
+        # workers can't both read a budget and spend it.
+        self._connection = sqlite3.connect(
+            self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS budgets ("
+            "model TEXT PRIMARY KEY, requests REAL, tokens REAL, "
+            "updated_at REAL, paused_until REAL)"
+        )
+        self._lock = threading.Lock()
+
+    def take(self, model: str, limits: ModelLimits, tokens: float, reserve: float) -> float:
+        with self._transaction(model, limits) as budget:
+            return budget.take(limits, time.time(), tokens, reserve)
+
+    def adjust(self, model: str, limits: ModelLimits, requests: float, tokens: float) -> None:
+        with self._transaction(model, limits) as budget:
+            budget.adjust(limits, time.time(), requests, tokens)
+
+    def pause(self, model: str, limits: ModelLimits, seconds: float) -> None:
+        with self._transaction(model, limits) as budget:
+            budget.pause(time.time(), seconds)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    @contextmanager
+    def _transaction(self, model: str, limits: ModelLimits) -> Iterator[Budget]:
+        """
+        Read a model's budget and write it back in one write transaction.
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT requests, tokens, updated_at, paused_until FROM budgets "
+                    "WHERE model = ?",
+                    (model,),
+                ).fetchone()
+                budget = Budget(*row) if row else Budget.full(limits, time.time())
+                yield budget
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO budgets VALUES (?, ?, ?, ?, ?)",
+                    (model, budget.requests, budget.tokens, budget.updated_at, budget.paused_until),
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
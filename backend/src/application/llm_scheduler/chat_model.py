@@ -0,0 +1,177 @@
+"""
+Chat model wrapper sending its requests through the LLM scheduler.
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_groq import ChatGroq
+
+from src.config import settings
+
+from .scheduler import Priority, get_effective_priority, get_llm_scheduler
+
+
+class ScheduledChatModel(BaseChatModel):
+    """Chat model whose async calls wait for their turn in the LLM scheduler.
+
+    Failed calls are retried by the wrapper, with jittered backoff, and a
+    stream is only retried if it failed before its first chunk. Sync calls
+    go straight to the wrapped model.
+    """
+
+    llm: BaseChatModel
+    priority: Priority = Priority.INTERACTIVE
+    max_retries: int = 3
+
+    @property
+    def _llm_type(self) -> str:
+        return f"scheduled-{self.llm._llm_type}"
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.llm, "model_name", self.llm._llm_type)
+
+    def bind_tools(
+        self, tools: Sequence[Any], **kwargs: Any
+    ) -> Runnable[LanguageModelInput, BaseMessage]:
+        # Let the wrapped model format the tools, and pass them along as call kwargs.
+        return self.bind(**self.llm.bind_tools(tools, **kwargs).kwargs)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self.llm._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        scheduler = get_llm_scheduler()
+        priority = get_effective_priority(self.priority)
+        estimated_tokens = estimate_tokens(messages, kwargs)
+
+        attempt = 0
+        while True:
+            await scheduler.acquire(self.model_name, priority, estimated_tokens)
+            try:
+                result = await self.llm._agenerate(
+                    messages, stop=stop, run_manager=run_manager, **kwargs
+                )
+                break
+            except Exception as e:
+                delay = await scheduler.get_retry_delay(self.model_name, e, attempt)
+                attempt += 1
+                if delay is None or attempt > self.max_retries:
+                    raise
+                await asyncio.sleep(delay)
+
+        usage = result.generations[0].message.usage_metadata if result.generations else None
+        if usage:
+            await scheduler.record_usage(self.model_name, estimated_tokens, usage["total_tokens"])
+
+        return result
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        scheduler = get_llm_scheduler()
+        priority = get_effective_priority(self.priority)
+        estimated_tokens = estimate_tokens(messages, kwargs)
+
+        attempt = 0
+        while True:
+            await scheduler.acquire(self.model_name, priority, estimated_tokens)
+            streamed = False
+            try:
+                # The callbacks of the new tokens are already sent by the
+                # caller of `_astream`, so the wrapped model doesn't get them.
+                async for chunk in self.llm._astream(messages, stop=stop, **kwargs):
+                    streamed = True
+                    usage = chunk.message.usage_metadata
+                    if usage:
+                        await scheduler.record_usage(
+                            self.model_name, estimated_tokens, usage["total_tokens"]
+                        )
+                    yield chunk
+                return
+            except Exception as e:
+                if streamed:
+                    raise
+                delay = await scheduler.get_retry_delay(self.model_name, e, attempt)
+                attempt += 1
+                if delay is None or attempt > self.max_retries:
+                    raise
+                await asyncio.sleep(delay)
+
+
+def estimate_tokens(messages: list[BaseMessage], kwargs: dict[str, Any]) -> float:
+    """
+    Rough token count of a request: ~4 characters a token for the prompt and
+    tools, plus the completion tokens allowed or expected.
+    """
+    chars = sum(len(str(message.content)) for message in messages)
+    if kwargs.get("tools"):
+        chars += len(json.dumps(kwargs["tools"]))
+    output_tokens = kwargs.get("max_tokens") or settings.LLM_SCHEDULER_OUTPUT_TOKENS_ESTIMATE
+
+    return chars / 4 + 4 * len(messages) + output_tokens
+
+
+def get_scheduled_chat_model(
+    model_name: str,
+    temperature: float,
+    priority: Priority,
+    max_retries: int = settings.LLM_SCHEDULER_MAX_RETRIES,
+    **kwargs: Any,
+) -> BaseChatModel:
+    """Build a Groq chat model, scheduled unless the scheduler is disabled.
+
+    Args:
+        model_name: Name of the Groq model.
+        temperature: Sampling temperature.
+        priority: Priority of the model's requests.
+        max_retries: Maximum number of retries of a request.
+        **kwargs: Other arguments of `ChatGroq`.
+
+    Returns:
+        BaseChatModel: The chat model.
+    """
+
+    kwargs.setdefault("request_timeout", settings.LLM_REQUEST_TIMEOUT_SECONDS)
+    if not settings.LLM_SCHEDULER_ENABLED:
+        return ChatGroq(
+            api_key=settings.GROQ_API_KEY,
+            model_name=model_name,
+            temperature=temperature,
+            max_retries=max_retries,
+            **kwargs,
+        )
+
+    # Retries are left to the wrapper, so they wait for the budget too.
+    llm = ChatGroq(
+        api_key=settings.GROQ_API_KEY,
+        model_name=model_name,
+        temperature=temperature,
+        max_retries=0,
+        **kwargs,
+    )
+
+    return ScheduledChatModel(llm=llm, priority=priority, max_retries=max_retries)
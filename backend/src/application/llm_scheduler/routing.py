@@ -0,0 +1,304 @@
+"""
+Routing of the LLM calls to models by latency and cost tier.
+
+Each chain declares a route, e.g. `context_summary`, and the tier it needs.
+Tiers map to an ordered list of models: the first one is used, and the next
+ones take over when it's rate-limited or failing, for as long as Groq asks to
+back off. Routes and tiers can be remapped per deployment through the
+settings, and the latency of every route is recorded per model.
+"""
+
+import asyncio
+import time
+from enum import Enum
+from typing import Any, AsyncIterator, Awaitable, Callable, Sequence, TypeVar
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from loguru import logger
+
+from src.application.metrics import metrics
+from src.application.retry import get_retry_delay
+from src.config import settings
+
+from .chat_model import get_scheduled_chat_model
+from .scheduler import Priority
+
+
+T = TypeVar("T")
+
+
+class ModelTier(str, Enum):
+    QUALITY = "quality"
+    FAST = "fast"
+
+
+# Models skipped by the routes until the given monotonic time, after an error.
+_unavailable_until: dict[str, float] = {}
+
+
+def get_tier_models(tier: ModelTier) -> list[str]:
+    """
+    Models of a tier, in fallback order.
+    """
+    if tier.value in settings.LLM_TIER_MODELS:
+        models = settings.LLM_TIER_MODELS[tier.value]
+    elif tier == ModelTier.FAST:
+        models = [settings.GROQ_LLM_MODEL_CONTEXT_SUMMARY, settings.GROQ_LLM_MODEL]
+    else:
+        models = [settings.GROQ_LLM_MODEL, settings.GROQ_LLM_MODEL_CONTEXT_SUMMARY]
+
+    return list(dict.fromkeys(models))
+
+
+def get_route_models(route: str, tier: ModelTier) -> list[str]:
+    """
+    Models of a route, given the tier it declares and the deployment's overrides.
+    """
+    return get_tier_models(ModelTier(settings.LLM_ROUTE_TIERS.get(route, tier)))
+
+
+class RoutedChatModel(BaseChatModel):
+    """Chat model trying the models of a route in order.
+
+    A model that fails with a transient error is skipped by every route of
+    the process for the delay Groq asks for, or the backoff delay. A stream
+    only falls back before its first chunk. The last model is always tried.
+
+    With hedging, a call still waiting for its first chunk (or for its
+    response, when not streamed) after the deadline is raced against the
+    same call on the next model. The first to answer wins and the other is
+    cancelled. The hedge only takes from its model's budget once fired.
+
+    Args:
+        route: Name of the route.
+        models: Models of the route, in fallback order.
+        hedge_first_token_after: Seconds without a first chunk before a
+            stream is hedged. 0 disables it.
+        hedge_response_after: Seconds without a response before a call that
+            isn't streamed is hedged. 0 disables it.
+    """
+
+    route: str
+    models: list[BaseChatModel]
+    hedge_first_token_after: float = 0.0
+    hedge_response_after: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    def bind_tools(
+        self, tools: Sequence[Any], **kwargs: Any
+    ) -> Runnable[LanguageModelInput, BaseMessage]:
+        # The tools are formatted the same way for every Groq model.
+        return self.bind(**self.models[0].bind_tools(tools, **kwargs).kwargs)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        candidates = self._get_candidates()
+        for i, model in enumerate(candidates):
+            start = time.perf_counter()
+            try:
+                result = model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except Exception as e:
+                self._on_error(model, e, is_last=i == len(candidates) - 1)
+                continue
+            self._record_latency(model, "latency_seconds", time.perf_counter() - start)
+            return result
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        async def generate(model: BaseChatModel) -> ChatResult:
+            return await model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        start = time.perf_counter()
+        model, result = await self._race(generate, self.hedge_response_after)
+        self._record_latency(model, "latency_seconds", time.perf_counter() - start)
+
+        return result
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async def open_stream(
+            model: BaseChatModel,
+        ) -> tuple[ChatGenerationChunk | None, AsyncIterator[ChatGenerationChunk]]:
+            stream = model._astream(messages, stop=stop, **kwargs)
+            return await anext(stream, None), stream
+
+        start = time.perf_counter()
+        model, (first_chunk, stream) = await self._race(
+            open_stream, self.hedge_first_token_after, discard=lambda result: result[1].aclose()
+        )
+        self._record_latency(model, "first_token_seconds", time.perf_counter() - start)
+        if first_chunk is None:
+            return
+
+        yield first_chunk
+        async for chunk in stream:
+            yield chunk
+        self._record_latency(model, "latency_seconds", time.perf_counter() - start)
+
+    async def _race(
+        self,
+        call: Callable[[BaseChatModel], Awaitable[T]],
+        hedge_after: float,
+        discard: Callable[[T], Awaitable[None]] | None = None,
+    ) -> tuple[BaseChatModel, T]:
+        """Run `call` on the route's models until one succeeds.
+
+        Models are tried one after the other when they fail. When
+        `hedge_after` is set, the next model is also started if the current
+        one hasn't answered by then.
+
+        Args:
+            call: Call of a model, e.g. generating or opening a stream.
+            hedge_after: Seconds to wait before hedging. 0 disables it.
+            discard: Cleanup of the result of a call that lost the race.
+
+        Returns:
+            tuple[BaseChatModel, T]: The model that answered first, and its result.
+        """
+
+        metrics.increment(f"llm_routing.requests.{self.route}")
+        pending = self._get_candidates()
+        primary = pending[0]
+        running: dict[asyncio.Task, BaseChatModel] = {}
+        hedged = False
+        try:
+            while True:
+                if not running:
+                    model = pending.pop(0)
+                    running[asyncio.create_task(call(model))] = model
+
+                can_hedge = hedge_after > 0 and not hedged and pending
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    hedged = True
+                    model = pending.pop(0)
+                    running[asyncio.create_task(call(model))] = model
+                    metrics.increment(f"llm_routing.hedges.{self.route}")
+                    continue
+
+                for task in done:
+                    model = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        self._on_error(model, e, is_last=not pending and not running)
+                        continue
+
+                    if model is not primary and hedged:
+                        metrics.increment(f"llm_routing.hedge_wins.{self.route}")
+                    return model, result
+        finally:
+            for task in running:
+                if not task.done():
+                    task.cancel()
+                elif discard is not None and not task.cancelled() and task.exception() is None:
+                    await discard(task.result())
+
+    def _get_candidates(self) -> list[BaseChatModel]:
+        now = time.monotonic()
+        available = [
+            model
+            for model in self.models[:-1]
+            if _unavailable_until.get(get_model_name(model), 0.0) <= now
+        ]
+
+        return available + self.models[-1:]
+
+    def _on_error(self, model: BaseChatModel, error: Exception, is_last: bool) -> None:
+        """
+        Skip a failing model for a while, or raise if the error is final.
+        """
+        model_name = get_model_name(model)
+        delay = get_retry_delay(
+            error,
+            0,
+            base_backoff=settings.LLM_SCHEDULER_BASE_BACKOFF_SECONDS,
+            max_backoff=settings.LLM_SCHEDULER_MAX_BACKOFF_SECONDS,
+        )
+        if delay is None or is_last:
+            raise error
+
+        if model is not self.models[-1]:
+            _unavailable_until[model_name] = time.monotonic() + delay
+        metrics.increment(f"llm_routing.fallbacks.{self.route}.{model_name}")
+        logger.warning(
+            f"Route '{self.route}' falls back from {model_name} for {delay:.1f}s: {error}"
+        )
+
+    def _record_latency(self, model: BaseChatModel, name: str, seconds: float) -> None:
+        metrics.observe(f"llm_routing.{name}.{self.route}", seconds)
+        metrics.observe(f"llm_routing.{name}.{self.route}.{get_model_name(model)}", seconds)
+
+
+def get_model_name(model: BaseChatModel) -> str:
+    return getattr(model, "model_name", model._llm_type)
+
+
+def get_routed_chat_model(
+    route: str,
+    tier: ModelTier,
+    priority: Priority,
+    temperature: float = 0.7,
+    **kwargs: Any,
+) -> BaseChatModel:
+    """Build the chat model of a route, hedged if the settings say so.
+
+    Args:
+        route: Name of the route, e.g. the kind of chain.
+        tier: Tier the route needs, unless the settings remap it.
+        priority: Priority of the route's requests in the LLM scheduler.
+        temperature: Sampling temperature.
+        **kwargs: Other arguments of `ChatGroq`.
+
+    Returns:
+        BaseChatModel: The chat model.
+    """
+
+    model_names = get_route_models(route, tier)
+    # Only the last model retries: the others hand over to the next one instead.
+    models = [
+        get_scheduled_chat_model(
+            model_name=model_name,
+            temperature=temperature,
+            priority=priority,
+            max_retries=settings.LLM_SCHEDULER_MAX_RETRIES if i == len(model_names) - 1 else 0,
+            **kwargs,
+        )
+        for i, model_name in enumerate(model_names)
+    ]
+
+    if route not in settings.LLM_HEDGED_ROUTES:
+        return RoutedChatModel(route=route, models=models)
+
+    return RoutedChatModel(
+        route=route,
+        models=models,
+        hedge_first_token_after=settings.LLM_HEDGE_FIRST_TOKEN_SECONDS,
+        hedge_response_after=settings.LLM_HEDGE_RESPONSE_SECONDS,
+    )
@@ -0,0 +1,297 @@
+"""
+Priority scheduling of the LLM requests of an event loop.
+
+Requests wait in one priority queue per model and are released one at a time,
+highest priority first, as the model's shared budget allows. Lower priorities
+also have to leave a reserve of the budget untouched, so background work
+can't drain what the interactive streams of other workers need, even though
+queues are per process.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from functools import lru_cache
+from typing import Iterator
+
+from src.application.metrics import metrics
+from src.application.retry import get_retry_delay, is_rate_limit
+from src.config import settings
+
+from .budget import MemoryBudgetStore, ModelLimits, SqliteBudgetStore
+
+BudgetStore = MemoryBudgetStore | SqliteBudgetStore
+
+
+class Priority(IntEnum):
+    """Priority classes of the LLM requests, highest first."""
+
+    INTERACTIVE = 0
+    CONTEXT_SUMMARY = 1
+    CONVERSATION_SUMMARY = 2
+    BATCH = 3
+
+
+_priority_floor: ContextVar[Priority] = ContextVar(
+    "llm_priority_floor", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def llm_priority(priority: Priority) -> Iterator[None]:
+    """Run the LLM requests made in this context at `priority` or lower.
+
+    Tasks started in the context inherit it, so e.g. an evaluation replaying
+    conversations through the workflow runs as batch work end to end.
+    """
+
+    token = _priority_floor.set(priority)
+    try:
+        yield
+    finally:
+        _priority_floor.reset(token)
+
+
+def get_effective_priority(priority: Priority) -> Priority:
+    return max(priority, _priority_floor.get())
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: Priority
+    sequence: int
+    tokens: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class LLMScheduler:
+    """Releases the LLM requests of an event loop by priority, within the budgets.
+
+    Args:
+        store: Budgets of the models.
+        default_limits: Limits of the models without their own, or None to send
+            their requests unthrottled.
+        model_limits: Limits per model name.
+        reserves: Fraction of the budgets each priority must leave untouched,
+            one per priority, each in [0, 1).
+
+    Raises:
+        ValueError: If `reserves` doesn't hold a valid fraction per priority.
+    """
+
+    def __init__(
+        self,
+        store: BudgetStore,
+        default_limits: ModelLimits | None = None,
+        model_limits: dict[str, ModelLimits] | None = None,
+        reserves: list[float] | None = None,
+    ) -> None:
+        self.store = store
+        self.default_limits = default_limits
+        self.model_limits = model_limits or {}
+        self.reserves = reserves or [0.0] * len(Priority)
+        if len(self.reserves) != len(Priority) or not all(
+            0.0 <= reserve < 1.0 for reserve in self.reserves
+        ):
+            raise ValueError(
+                f"Expected {len(Priority)} priority reserves in [0, 1), "
+                f"one per priority from interactive to batch, got {self.reserves}."
+            )
+        self._queues: dict[str, list[_Waiter]] = {}
+        self._dispatchers: dict[str, asyncio.Task] = {}
+        self._arrivals: dict[str, asyncio.Event] = {}
+        self._sequence = itertools.count()
+
+    @classmethod
+    def build_from_settings(cls) -> "LLMScheduler":
+        return cls(
+            store=get_budget_store(),
+            default_limits=(
+                ModelLimits(
+                    requests_per_minute=settings.LLM_SCHEDULER_REQUESTS_PER_MINUTE,
+                    tokens_per_minute=settings.LLM_SCHEDULER_TOKENS_PER_MINUTE,
+                )
+                if settings.LLM_SCHEDULER_REQUESTS_PER_MINUTE is not None
+                and settings.LLM_SCHEDULER_TOKENS_PER_MINUTE is not None
+                else None
+            ),
+            model_limits={
+                model: ModelLimits(**limits)
+                for model, limits in settings.LLM_SCHEDULER_MODEL_LIMITS.items()
+            },
+            reserves=settings.LLM_SCHEDULER_PRIORITY_RESERVES,
+        )
+
+    def get_limits(self, model: str) -> ModelLimits | None:
+        return self.model_limits.get(model, self.default_limits)
+
+    async def acquire(self, model: str, priority: Priority, tokens: float) -> None:
+        """Wait until a request of about `tokens` tokens may be sent to `model`.
+
+        Args:
+            model: Name of the model.
+            priority: Priority of the request.
+            tokens: Estimated prompt and completion tokens of the request.
+        """
+
+        name = priority.name.lower()
+        # Without limits there is no budget to wait for.
+        if self.get_limits(model) is None:
+            metrics.increment(f"llm_scheduler.requests.{name}")
+            return
+
+        waiter = _Waiter(
+            priority, next(self._sequence), tokens, asyncio.get_running_loop().create_future()
+        )
+        heapq.heappush(self._queues.setdefault(model, []), waiter)
+        self._arrivals.setdefault(model, asyncio.Event()).set()
+        self._update_queue_gauges(model)
+
+        dispatcher = self._dispatchers.get(model)
+        if dispatcher is None or dispatcher.done():
+            self._dispatchers[model] = asyncio.create_task(self._dispatch(model))
+
+        start = time.perf_counter()
+        await waiter.future
+        metrics.observe(f"llm_scheduler.wait_seconds.{name}", time.perf_counter() - start)
+        metrics.increment(f"llm_scheduler.requests.{name}")
+
+    async def record_usage(self, model: str, estimated_tokens: float, tokens: float) -> None:
+        """
+        Correct the token budget of a request with the tokens it actually used.
+        """
+        metrics.increment("llm_scheduler.tokens", tokens)
+        if tokens != estimated_tokens and self.get_limits(model) is not None:
+            await asyncio.to_thread(
+                self.store.adjust, model, self.get_limits(model), 0, estimated_tokens - tokens
+            )
+
+    async def get_retry_delay(
+        self, model: str, error: BaseException, attempt: int
+    ) -> float | None:
+        """Seconds to wait before retrying a failed request, or None if it can't be retried.
+
+        On a rate limit, the budget of a model with limits is paused for every
+        worker instead, and the request can be retried right away: it will wait
+        in the queue.
+        """
+
+        delay = get_retry_delay(
+            error,
+            attempt,
+            base_backoff=settings.LLM_SCHEDULER_BASE_BACKOFF_SECONDS,
+            max_backoff=settings.LLM_SCHEDULER_MAX_BACKOFF_SECONDS,
+        )
+        if delay is None:
+            metrics.increment("llm_scheduler.failures")
+            return None
+
+        metrics.increment("llm_scheduler.retries")
+        if is_rate_limit(error):
+            metrics.increment("llm_scheduler.rate_limited")
+            if self.get_limits(model) is None:
+                return delay
+            await asyncio.to_thread(self.store.pause, model, self.get_limits(model), delay)
+            return 0.0
+
+        return delay
+
+    async def _dispatch(self, model: str) -> None:
+        queue = self._queues[model]
+        arrivals = self._arrivals[model]
+        limits = self.get_limits(model)
+
+        try:
+            while queue:
+                waiter = heapq.heappop(queue)
+                if waiter.future.done():
+                    self._update_queue_gauges(model)
+                    continue
+
+                arrivals.clear()
+                try:
+                    wait = await asyncio.to_thread(
+                        self.store.take,
+                        model,
+                        limits,
+                        waiter.tokens,
+                        self.reserves[waiter.priority],
+                    )
+                except Exception as e:
+                    # The waiter is out of the queue: fail it here, the others below.
+                    if not waiter.future.done():
+                        waiter.future.set_exception(e)
+                    raise
+                if wait > 0:
+                    heapq.heappush(queue, waiter)
+                    # A higher priority request may need less of the budget:
+                    # check again as soon as one arrives.
+                    try:
+                        await asyncio.wait_for(arrivals.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                if waiter.future.done():
+                    # Cancelled while the budget was being taken.
+                    await asyncio.to_thread(self.store.adjust, model, limits, 1, waiter.tokens)
+                else:
+                    waiter.future.set_result(None)
+                self._update_queue_gauges(model)
+        except Exception as e:
+            while queue:
+                waiter = heapq.heappop(queue)
+                if not waiter.future.done():
+                    waiter.future.set_exception(e)
+            self._update_queue_gauges(model)
+
+    def _update_queue_gauges(self, model: str) -> None:
+        queue = self._queues.get(model, [])
+        for priority in Priority:
+            metrics.set_gauge(
+                f"llm_scheduler.queued.{model}.{priority.name.lower()}",
+                sum(waiter.priority == priority and not waiter.future.done() for waiter in queue),
+            )
+
+
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LLMScheduler]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@lru_cache(maxsize=1)
+def get_budget_store() -> BudgetStore:
+    """
+    Get the process-wide store of the model budgets.
+    """
+    if settings.LLM_SCHEDULER_BUDGET_STORE == "sqlite":
+        return SqliteBudgetStore(settings.LLM_SCHEDULER_BUDGET_PATH)
+    if settings.LLM_SCHEDULER_BUDGET_STORE == "memory":
+        return MemoryBudgetStore()
+
+    raise ValueError(
+        f"Unknown LLM budget store '{settings.LLM_SCHEDULER_BUDGET_STORE}', "
+        "expected 'sqlite' or 'memory'."
+    )
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """
+    Get the LLM scheduler of the running event loop.
+
+    Queues and their dispatcher tasks belong to a loop, so one scheduler is
+    kept per loop. Every scheduler of the process shares the same budgets.
+    """
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = LLMScheduler.build_from_settings()
+        _schedulers[loop] = scheduler
+
+    return scheduler
@@ -0,0 +1,156 @@
+"""
+Concurrent pipelines of async stages connected by bounded queues.
+
+Every stage runs its own pool of workers, so stages overlap: while one item is
+being embedded the next one is already being extracted. Bounded queues apply
+back-pressure, so a slow stage throttles the ones feeding it instead of
+buffering the whole dataset in memory.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable
+
+from loguru import logger
+
+from src.application.metrics import metrics
+
+_STOP = object()
+
+
+class PipelineStage:
+    """A step of a `Pipeline`.
+
+    Args:
+        name: Name of the stage, used for its metrics.
+        fn: Coroutine function processing one item. Its result is passed to the
+            next stage; returning None drops the item.
+        workers: Number of items processed concurrently by the stage.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Awaitable[Any]],
+        workers: int = 1,
+    ) -> None:
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_backlog = 0
+
+
+class Pipeline:
+    """Runs items through a sequence of stages connected by bounded queues.
+
+    Per-stage throughput and backlog are recorded in the metrics registry as
+    `<name>.<stage>.items`, `<name>.<stage>.seconds` and `<name>.<stage>.backlog`.
+
+    Args:
+        name: Name of the pipeline, used as the metrics prefix.
+        stages: Stages run in order.
+        queue_size: Maximum number of items waiting in front of each stage.
+    """
+
+    def __init__(self, name: str, stages: list[PipelineStage], queue_size: int = 8) -> None:
+        self.name = name
+        self.stages = stages
+        self.queue_size = queue_size
+
+    async def run(self, items: Iterable[Any] | AsyncIterable[Any]) -> None:
+        """Push `items` through every stage and wait until all of them are done.
+
+        Items can be streamed by an async iterable, which is consumed only as
+        fast as the first stage takes them. The first failing item cancels the
+        whole pipeline and its exception is raised.
+        """
+
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        start_time = time.perf_counter()
+
+        tasks = [asyncio.create_task(self._feed(items, queues[0], self.stages[0].workers))]
+        for i, stage in enumerate(self.stages):
+            output_queue = queues[i + 1] if i + 1 < len(queues) else None
+            tasks.append(asyncio.create_task(self._run_stage(stage, queues[i], output_queue)))
+
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        self._log_summary(time.perf_counter() - start_time)
+
+    async def _feed(
+        self, items: Iterable[Any] | AsyncIterable[Any], queue: asyncio.Queue, workers: int
+    ) -> None:
+        if isinstance(items, AsyncIterable):
+            async for item in items:
+                await queue.put(item)
+        else:
+            for item in items:
+                await queue.put(item)
+        for _ in range(workers):
+            await queue.put(_STOP)
+
+    async def _run_stage(
+        self,
+        stage: PipelineStage,
+        input_queue: asyncio.Queue,
+        output_queue: asyncio.Queue | None,
+    ) -> None:
+        await asyncio.gather(
+            *(self._run_worker(stage, input_queue, output_queue) for _ in range(stage.workers))
+        )
+
+        # Every worker of this stage is done: stop the workers of the next one.
+        if output_queue is not None:
+            next_stage = self.stages[self.stages.index(stage) + 1]
+            for _ in range(next_stage.workers):
+                await output_queue.put(_STOP)
+
+    async def _run_worker(
+        self,
+        stage: PipelineStage,
+        input_queue: asyncio.Queue,
+        output_queue: asyncio.Queue | None,
+    ) -> None:
+        metric_name = f"{self.name}.{stage.name}"
+        while True:
+            item = await input_queue.get()
+            if item is _STOP:
+                return
+
+            backlog = input_queue.qsize()
+            stage.max_backlog = max(stage.max_backlog, backlog)
+            metrics.set_gauge(f"{metric_name}.backlog", backlog)
+
+            start_time = time.perf_counter()
+            result = await stage.fn(item)
+            elapsed = time.perf_counter() - start_time
+
+            stage.items += 1
+            stage.busy_seconds += elapsed
+            metrics.increment(f"{metric_name}.items")
+            metrics.observe(f"{metric_name}.seconds", elapsed)
+
+            if result is not None and output_queue is not None:
+                await output_queue.put(result)
+
+    def _log_summary(self, wall_seconds: float) -> None:
+        logger.info(f"Pipeline '{self.name}' finished in {wall_seconds:.1f}s.")
+        for stage in self.stages:
+            throughput = stage.items / wall_seconds if wall_seconds > 0 else 0.0
+            utilization = (
+                stage.busy_seconds / (wall_seconds * stage.workers) if wall_seconds > 0 else 0.0
+            )
+            logger.info(
+                f"  {stage.name}: {stage.items} items, {throughput:.2f} items/s, "
+                f"{utilization:.0%} busy over {stage.workers} workers, "
+                f"max backlog {stage.max_backlog}"
+            )
@@ -1,5 +1,12 @@
 from .embeddings import get_embedding_model
-from .retriever import get_retriever
-from .splitter import get_splitter
+from .retriever import get_agent_filter, get_async_retriever, get_retriever
+from .splitter import count_tokens, get_splitter
 
-__all__ = ["get_embedding_model", "get_retriever", "get_splitter"]
\ No newline at end of file
+__all__ = [
+    "get_embedding_model",
+    "get_agent_filter",
+    "get_async_retriever",
+    "get_retriever",
+    "get_splitter",
+    "count_tokens",
+]
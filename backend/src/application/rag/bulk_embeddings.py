@@ -0,0 +1,176 @@
+"""
+Bulk embedding of ingestion chunks.
+
+Texts are sorted by length and cut into batches of similar length, so little
+compute is spent on padding, and the batches are embedded by a pool of worker
+processes that each load their own copy of the model. Vectors are yielded batch
+by batch as soon as they are ready, so callers can write them out while the next
+batches are still being embedded.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from src.config import settings
+from .embeddings import get_huggingface_embedding_model, get_onnx_embedding_model
+
+# Threads per worker process when the number of workers is picked automatically.
+_THREADS_PER_WORKER = 4
+
+_worker_model: Embeddings | None = None
+
+
+class BulkEmbedder:
+    """Embeds large numbers of texts in length-bucketed batches.
+
+    With a single worker, batches are embedded in a thread with
+    `embedding_model`. With more workers, each worker process loads the model
+    with a share of the CPU threads and batches are embedded in parallel. The
+    embedding server backend and GPU devices always embed in-process.
+
+    Use it as a context manager so the worker processes are started once and
+    shut down at the end.
+
+    Args:
+        embedding_model: Model used when embedding in-process.
+        model_id: Model loaded by the worker processes.
+        device: Device the model runs on.
+        backend: Embedding backend of the worker processes. Defaults to
+            `settings.RAG_EMBEDDING_BACKEND`.
+        batch_size: Number of texts per batch.
+        workers: Number of worker processes. 0 uses one process per four CPU
+            cores, 1 embeds in-process.
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        model_id: str,
+        device: str = "cpu",
+        backend: str | None = None,
+        batch_size: int = 64,
+        workers: int = 1,
+    ) -> None:
+        self.embedding_model = embedding_model
+        self.model_id = model_id
+        self.device = device
+        self.backend = backend or settings.RAG_EMBEDDING_BACKEND
+        self.batch_size = batch_size
+
+        cpu_count = multiprocessing.cpu_count()
+        workers = workers or max(1, cpu_count // _THREADS_PER_WORKER)
+        if workers > 1 and (self.backend == "server" or device != "cpu"):
+            logger.info(
+                f"Embedding in-process: worker processes aren't used with the "
+                f"'{self.backend}' backend on '{device}'."
+            )
+            workers = 1
+        self.workers = workers
+        self.threads_per_worker = max(1, cpu_count // workers)
+
+        self._pool: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> "BulkEmbedder":
+        if self.workers > 1:
+            # Spawned rather than forked: the parent may hold PyTorch or thread locks.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_id, self.device, self.backend, self.threads_per_worker),
+            )
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def embed(self, texts: list[str]) -> AsyncIterator[tuple[np.ndarray, np.ndarray]]:
+        """Embed `texts`, yielding batches in the order they complete.
+
+        Args:
+            texts: Texts to embed.
+
+        Yields:
+            tuple[np.ndarray, np.ndarray]: The indices of the batch's texts in
+                `texts` and their float32 vectors.
+        """
+
+        loop = asyncio.get_running_loop()
+        max_in_flight = 2 * self.workers if self._pool is not None else 1
+
+        def submit(indices: np.ndarray) -> asyncio.Future:
+            batch = [texts[i] for i in indices]
+            if self._pool is not None:
+                return loop.run_in_executor(self._pool, _embed_batch, batch)
+            return asyncio.ensure_future(
+                asyncio.to_thread(_embed_with, self.embedding_model, batch)
+            )
+
+        batches = iter(get_length_buckets([len(text) for text in texts], self.batch_size))
+        in_flight: dict[asyncio.Future, np.ndarray] = {}
+        try:
+            for indices in batches:
+                in_flight[submit(indices)] = indices
+                if len(in_flight) < max_in_flight:
+                    continue
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def get_length_buckets(lengths: list[int], batch_size: int) -> list[np.ndarray]:
+    """Group item indices into batches of items of similar length.
+
+    Batches are returned longest first, so the most expensive batches start
+    early and the short ones fill in the tail.
+    """
+
+    order = np.argsort(-np.asarray(lengths, dtype=np.int64), kind="stable")
+
+    return [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def _embed_with(embedding_model: Embeddings, texts: list[str]) -> np.ndarray:
+    return np.asarray(embedding_model.embed_documents(texts), dtype=np.float32)
+
+
+def _init_worker(model_id: str, device: str, backend: str, num_threads: int) -> None:
+    global _worker_model
+
+    if backend == "local":
+        import torch
+
+        torch.set_num_threads(num_threads)
+        _worker_model = get_huggingface_embedding_model(model_id, device)
+    elif backend == "onnx":
+        _worker_model = get_onnx_embedding_model(
+            model_id=model_id,
+            model_dir=settings.RAG_ONNX_MODEL_DIR,
+            quantized=settings.RAG_ONNX_QUANTIZED,
+            num_threads=num_threads,
+        )
+    else:
+        raise ValueError(f"Embedding backend '{backend}' can't run in worker processes.")
+
+
+def _embed_batch(texts: list[str]) -> np.ndarray:
+    # Runs in the worker processes, so it must stay a picklable module-level function.
+    return _embed_with(_worker_model, texts)
@@ -0,0 +1,281 @@
+"""
+Node-local embedding server shared by all API workers.
+
+The server loads the embedding model once and listens on a Unix socket. Concurrent
+embed requests are collected into micro-batches that are flushed either when they
+reach the maximum batch size or when the oldest request hits its max-wait deadline.
+"""
+
+import asyncio
+import json
+import socket
+import struct
+import threading
+import time
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+# Every frame is prefixed by its payload length as a 4-byte big-endian integer.
+# Requests are JSON (`{"texts": [...]}`); responses carry a (rows, dim) header
+# followed by the raw float32 vectors, or rows == ERROR_ROWS and an error message.
+_LENGTH = struct.Struct("!I")
+_HEADER = struct.Struct("!II")
+ERROR_ROWS = 0xFFFFFFFF
+
+
+@dataclass
+class _PendingRequest:
+    texts: list[str]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class EmbeddingServer:
+    """Serves embeddings over a Unix socket using dynamic micro-batching.
+
+    Args:
+        embedding_model: Model used to embed the batched texts.
+        socket_path: Path of the Unix socket to listen on.
+        max_batch_size: Maximum number of texts embedded in a single batch.
+        max_wait_ms: Maximum time the first request of a batch waits for
+            more requests before the batch is flushed.
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        socket_path: Path,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        self.embedding_model = embedding_model
+        self.socket_path = Path(socket_path)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: asyncio.Queue[_PendingRequest] | None = None
+        self._batches = 0
+        self._texts = 0
+
+    async def serve(self) -> None:
+        """Start listening and batching until cancelled."""
+
+        self._queue = asyncio.Queue()
+        self.socket_path.unlink(missing_ok=True)
+
+        server = await asyncio.start_unix_server(
+            self._handle_connection, path=str(self.socket_path)
+        )
+        batcher = asyncio.create_task(self._run_batcher())
+        logger.info(
+            f"Embedding server listening on {self.socket_path} "
+            f"(max batch size: {self.max_batch_size}, max wait: {self.max_wait * 1000:.1f} ms)"
+        )
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.socket_path.unlink(missing_ok=True)
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    payload = await _read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+
+                try:
+                    texts = json.loads(payload)["texts"]
+                    future = asyncio.get_running_loop().create_future()
+                    await self._queue.put(_PendingRequest(texts=texts, future=future))
+                    embeddings = await future
+                    response = _encode_embeddings(embeddings)
+                except Exception as e:
+                    logger.exception("Embedding request failed")
+                    response = _encode_error(str(e))
+
+                writer.write(_LENGTH.pack(len(response)) + response)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _run_batcher(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = batch[0].enqueued_at + self.max_wait
+
+            while size < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+
+            await self._embed_batch(batch)
+
+    async def _embed_batch(self, batch: list[_PendingRequest]) -> None:
+        texts = [text for request in batch for text in request.texts]
+        try:
+            embeddings = await asyncio.to_thread(
+                self.embedding_model.embed_documents, texts
+            )
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        self._batches += 1
+        self._texts += len(texts)
+        if self._batches % 1000 == 0:
+            logger.info(
+                f"Embedded {self._texts} texts in {self._batches} batches "
+                f"(avg batch size: {self._texts / self._batches:.1f})"
+            )
+
+        offset = 0
+        for request in batch:
+            count = len(request.texts)
+            if not request.future.done():
+                request.future.set_result(embeddings[offset : offset + count])
+            offset += count
+
+
+class EmbeddingServerClient(Embeddings):
+    """`Embeddings` implementation backed by a running `EmbeddingServer`.
+
+    Sync calls reuse one connection per thread; async calls open a short-lived
+    connection, which is cheap over a Unix socket.
+
+    Args:
+        socket_path: Path of the Unix socket the server listens on.
+        timeout: Socket timeout in seconds for a single request.
+    """
+
+    def __init__(self, socket_path: Path, timeout: float = 30.0) -> None:
+        self.socket_path = Path(socket_path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+
+        request = _encode_request(texts)
+        try:
+            sock = self._get_socket()
+            sock.sendall(request)
+            response = _recv_frame(sock)
+        except OSError as e:
+            self._close_socket()
+            raise ConnectionError(
+                f"Embedding server at {self.socket_path} is not reachable. "
+                "Start it with `make embedding-server`."
+            ) from e
+
+        return _decode_embeddings(response)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(str(self.socket_path)), self.timeout
+            )
+        except OSError as e:
+            raise ConnectionError(
+                f"Embedding server at {self.socket_path} is not reachable. "
+                "Start it with `make embedding-server`."
+            ) from e
+
+        try:
+            writer.write(_encode_request(texts))
+            await writer.drain()
+            response = await asyncio.wait_for(_read_frame(reader), self.timeout)
+        finally:
+            writer.close()
+
+        return _decode_embeddings(response)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def _get_socket(self) -> socket.socket:
+        sock = getattr(self._local, "socket", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(str(self.socket_path))
+            self._local.socket = sock
+        return sock
+
+    def _close_socket(self) -> None:
+        sock = getattr(self._local, "socket", None)
+        if sock is not None:
+            sock.close()
+            self._local.socket = None
+
+
+def _encode_request(texts: list[str]) -> bytes:
+    payload = json.dumps({"texts": texts}).encode("utf-8")
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def _encode_embeddings(embeddings: list[list[float]]) -> bytes:
+    rows = len(embeddings)
+    dim = len(embeddings[0]) if rows else 0
+    values = array("f", (value for embedding in embeddings for value in embedding))
+    return _HEADER.pack(rows, dim) + values.tobytes()
+
+
+def _encode_error(message: str) -> bytes:
+    return _HEADER.pack(ERROR_ROWS, 0) + message.encode("utf-8")
+
+
+def _decode_embeddings(response: bytes) -> list[list[float]]:
+    rows, dim = _HEADER.unpack_from(response)
+    body = response[_HEADER.size :]
+    if rows == ERROR_ROWS:
+        raise RuntimeError(f"Embedding server error: {body.decode('utf-8')}")
+
+    values = array("f")
+    values.frombytes(body)
+    return [values[i * dim : (i + 1) * dim].tolist() for i in range(rows)]
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return await reader.readexactly(length)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (length,) = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+    return _recv_exactly(sock, length)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionResetError("Embedding server closed the connection")
+        buffer.extend(chunk)
+    return bytes(buffer)
@@ -1,23 +1,87 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import SparseEmbeddings
+
+from src.config import settings
+from .embedding_server import EmbeddingServerClient
+from .sparse_embeddings import BM25SparseEmbeddings
+
 
 def get_embedding_model(
         model_name: str,
         device: str = "cpu",
-) -> HuggingFaceEmbeddings:
+        backend: str | None = None,
+) -> Embeddings:
     """
-    Get a HuggingFaceEmbeddings model.
+    Get the embedding model for the configured backend.
+
+    The "local" backend loads the model in-process with PyTorch, the "onnx"
+    backend runs the exported ONNX model on CPU without importing PyTorch, and
+    the "server" backend delegates to the node-local embedding server shared
+    by all workers.
     """
-    return get_huggingface_embedding_model(model_name, device)
+    backend = backend or settings.RAG_EMBEDDING_BACKEND
+
+    if backend == "local":
+        return get_huggingface_embedding_model(model_name, device)
+    if backend == "onnx":
+        return get_onnx_embedding_model(
+            model_id=model_name,
+            model_dir=settings.RAG_ONNX_MODEL_DIR,
+            quantized=settings.RAG_ONNX_QUANTIZED,
+        )
+    if backend == "server":
+        return EmbeddingServerClient(socket_path=settings.RAG_EMBEDDING_SERVER_SOCKET_PATH)
+
+    raise ValueError(f"Unknown embedding backend: {backend}")
 
 def get_huggingface_embedding_model(
         model_id: str,
         device: str = "cpu",
-) -> HuggingFaceEmbeddings:
+) -> Embeddings:
     """
     Get a HuggingFaceEmbeddings model.
     """
+    # Imported lazily so the ONNX and server backends never load PyTorch.
+    from langchain_huggingface import HuggingFaceEmbeddings
+
     return HuggingFaceEmbeddings(
         model_name=model_id,
         model_kwargs={"device": device, "trust_remote_code": True},
         encode_kwargs={"normalize_embeddings": False},
-    )
\ No newline at end of file
+    )
+
+def get_onnx_embedding_model(
+        model_id: str,
+        model_dir: Path,
+        quantized: bool = True,
+        num_threads: int | None = None,
+) -> Embeddings:
+    """
+    Get an ONNX Runtime embedding model, checking it was exported from `model_id`.
+    """
+    from .onnx_embeddings import OnnxEmbeddings
+
+    return OnnxEmbeddings(
+        model_dir=model_dir,
+        model_id=model_id,
+        dimension=settings.RAG_TEXT_EMBEDDING_MODEL_DIM,
+        quantized=quantized,
+        num_threads=settings.RAG_ONNX_NUM_THREADS if num_threads is None else num_threads,
+    )
+
+def get_sparse_embedding_model(
+        retrieval_mode: str | None = None,
+) -> SparseEmbeddings | None:
+    """
+    Get the sparse embedding model used by hybrid retrieval, if enabled.
+    """
+    retrieval_mode = retrieval_mode or settings.RAG_RETRIEVAL_MODE
+
+    if retrieval_mode == "dense":
+        return None
+    if retrieval_mode == "hybrid":
+        return BM25SparseEmbeddings()
+
+    raise ValueError(f"Unknown retrieval mode: {retrieval_mode}")
@@ -0,0 +1,157 @@
+"""
+PyTorch-free embedding backend running an exported ONNX sentence-transformer.
+
+The model directory is produced by `tools/export_onnx_embedding_model.py` and
+contains `model.onnx`, optionally `model_quantized.onnx` (int8), the fast
+tokenizer definition in `tokenizer.json`, and the id and dimension of the
+exported model in `model_info.json`.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+MODEL_FILE_NAME = "model.onnx"
+QUANTIZED_MODEL_FILE_NAME = "model_quantized.onnx"
+TOKENIZER_FILE_NAME = "tokenizer.json"
+MODEL_INFO_FILE_NAME = "model_info.json"
+
+
+class OnnxEmbeddings(Embeddings):
+    """Mean-pooled sentence embeddings computed with ONNX Runtime on CPU.
+
+    Mirrors the sentence-transformers pipeline of MiniLM-style models
+    (transformer -> mean pooling -> L2 normalization), so vectors are
+    interchangeable with the ones stored by the PyTorch backend.
+
+    Args:
+        model_dir: Directory containing the exported model and tokenizer.
+        model_id: Expected Hugging Face id of the exported model. Loading fails if
+            the directory holds another model, so vectors of different models
+            are never mixed in one collection.
+        dimension: Expected embedding dimension, checked the same way.
+        quantized: Whether to load the int8-quantized model.
+        max_seq_length: Maximum number of tokens per text; longer texts are truncated.
+        batch_size: Number of texts encoded per inference call.
+        normalize: Whether to L2-normalize the pooled embeddings.
+        num_threads: Intra-op threads used by ONNX Runtime. 0 lets it decide.
+    """
+
+    def __init__(
+        self,
+        model_dir: Path,
+        model_id: str | None = None,
+        dimension: int | None = None,
+        quantized: bool = True,
+        max_seq_length: int = 256,
+        batch_size: int = 32,
+        normalize: bool = True,
+        num_threads: int = 0,
+    ) -> None:
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX embedding backend requires `onnxruntime` and `tokenizers`. "
+                "Install them with `uv sync --extra onnx`."
+            ) from e
+
+        model_dir = Path(model_dir)
+        model_path = model_dir / (QUANTIZED_MODEL_FILE_NAME if quantized else MODEL_FILE_NAME)
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX model not found at {model_path}. "
+                "Export it with `make export-onnx-embedding-model`."
+            )
+        check_model_info(model_dir, model_id=model_id, dimension=dimension)
+
+        self.batch_size = batch_size
+        self.normalize = normalize
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / TOKENIZER_FILE_NAME))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            str(model_path),
+            sess_options=session_options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        logger.info(f"Loaded ONNX embedding model from {model_path}")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            embeddings.extend(self._encode(texts[start : start + self.batch_size]).tolist())
+        return embeddings
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._encode([text])[0].tolist()
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array(
+            [encoding.attention_mask for encoding in encodings], dtype=np.int64
+        )
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array(
+                [encoding.type_ids for encoding in encodings], dtype=np.int64
+            )
+
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        mask = attention_mask[..., None].astype(token_embeddings.dtype)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(
+            mask.sum(axis=1), 1e-9, None
+        )
+        if self.normalize:
+            embeddings /= np.clip(
+                np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None
+            )
+
+        return embeddings
+
+
+def check_model_info(
+    model_dir: Path, model_id: str | None = None, dimension: int | None = None
+) -> None:
+    """Check that the model exported in `model_dir` is the expected one.
+
+    Raises:
+        ValueError: If the export has no model info, or if its model id or
+            dimension differ from the expected ones.
+    """
+
+    if model_id is None and dimension is None:
+        return
+
+    info_path = Path(model_dir) / MODEL_INFO_FILE_NAME
+    if not info_path.exists():
+        raise ValueError(
+            f"No {MODEL_INFO_FILE_NAME} in {model_dir}, so the exported model can't be "
+            "checked. Re-export it with `make export-onnx-embedding-model`."
+        )
+
+    info = json.loads(info_path.read_text())
+    if model_id is not None and info.get("model_id") != model_id:
+        raise ValueError(
+            f"The ONNX model in {model_dir} was exported from '{info.get('model_id')}', "
+            f"not '{model_id}'. Re-export it with `make export-onnx-embedding-model`."
+        )
+    if dimension is not None and info.get("dimension") != dimension:
+        raise ValueError(
+            f"The ONNX model in {model_dir} has dimension {info.get('dimension')}, "
+            f"not {dimension}."
+        )
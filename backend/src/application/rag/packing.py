@@ -0,0 +1,110 @@
+import numpy as np
+from langchain_core.documents import Document
+
+from src.application.metrics import metrics
+from src.config import settings
+
+
+class ContextPacker:
+    """Selects retrieved chunks for the prompt under a token budget.
+
+    Over-fetched candidates are ranked with maximal marginal relevance (MMR), so
+    near-duplicate chunks are skipped in favour of ones adding new information.
+    Candidates below the relevance cutoff are dropped, and chunks are added until
+    the token budget or the chunk limit is reached, which makes k adaptive.
+
+    Token counts are read from the `token_count` metadata written at ingestion.
+
+    Args:
+        token_budget: Maximum number of context tokens added to the prompt.
+        max_chunks: Maximum number of chunks returned.
+        lambda_mult: Trade-off between relevance (1.0) and diversity (0.0).
+        min_relevance: Minimum cosine similarity between query and chunk.
+        duplicate_similarity: Chunks at least this similar to an already
+            selected chunk are dropped outright.
+        baseline_k: Number of chunks a plain top-k search would return. Used to
+            report the prompt tokens saved by packing.
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        max_chunks: int,
+        lambda_mult: float = 0.7,
+        min_relevance: float = 0.2,
+        duplicate_similarity: float = 0.95,
+        baseline_k: int = 3,
+    ) -> None:
+        self.token_budget = token_budget
+        self.max_chunks = max_chunks
+        self.lambda_mult = lambda_mult
+        self.min_relevance = min_relevance
+        self.duplicate_similarity = duplicate_similarity
+        self.baseline_k = baseline_k
+
+    @classmethod
+    def build_from_settings(cls) -> "ContextPacker":
+        return cls(
+            token_budget=settings.RAG_CONTEXT_TOKEN_BUDGET,
+            max_chunks=settings.RAG_MAX_CONTEXT_CHUNKS,
+            lambda_mult=settings.RAG_MMR_LAMBDA,
+            min_relevance=settings.RAG_MIN_RELEVANCE,
+            duplicate_similarity=settings.RAG_DUPLICATE_SIMILARITY,
+            baseline_k=settings.RAG_TOP_K,
+        )
+
+    def pack(
+        self,
+        query_vector: list[float],
+        documents: list[Document],
+        vectors: list[list[float]],
+    ) -> list[Document]:
+        """Pack the candidates, given in retrieval order, into the token budget."""
+
+        if not documents:
+            return []
+
+        query = _normalize(np.asarray(query_vector, dtype=np.float32)[None, :])[0]
+        candidates = _normalize(np.asarray(vectors, dtype=np.float32))
+        relevance = candidates @ query
+        similarity = candidates @ candidates.T
+        token_counts = [count_document_tokens(document) for document in documents]
+
+        selected: list[int] = []
+        remaining = [i for i in range(len(documents)) if relevance[i] >= self.min_relevance]
+        tokens_used = 0
+        while remaining and len(selected) < self.max_chunks:
+            if selected:
+                redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining))
+            scores = self.lambda_mult * relevance[remaining] - (1 - self.lambda_mult) * redundancy
+
+            best = remaining.pop(int(np.argmax(scores)))
+            if selected and similarity[best, selected].max() >= self.duplicate_similarity:
+                continue
+            if tokens_used + token_counts[best] > self.token_budget:
+                continue
+
+            selected.append(best)
+            tokens_used += token_counts[best]
+
+        baseline_tokens = sum(token_counts[: self.baseline_k])
+        metrics.observe("rag.context_tokens", tokens_used)
+        metrics.observe("rag.context_tokens_saved", baseline_tokens - tokens_used)
+        metrics.observe("rag.context_chunks", len(selected))
+
+        return [documents[i] for i in selected]
+
+
+def count_document_tokens(document: Document) -> int:
+    token_count = document.metadata.get("token_count")
+    if token_count is not None:
+        return int(token_count)
+
+    # Chunks ingested before token counts were stored: ~4 characters per token.
+    return len(document.page_content) // 4 + 1
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
@@ -0,0 +1,85 @@
+"""
+Shared Qdrant clients for the RAG layer.
+
+Clients are created once per process (and, for the async client, once per event
+loop) so every retriever reuses the same connection pool instead of opening new
+connections per request. The collection existence check is cached for the same
+reason.
+"""
+
+import asyncio
+import weakref
+from functools import lru_cache
+from typing import Any
+
+import httpx
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+from src.config import settings
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncQdrantClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_ready_collections: set[str] = set()
+
+
+def _get_client_kwargs() -> dict[str, Any]:
+    kwargs: dict[str, Any] = {
+        "url": settings.QDRANT_URL,
+        "api_key": settings.QDRANT_API_KEY,
+        "timeout": settings.QDRANT_TIMEOUT,
+        "prefer_grpc": settings.QDRANT_PREFER_GRPC,
+        "grpc_port": settings.QDRANT_GRPC_PORT,
+    }
+    if not settings.QDRANT_PREFER_GRPC:
+        # By default qdrant-client disables keep-alive for local instances, which
+        # opens a new connection per request. Keep a warm pool instead.
+        kwargs["limits"] = httpx.Limits(
+            max_connections=settings.QDRANT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.QDRANT_MAX_CONNECTIONS,
+        )
+
+    return kwargs
+
+
+@lru_cache(maxsize=1)
+def get_qdrant_client() -> QdrantClient:
+    """
+    Get the process-wide synchronous Qdrant client.
+    """
+    return QdrantClient(**_get_client_kwargs())
+
+
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    """
+    Get the async Qdrant client bound to the running event loop.
+
+    Connection pools can't be shared across event loops, so one client is kept
+    per loop and dropped together with it.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncQdrantClient(**_get_client_kwargs())
+        _async_clients[loop] = client
+
+    return client
+
+
+def is_collection_ready(collection_name: str) -> bool:
+    """
+    Check whether a collection was already provisioned by this process.
+    """
+    return collection_name in _ready_collections
+
+
+def mark_collection_ready(collection_name: str) -> None:
+    _ready_collections.add(collection_name)
+
+
+def delete_collection(collection_name: str) -> None:
+    """
+    Delete a collection and invalidate its cached existence check.
+    """
+    _ready_collections.discard(collection_name)
+    get_qdrant_client().delete_collection(collection_name)
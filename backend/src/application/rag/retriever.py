@@ -1,10 +1,159 @@
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
+from langchain_qdrant import QdrantVectorStore, RetrievalMode, SparseEmbeddings, SparseVector
+from qdrant_client import QdrantClient, models
 from langchain.schema.retriever import BaseRetriever
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
 from src.config import settings
-from .embeddings import get_embedding_model
+from .embeddings import get_embedding_model, get_sparse_embedding_model
+from .packing import ContextPacker
+from .vector_index import VectorIndexConfig
+from .qdrant import (
+    get_async_qdrant_client,
+    get_qdrant_client,
+    is_collection_ready,
+    mark_collection_ready,
+)
+
+AGENT_ID_PAYLOAD_KEY = "metadata.agent_id"
+
+
+class AsyncQdrantRetriever(BaseRetriever):
+    """
+    Qdrant retriever for the request path.
+
+    Async searches go through the shared `AsyncQdrantClient`, so they run
+    concurrently with other I/O instead of blocking the event loop. Sync
+    searches fall back to the shared synchronous client.
+
+    When a sparse embedding model is set, the retriever runs in hybrid mode:
+    dense and sparse candidates are fetched in one request and fused with
+    reciprocal rank fusion.
+
+    When a context packer is set, `fetch_k` candidates are fetched with their
+    vectors and the packer picks the chunks that fit the prompt token budget.
+    """
+
+    embedding: Embeddings
+    collection_name: str
+    k: int = 3
+    sparse_embedding: SparseEmbeddings | None = None
+    sparse_vector_name: str = settings.RAG_SPARSE_VECTOR_NAME
+    prefetch_k: int = settings.RAG_HYBRID_PREFETCH_K
+    search_params: models.SearchParams | None = None
+    packer: ContextPacker | None = None
+    fetch_k: int = settings.RAG_FETCH_K
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        filter: models.Filter | None = None,
+    ) -> list[Document]:
+        dense_vector = self.embedding.embed_query(query)
+        sparse_vector = (
+            self.sparse_embedding.embed_query(query) if self.sparse_embedding else None
+        )
+        response = get_qdrant_client().query_points(
+            **self._build_query(dense_vector, sparse_vector, filter)
+        )
+
+        return self._select_documents(dense_vector, response.points)
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        filter: models.Filter | None = None,
+    ) -> list[Document]:
+        dense_vector = await self.embedding.aembed_query(query)
+
+        return await self.asearch(query, dense_vector, filter=filter)
+
+    async def asearch(
+        self,
+        query: str,
+        dense_vector: list[float],
+        filter: models.Filter | None = None,
+    ) -> list[Document]:
+        """
+        Search with a query whose dense embedding the caller already computed.
+        """
+        sparse_vector = (
+            self.sparse_embedding.embed_query(query) if self.sparse_embedding else None
+        )
+        response = await get_async_qdrant_client().query_points(
+            **self._build_query(dense_vector, sparse_vector, filter)
+        )
+
+        return self._select_documents(dense_vector, response.points)
+
+    def _build_query(
+        self,
+        dense_vector: list[float],
+        sparse_vector: SparseVector | None,
+        filter: models.Filter | None,
+    ) -> dict:
+        limit = self.fetch_k if self.packer else self.k
+        query = {
+            "collection_name": self.collection_name,
+            "limit": limit,
+            "with_payload": True,
+            "with_vectors": self.packer is not None,
+        }
+        if sparse_vector is None:
+            return query | {
+                "query": dense_vector,
+                "query_filter": filter,
+                "search_params": self.search_params,
+            }
+
+        return query | {
+            "prefetch": [
+                models.Prefetch(
+                    query=dense_vector,
+                    filter=filter,
+                    params=self.search_params,
+                    limit=max(self.prefetch_k, limit),
+                ),
+                models.Prefetch(
+                    query=models.SparseVector(
+                        indices=sparse_vector.indices, values=sparse_vector.values
+                    ),
+                    using=self.sparse_vector_name,
+                    filter=filter,
+                    limit=max(self.prefetch_k, limit),
+                ),
+            ],
+            "query": models.FusionQuery(fusion=models.Fusion.RRF),
+        }
+
+    def _select_documents(
+        self, dense_vector: list[float], points: list[models.ScoredPoint]
+    ) -> list[Document]:
+        documents = [self._to_document(point) for point in points]
+        if self.packer is None:
+            return documents
+
+        # The unnamed dense vector comes back under the "" key next to the sparse one.
+        vectors = [
+            point.vector[""] if isinstance(point.vector, dict) else point.vector
+            for point in points
+        ]
+        return self.packer.pack(dense_vector, documents, vectors)
+
+    def _to_document(self, point: models.ScoredPoint) -> Document:
+        payload = point.payload or {}
+        metadata = dict(payload.get("metadata") or {})
+        metadata["_id"] = point.id
+
+        return Document(page_content=payload.get("page_content", ""), metadata=metadata)
 
 
 def get_retriever(
@@ -33,51 +182,108 @@ def get_qdrant_retriever(
         model_name=embedding_model_id,
         device=device
     )
+    ensure_collection()
+
+    # In hybrid mode the vector store also writes the BM25 sparse vectors at ingestion.
+    sparse_embedding_model = get_sparse_embedding_model()
+    vector_store = QdrantVectorStore(
+        client=get_qdrant_client(),
+        collection_name=settings.QDRANT_COLLECTION_NAME,
+        embedding=embedding_model,
+        retrieval_mode=(
+            RetrievalMode.HYBRID if sparse_embedding_model else RetrievalMode.DENSE
+        ),
+        sparse_embedding=sparse_embedding_model,
+        sparse_vector_name=settings.RAG_SPARSE_VECTOR_NAME,
+    )
     
-    # Configure Qdrant client based on whether API key is provided
-    if settings.QDRANT_API_KEY:
-        # Use Qdrant Cloud
-        qdrant_client = QdrantClient(
-            url=settings.QDRANT_URL,
-            api_key=settings.QDRANT_API_KEY,
-        )
-    else:
-        # Use local Qdrant
-        qdrant_client = QdrantClient(
-            url=settings.QDRANT_URL,
-        )
-    
-    # Check if collection exists, create if not
-    try:
-        qdrant_client.get_collection(settings.QDRANT_COLLECTION_NAME)
-        collection_exists = True
-    except Exception:
-        collection_exists = False
-    
-    if not collection_exists:
-        # Create collection using from_documents with a dummy document
-        if settings.QDRANT_API_KEY:
-            # Use Qdrant Cloud
-            vector_store = QdrantVectorStore.from_documents(
-                documents=[Document(page_content="dummy", metadata={})],
-                embedding=embedding_model,
-                url=settings.QDRANT_URL,
-                api_key=settings.QDRANT_API_KEY,
-                collection_name=settings.QDRANT_COLLECTION_NAME,
-            )
-        else:
-            # Use local Qdrant
-            vector_store = QdrantVectorStore.from_documents(
-                documents=[Document(page_content="dummy", metadata={})],
-                embedding=embedding_model,
-                url=settings.QDRANT_URL,
-                collection_name=settings.QDRANT_COLLECTION_NAME,
-            )
-    else:
-        vector_store = QdrantVectorStore(
-            client=qdrant_client,
+    return vector_store.as_retriever(search_kwargs={"k": k})
+
+
+def get_async_retriever(
+    embedding_model_id: str,
+    k: int = 3,
+    device: str = "cpu",
+) -> AsyncQdrantRetriever:
+    """
+    Get a Qdrant retriever backed by the shared async client.
+    """
+    embedding_model = get_embedding_model(
+        model_name=embedding_model_id,
+        device=device
+    )
+    ensure_collection()
+
+    return AsyncQdrantRetriever(
+        embedding=embedding_model,
+        collection_name=settings.QDRANT_COLLECTION_NAME,
+        k=k,
+        sparse_embedding=get_sparse_embedding_model(),
+        search_params=VectorIndexConfig.build_from_settings().search_params(),
+        packer=ContextPacker.build_from_settings() if settings.RAG_CONTEXT_PACKING else None,
+    )
+
+
+def ensure_collection() -> None:
+    """
+    Make sure the collection and its payload indexes exist.
+
+    Qdrant is only asked once per process; later calls hit the cached result.
+    """
+    if is_collection_ready(settings.QDRANT_COLLECTION_NAME):
+        return
+
+    qdrant_client = get_qdrant_client()
+    if not qdrant_client.collection_exists(settings.QDRANT_COLLECTION_NAME):
+        # The BM25 sparse vector is always provisioned so switching to hybrid
+        # retrieval only needs a re-ingestion, not a new collection layout.
+        vector_index_config = VectorIndexConfig.build_from_settings()
+        qdrant_client.create_collection(
             collection_name=settings.QDRANT_COLLECTION_NAME,
-            embedding=embedding_model,
+            vectors_config=vector_index_config.vectors_config(),
+            hnsw_config=vector_index_config.hnsw_config(),
+            quantization_config=vector_index_config.quantization_config(),
+            sparse_vectors_config={
+                settings.RAG_SPARSE_VECTOR_NAME: models.SparseVectorParams(
+                    modifier=models.Modifier.IDF,
+                ),
+            },
         )
-    
-    return vector_store.as_retriever(search_kwargs={"k": k})
+
+    ensure_agent_id_index(qdrant_client)
+    mark_collection_ready(settings.QDRANT_COLLECTION_NAME)
+
+
+def ensure_agent_id_index(qdrant_client: QdrantClient) -> None:
+    """
+    Create the keyword payload index on the agent id if it is missing.
+
+    The index is marked as a tenant index, so Qdrant co-locates each agent's
+    points and agent-filtered searches only touch that agent's partition.
+    """
+    collection_info = qdrant_client.get_collection(settings.QDRANT_COLLECTION_NAME)
+    if AGENT_ID_PAYLOAD_KEY in (collection_info.payload_schema or {}):
+        return
+
+    qdrant_client.create_payload_index(
+        collection_name=settings.QDRANT_COLLECTION_NAME,
+        field_name=AGENT_ID_PAYLOAD_KEY,
+        field_schema=models.KeywordIndexParams(
+            type=models.KeywordIndexType.KEYWORD,
+            is_tenant=True,
+        ),
+    )
+
+
+def get_agent_filter(agent_id: str) -> models.Filter:
+    """
+    Get a Qdrant filter restricting a search to the chunks of a single agent.
+    """
+    return models.Filter(
+        must=[
+            models.FieldCondition(
+                key=AGENT_ID_PAYLOAD_KEY,
+                match=models.MatchValue(value=agent_id),
+            )
+        ]
+    )
@@ -0,0 +1,257 @@
+"""
+Local routing of the player messages that need the agent's documents.
+
+Instead of letting the conversation model decide with a tool call whether to
+retrieve, which costs an extra LLM round trip on every RAG turn, the router
+decides up front, on CPU, from the embedding of the message: either by its
+similarity to the topic centroids of the agent's chunks, or with a small
+logistic regression trained on the tool-call decisions logged in shadow mode.
+"""
+
+import json
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+from loguru import logger
+from qdrant_client import models
+
+from src.config import settings
+
+from .qdrant import get_qdrant_client
+from .retriever import AGENT_ID_PAYLOAD_KEY
+
+
+class LogisticRegression:
+    """Binary logistic regression fitted by gradient descent.
+
+    Args:
+        weights: Weights of the features.
+        bias: Intercept.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: float) -> None:
+        self.weights = weights
+        self.bias = bias
+
+    @classmethod
+    def fit(
+        cls,
+        features: np.ndarray,
+        labels: np.ndarray,
+        l2: float = 1e-3,
+        learning_rate: float = 0.5,
+        epochs: int = 500,
+    ) -> "LogisticRegression":
+        # Classes are weighted by their inverse frequency, as most turns don't retrieve.
+        positive_rate = float(np.clip(labels.mean(), 1e-3, 1 - 1e-3))
+        sample_weights = np.where(labels == 1, 0.5 / positive_rate, 0.5 / (1 - positive_rate))
+
+        weights = np.zeros(features.shape[1])
+        bias = 0.0
+        for _ in range(epochs):
+            errors = (_sigmoid(features @ weights + bias) - labels) * sample_weights
+            weights -= learning_rate * (features.T @ errors / len(labels) + l2 * weights)
+            bias -= learning_rate * float(errors.mean())
+
+        return cls(weights, bias)
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        return _sigmoid(features @ self.weights + self.bias)
+
+
+class RagRouter:
+    """Decides whether a player message needs the agent's documents.
+
+    Args:
+        centroids: Unit-norm topic centroids of the chunks of each agent.
+        threshold: Score above which the documents are retrieved.
+        classifier: Classifier scoring the messages. Without it, the score is
+            the highest cosine similarity to the agent's centroids.
+    """
+
+    def __init__(
+        self,
+        centroids: dict[str, np.ndarray],
+        threshold: float,
+        classifier: LogisticRegression | None = None,
+    ) -> None:
+        self.centroids = centroids
+        self.threshold = threshold
+        self.classifier = classifier
+
+    @classmethod
+    def load(cls, path: Path) -> "RagRouter":
+        data = np.load(path, allow_pickle=False)
+        agent_ids = data["agent_ids"]
+        centroid_agents = data["centroid_agents"]
+        centroids = {
+            str(agent_id): data["centroids"][centroid_agents == i]
+            for i, agent_id in enumerate(agent_ids)
+        }
+        classifier = None
+        if "classifier_weights" in data:
+            classifier = LogisticRegression(
+                data["classifier_weights"], float(data["classifier_bias"])
+            )
+
+        return cls(centroids, float(data["threshold"]), classifier)
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        agent_ids = sorted(self.centroids)
+        arrays = {
+            "agent_ids": np.array(agent_ids),
+            "centroids": np.concatenate([self.centroids[agent_id] for agent_id in agent_ids]),
+            "centroid_agents": np.concatenate(
+                [np.full(len(self.centroids[agent_id]), i) for i, agent_id in enumerate(agent_ids)]
+            ),
+            "threshold": np.array(self.threshold),
+        }
+        if self.classifier is not None:
+            arrays["classifier_weights"] = self.classifier.weights
+            arrays["classifier_bias"] = np.array(self.classifier.bias)
+
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    def get_topic_similarity(self, agent_id: str, vector: np.ndarray) -> float:
+        centroids = self.centroids.get(agent_id)
+        if centroids is None or not len(centroids):
+            return 0.0
+
+        return float((centroids @ _normalize(vector)).max())
+
+    def get_features(self, agent_id: str, vector: np.ndarray) -> np.ndarray:
+        return np.append(_normalize(vector), self.get_topic_similarity(agent_id, vector))
+
+    def score(self, agent_id: str, vector: np.ndarray) -> float:
+        if self.classifier is not None:
+            return float(self.classifier.predict_proba(self.get_features(agent_id, vector)))
+
+        return self.get_topic_similarity(agent_id, vector)
+
+    def should_retrieve(self, agent_id: str, vector: list[float]) -> tuple[bool, float]:
+        """Decide whether to retrieve the agent's documents for a message.
+
+        Agents the router has no topics for always retrieve.
+
+        Args:
+            agent_id: Agent the player talks to.
+            vector: Dense embedding of the player message.
+
+        Returns:
+            tuple[bool, float]: The decision and its score.
+        """
+
+        if agent_id not in self.centroids:
+            return True, 1.0
+
+        score = self.score(agent_id, np.asarray(vector, dtype=np.float32))
+        return score >= self.threshold, score
+
+
+@lru_cache(maxsize=1)
+def get_rag_router() -> RagRouter | None:
+    """
+    Get the router trained by `make train-rag-router`, if there is one.
+    """
+    if not settings.RAG_ROUTER_PATH.exists():
+        logger.warning(
+            f"No RAG router at {settings.RAG_ROUTER_PATH}: every message retrieves. "
+            "Train one with `make train-rag-router`."
+        )
+        return None
+
+    return RagRouter.load(settings.RAG_ROUTER_PATH)
+
+
+def get_topic_centroids(vectors: np.ndarray, num_topics: int, seed: int = 0) -> np.ndarray:
+    """Cluster unit-norm vectors with spherical k-means.
+
+    Args:
+        vectors: Vectors of an agent's chunks.
+        num_topics: Maximum number of centroids.
+        seed: Seed of the initial centroids.
+
+    Returns:
+        np.ndarray: Unit-norm centroids, one per row.
+    """
+
+    vectors = _normalize(vectors)
+    num_topics = min(num_topics, len(vectors))
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), num_topics, replace=False)]
+    for _ in range(20):
+        assignments = (vectors @ centroids.T).argmax(axis=1)
+        for topic in range(num_topics):
+            members = vectors[assignments == topic]
+            if len(members):
+                centroids[topic] = _normalize(members.sum(axis=0))
+
+    return centroids
+
+
+def build_topic_centroids(agent_ids: list[str], num_topics: int) -> dict[str, np.ndarray]:
+    """
+    Cluster the dense vectors of each agent's chunks in the long-term memory.
+    """
+    centroids = {}
+    for agent_id in agent_ids:
+        vectors = list(iter_agent_vectors(agent_id))
+        if not vectors:
+            logger.warning(f"No chunks in the long-term memory for agent {agent_id}")
+            continue
+        centroids[agent_id] = get_topic_centroids(np.asarray(vectors, dtype=np.float32), num_topics)
+
+    return centroids
+
+
+def iter_agent_vectors(agent_id: str, batch_size: int = 256) -> Iterator[list[float]]:
+    client = get_qdrant_client()
+    scroll_filter = models.Filter(
+        must=[models.FieldCondition(key=AGENT_ID_PAYLOAD_KEY, match=models.MatchValue(value=agent_id))]
+    )
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            scroll_filter=scroll_filter,
+            limit=batch_size,
+            offset=offset,
+            with_payload=False,
+            with_vectors=True,
+        )
+        for point in points:
+            # The unnamed dense vector comes back under the "" key next to the sparse one.
+            yield point.vector[""] if isinstance(point.vector, dict) else point.vector
+
+        if offset is None:
+            return
+
+
+def log_rag_decision(record: dict[str, Any]) -> None:
+    """
+    Append a routing decision to the decisions log, for training and evaluation.
+    """
+    path = settings.RAG_ROUTER_DECISIONS_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"time": time.time(), **record}, ensure_ascii=False) + "\n")
+
+
+def load_rag_decisions(path: Path) -> list[dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.endswith("\n")]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-x))
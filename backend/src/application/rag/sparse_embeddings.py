@@ -0,0 +1,66 @@
+import re
+import zlib
+from collections import Counter
+
+from langchain_qdrant import SparseEmbeddings, SparseVector
+
+# Words too common to help exact-match retrieval. IDF would push their weight
+# towards zero anyway; dropping them keeps the sparse vectors small.
+STOPWORDS = frozenset(
+    """a an and are as at be but by for from had has have he her his i in is it its
+    of on or she that the their there they this to was were which who will with""".split()
+)
+
+
+class BM25SparseEmbeddings(SparseEmbeddings):
+    """Local BM25 sparse embeddings for Qdrant named sparse vectors.
+
+    Documents are encoded with the BM25 term-frequency saturation and length
+    normalization; queries only mark which terms are present. The IDF part of
+    BM25 is computed by Qdrant over the whole collection, so the sparse vector
+    must be configured with the `IDF` modifier.
+
+    Tokens are mapped to sparse indices with a stable 32-bit hash, so no
+    vocabulary has to be fitted or stored and exact names, products and years
+    ("NeXT", "1998") become their own dimensions.
+
+    Args:
+        k1: Term-frequency saturation parameter.
+        b: Document-length normalization parameter.
+        avg_doc_length: Expected average number of tokens per document.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_doc_length: float = 150.0) -> None:
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = avg_doc_length
+
+    def embed_documents(self, texts: list[str]) -> list[SparseVector]:
+        return [self._embed_document(text) for text in texts]
+
+    def embed_query(self, text: str) -> SparseVector:
+        indices = sorted({_token_index(token) for token in tokenize(text)})
+        return SparseVector(indices=indices, values=[1.0] * len(indices))
+
+    def _embed_document(self, text: str) -> SparseVector:
+        tokens = tokenize(text)
+        length_norm = 1 - self.b + self.b * len(tokens) / self.avg_doc_length
+
+        weights: dict[int, float] = {}
+        for token, tf in Counter(tokens).items():
+            index = _token_index(token)
+            # Hash collisions simply add up, like repeated terms would.
+            weights[index] = weights.get(index, 0.0) + tf * (self.k1 + 1) / (
+                tf + self.k1 * length_norm
+            )
+
+        indices = sorted(weights)
+        return SparseVector(indices=indices, values=[weights[index] for index in indices])
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in re.findall(r"\w+", text.lower()) if token not in STOPWORDS]
+
+
+def _token_index(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8"))
@@ -0,0 +1,113 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+from qdrant_client import models
+
+from src.config import settings
+
+
+class VectorIndexConfig(BaseModel):
+    """Storage, HNSW and quantization settings of the dense vector index.
+
+    Collection-level settings are applied when the collection is created;
+    search-level settings (`search_hnsw_ef`, rescoring and oversampling) are
+    applied to every query.
+
+    Args:
+        dim: Dimension of the dense vectors.
+        hnsw_m: Number of edges per node in the HNSW graph.
+        hnsw_ef_construct: Size of the candidate list used while building the graph.
+        hnsw_payload_m: Edges per node of the per-tenant (agent) graphs. Enables
+            payload-aware HNSW links for the agent filter when set.
+        search_hnsw_ef: Size of the candidate list used at search time.
+        on_disk: Whether the original vectors are memory-mapped from disk.
+        quantization: Quantization applied to the vectors: "none", "scalar" or "binary".
+        quantization_always_ram: Whether the quantized vectors are pinned in RAM.
+        rescore: Whether candidates found with quantized vectors are rescored
+            with the original vectors.
+        oversampling: Factor by which the candidate list is enlarged before rescoring.
+    """
+
+    dim: int = Field(description="Dimension of the dense vectors")
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    hnsw_payload_m: int | None = None
+    search_hnsw_ef: int | None = None
+    on_disk: bool = False
+    quantization: Literal["none", "scalar", "binary"] = "none"
+    quantization_always_ram: bool = True
+    rescore: bool = True
+    oversampling: float = 2.0
+
+    @classmethod
+    def build_from_settings(cls) -> "VectorIndexConfig":
+        return cls(
+            dim=settings.RAG_TEXT_EMBEDDING_MODEL_DIM,
+            hnsw_m=settings.QDRANT_HNSW_M,
+            hnsw_ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT,
+            hnsw_payload_m=settings.QDRANT_HNSW_PAYLOAD_M,
+            search_hnsw_ef=settings.QDRANT_SEARCH_HNSW_EF,
+            on_disk=settings.QDRANT_ON_DISK_VECTORS,
+            quantization=settings.QDRANT_QUANTIZATION,
+            quantization_always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM,
+            rescore=settings.QDRANT_QUANTIZATION_RESCORE,
+            oversampling=settings.QDRANT_QUANTIZATION_OVERSAMPLING,
+        )
+
+    def vectors_config(self) -> models.VectorParams:
+        return models.VectorParams(
+            size=self.dim,
+            distance=models.Distance.COSINE,
+            on_disk=self.on_disk,
+        )
+
+    def hnsw_config(self) -> models.HnswConfigDiff:
+        return models.HnswConfigDiff(
+            m=self.hnsw_m,
+            ef_construct=self.hnsw_ef_construct,
+            payload_m=self.hnsw_payload_m,
+        )
+
+    def quantization_config(self) -> models.QuantizationConfig | None:
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=self.quantization_always_ram,
+                )
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(
+                    always_ram=self.quantization_always_ram,
+                )
+            )
+
+        return None
+
+    def search_params(self) -> models.SearchParams:
+        quantization = None
+        if self.quantization != "none":
+            quantization = models.QuantizationSearchParams(
+                rescore=self.rescore,
+                oversampling=self.oversampling,
+            )
+
+        return models.SearchParams(hnsw_ef=self.search_hnsw_ef, quantization=quantization)
+
+    def estimate_memory_bytes(self, num_vectors: int) -> int:
+        """Estimate the RAM used by the dense index for `num_vectors` vectors."""
+
+        memory = 0
+        if not self.on_disk:
+            memory += num_vectors * self.dim * 4
+        if self.quantization == "scalar" and self.quantization_always_ram:
+            memory += num_vectors * self.dim
+        elif self.quantization == "binary" and self.quantization_always_ram:
+            memory += num_vectors * self.dim // 8
+
+        # Level-0 links dominate the HNSW graph: 2 * m neighbours of 4 bytes each.
+        memory += num_vectors * 2 * self.hnsw_m * 4
+
+        return memory
@@ -0,0 +1,58 @@
+"""
+Token-bucket rate limiting of outgoing requests.
+
+Coroutines share one bucket per rate-limited API: each request takes a token,
+and tokens refill at the allowed rate, so bursts up to the bucket size go out
+at once and sustained traffic stays under the limit. When the API still
+answers with a rate limit, the whole bucket is paused for the delay it asks
+for instead of every caller retrying on its own.
+"""
+
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """Token bucket shared by the coroutines of one event loop.
+
+    Args:
+        rate: Requests allowed per second.
+        burst: Maximum number of requests sent at once after an idle period.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: int = 1) -> "AsyncRateLimiter":
+        return cls(rate=requests_per_minute / 60, burst=burst)
+
+    async def acquire(self) -> None:
+        """Wait for a token. Waiters are served in arrival order."""
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every request for `seconds`, e.g. after a rate-limit response."""
+
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self._updated_at = self._paused_until
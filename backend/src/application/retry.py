@@ -0,0 +1,46 @@
+"""
+Retry policy of the Groq API calls.
+"""
+
+import random
+
+import groq
+
+
+def get_retry_delay(
+    error: BaseException | None,
+    attempt: int,
+    base_backoff: float = 1.0,
+    max_backoff: float = 60.0,
+) -> float | None:
+    """
+    Seconds to wait before retrying after `error`, or None if it isn't transient.
+
+    Rate limits honor the delay Groq asks for. Connection and server errors
+    back off exponentially, with jitter. Callers often wrap the model errors,
+    so the whole cause chain is checked.
+    """
+    backoff = min(max_backoff, base_backoff * 2**attempt)
+    backoff *= random.uniform(0.5, 1.0)
+
+    while error is not None:
+        if isinstance(error, groq.RateLimitError):
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                return max(float(retry_after), backoff) if retry_after else backoff
+            except ValueError:
+                return backoff
+        if isinstance(error, (groq.APIConnectionError, groq.InternalServerError)):
+            return backoff
+        error = error.__cause__
+
+    return None
+
+
+def is_rate_limit(error: BaseException | None) -> bool:
+    while error is not None:
+        if isinstance(error, groq.RateLimitError):
+            return True
+        error = error.__cause__
+
+    return False
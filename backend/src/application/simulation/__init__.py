@@ -0,0 +1,17 @@
+from .engine import (
+    NPC,
+    SimulationEngine,
+    TickStats,
+    WorldEvent,
+    get_npcs,
+    get_thoughts_llm,
+)
+
+__all__ = [
+    "NPC",
+    "SimulationEngine",
+    "TickStats",
+    "WorldEvent",
+    "get_npcs",
+    "get_thoughts_llm",
+]
@@ -0,0 +1,519 @@
+"""
+Autonomous simulation of the town's NPCs, advanced in ticks.
+
+At every tick, NPCs react to the world events posted since the last one, some
+start a short exchange with another NPC, and some have an idle thought. Turns
+of NPCs run through the conversation workflow on the NPC's own thread, so
+they are persisted to the checkpoints and the NPC remembers them when players
+talk to it. Idle thoughts of several NPCs are generated by a single LLM call.
+
+Every action is admitted against the token budget of the tick, highest
+priority first, and runs under a global concurrency limit. The tokens the
+actions really spent are summed over every LLM call they made, and what a tick
+spends beyond its budget is taken from the next tick's. All the LLM requests
+of the simulation are batch work for the LLM scheduler, so players are always
+served first.
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import LLMResult
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_core.runnables.base import RunnableSequence
+from langgraph.graph.state import CompiledStateGraph
+from loguru import logger
+from pydantic import BaseModel
+
+from src.application.llm_scheduler import ModelTier, Priority, get_routed_chat_model, llm_priority
+from src.application.metrics import metrics
+from src.config import settings
+from src.domain.adaptive_agent import AdaptiveAgent
+from src.domain.agent_factory import AgentsFactory
+from src.domain.prompts import (
+    SIMULATION_EVENT_PROMPT,
+    SIMULATION_EXCHANGE_OPENING_PROMPT,
+    SIMULATION_EXCHANGE_REPLY_PROMPT,
+    SIMULATION_IDLE_THOUGHTS_PROMPT,
+)
+
+# Estimated tokens of the idle thought of one NPC in a batched call: its
+# persona in the prompt and its thought in the completion.
+THOUGHT_TOKENS_ESTIMATE = 150
+# Estimated tokens of the instructions of a batched idle thoughts call.
+THOUGHTS_PROMPT_TOKENS_ESTIMATE = 200
+
+
+class ActionKind(IntEnum):
+    """Kinds of NPC actions, highest priority first."""
+
+    REACTION = 0
+    EXCHANGE = 1
+    THOUGHT = 2
+
+
+@dataclass(frozen=True)
+class NPC:
+    """A non-player character, embodying one of the agents.
+
+    Args:
+        id: Unique identifier of the NPC.
+        agent: Agent the NPC embodies.
+        thread_id: Checkpoint thread of the NPC's simulated life.
+    """
+
+    id: str
+    agent: AdaptiveAgent
+    thread_id: str
+
+
+@dataclass(frozen=True)
+class WorldEvent:
+    """Something happening in town that NPCs react to.
+
+    Args:
+        description: What happened.
+        npc_ids: NPCs that witness it. Every NPC if None.
+    """
+
+    description: str
+    npc_ids: frozenset[str] | None = None
+
+
+@dataclass
+class NPCAction:
+    kind: ActionKind
+    npc: NPC
+    partner: NPC | None = None
+    event: WorldEvent | None = None
+
+
+@dataclass
+class TickStats:
+    """What happened during a tick."""
+
+    tick: int
+    actions: dict[str, int] = field(default_factory=dict)
+    deferred: int = 0
+    failed: int = 0
+    # Agent turns and batched idle thoughts calls.
+    calls: int = 0
+    # Budget of the tick, less what the previous tick overran.
+    token_budget: int = 0
+    estimated_tokens: int = 0
+    tokens: int = 0
+    seconds: float = 0.0
+
+
+class TokenUsageCallbackHandler(BaseCallbackHandler):
+    """Sums the tokens of every LLM call of a run, as reported by the models."""
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.total_tokens = 0
+        self.reported = False
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.total_tokens += usage["total_tokens"]
+                    self.reported = True
+
+
+class IdleThought(BaseModel):
+    id: str
+    thought: str
+
+
+class IdleThoughts(BaseModel):
+    thoughts: list[IdleThought]
+
+
+def get_npcs(count: int | None = None, thread_prefix: str = "simulation") -> list[NPC]:
+    """Populate the town with NPCs, cycling through the available agents.
+
+    Every agent is embodied once before any is embodied twice. The threads
+    of an NPC start with its agent's ID, like every thread of the agent, so
+    they are reset along with the agent's conversations.
+
+    Args:
+        count: Number of NPCs. One per available agent if None.
+        thread_prefix: Prefix of the NPC threads, after the agent's ID.
+
+    Returns:
+        list[NPC]: The NPCs.
+    """
+
+    agent_ids = AgentsFactory.get_available_agents()
+    count = len(agent_ids) if count is None else count
+
+    npcs = []
+    for i in range(count):
+        agent = AgentsFactory.get_agent(agent_ids[i % len(agent_ids)])
+        copy = i // len(agent_ids)
+        npcs.append(
+            NPC(
+                id=f"{agent.id}-{copy}",
+                agent=agent,
+                thread_id=f"{agent.id}-{thread_prefix}-{copy}",
+            )
+        )
+
+    return npcs
+
+
+def get_thoughts_llm() -> BaseChatModel:
+    """
+    Chat model of the batched idle thoughts, in JSON mode and as batch work.
+    """
+    return get_routed_chat_model(
+        route="simulation_thoughts",
+        tier=ModelTier.FAST,
+        priority=Priority.BATCH,
+        temperature=0.9,
+        model_kwargs={"response_format": {"type": "json_object"}},
+    )
+
+
+class SimulationEngine:
+    """Advances the NPCs of the town in ticks.
+
+    Args:
+        graph: Conversation workflow, compiled with a checkpointer.
+        thoughts_llm: Chat model generating the batched idle thoughts.
+        npcs: NPCs of the town.
+        concurrency: Agent turns and LLM calls in flight at once.
+        tick_token_budget: Estimated tokens a tick may spend.
+        turn_tokens_estimate: Estimated tokens of an agent turn.
+        thought_batch_size: NPCs whose idle thoughts share one LLM call.
+        exchange_probability: Chance an NPC starts an exchange at a tick.
+        thought_probability: Chance an NPC has an idle thought at a tick.
+        seed: Seed of the NPC actions.
+    """
+
+    def __init__(
+        self,
+        graph: CompiledStateGraph,
+        thoughts_llm: BaseChatModel,
+        npcs: list[NPC],
+        concurrency: int,
+        tick_token_budget: int,
+        turn_tokens_estimate: int,
+        thought_batch_size: int,
+        exchange_probability: float,
+        thought_probability: float,
+        seed: int | None = None,
+    ) -> None:
+        self.graph = graph
+        self.thoughts_chain = RunnableSequence(
+            ChatPromptTemplate.from_messages(
+                [("human", SIMULATION_IDLE_THOUGHTS_PROMPT.prompt)],
+                template_format="jinja2",
+            ),
+            thoughts_llm,
+        )
+        self.npcs = npcs
+        self.concurrency = concurrency
+        self.tick_token_budget = tick_token_budget
+        self.turn_tokens_estimate = turn_tokens_estimate
+        self.thought_batch_size = thought_batch_size
+        self.exchange_probability = exchange_probability
+        self.thought_probability = thought_probability
+
+        self.tick = 0
+        # Tokens spent beyond the budget, taken from the next tick's.
+        self.token_debt = 0
+        self._rng = random.Random(seed)
+        self._events: list[WorldEvent] = []
+        self._opening_prompt = PromptTemplate.from_template(
+            SIMULATION_EXCHANGE_OPENING_PROMPT.prompt, template_format="jinja2"
+        )
+        self._reply_prompt = PromptTemplate.from_template(
+            SIMULATION_EXCHANGE_REPLY_PROMPT.prompt, template_format="jinja2"
+        )
+        self._event_prompt = PromptTemplate.from_template(
+            SIMULATION_EVENT_PROMPT.prompt, template_format="jinja2"
+        )
+
+    @classmethod
+    def build_from_settings(cls, graph: CompiledStateGraph, npcs: list[NPC]) -> "SimulationEngine":
+        return cls(
+            graph=graph,
+            thoughts_llm=get_thoughts_llm(),
+            npcs=npcs,
+            concurrency=settings.SIMULATION_CONCURRENCY,
+            tick_token_budget=settings.SIMULATION_TICK_TOKEN_BUDGET,
+            turn_tokens_estimate=settings.SIMULATION_TURN_TOKENS_ESTIMATE,
+            thought_batch_size=settings.SIMULATION_THOUGHT_BATCH_SIZE,
+            exchange_probability=settings.SIMULATION_EXCHANGE_PROBABILITY,
+            thought_probability=settings.SIMULATION_THOUGHT_PROBABILITY,
+        )
+
+    def post_event(self, event: WorldEvent) -> None:
+        """
+        Post a world event, reacted to at the next tick.
+        """
+        self._events.append(event)
+
+    async def run(self, num_ticks: int | None = None, tick_seconds: float = 0.0) -> list[TickStats]:
+        """Run ticks, starting one at most every `tick_seconds`.
+
+        Args:
+            num_ticks: Number of ticks to run. Runs until cancelled if None.
+            tick_seconds: Minimum duration of a tick.
+
+        Returns:
+            list[TickStats]: Statistics of every tick.
+        """
+
+        ticks = []
+        while num_ticks is None or len(ticks) < num_ticks:
+            stats = await self.run_tick()
+            ticks.append(stats)
+            logger.info(
+                f"Tick {stats.tick}: {sum(stats.actions.values())} actions {stats.actions} "
+                f"in {stats.seconds:.2f}s with {stats.calls} calls, "
+                f"~{stats.tokens} tokens of a {stats.token_budget} budget, "
+                f"{stats.deferred} deferred, {stats.failed} failed"
+            )
+            await asyncio.sleep(max(0.0, tick_seconds - stats.seconds))
+
+        return ticks
+
+    async def run_tick(self) -> TickStats:
+        """
+        Plan the actions of the NPCs for one tick, and run those the budget allows.
+        """
+        start = time.perf_counter()
+        self.tick += 1
+        stats = TickStats(tick=self.tick, token_budget=self.tick_token_budget - self.token_debt)
+        events, self._events = self._events, []
+
+        admitted = self._admit(self.plan_tick(events), stats)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        thoughts = [action.npc for action in admitted if action.kind == ActionKind.THOUGHT]
+        tasks = [
+            self._run_turns(action, semaphore, stats)
+            for action in admitted
+            if action.kind != ActionKind.THOUGHT
+        ]
+        tasks.extend(
+            self._run_thoughts(thoughts[i : i + self.thought_batch_size], semaphore, stats)
+            for i in range(0, len(thoughts), self.thought_batch_size)
+        )
+        with llm_priority(Priority.BATCH):
+            await asyncio.gather(*tasks)
+
+        # The budget of a tick never grows from what previous ticks didn't spend.
+        self.token_debt = max(0, stats.tokens - stats.token_budget)
+        stats.seconds = time.perf_counter() - start
+        metrics.set_gauge("simulation.token_debt", self.token_debt)
+        metrics.observe("simulation.tick_seconds", stats.seconds)
+        metrics.increment("simulation.ticks")
+        metrics.set_gauge("simulation.npcs", len(self.npcs))
+
+        return stats
+
+    def plan_tick(self, events: list[WorldEvent]) -> list[NPCAction]:
+        """Draw the actions of the NPCs, at most one per NPC.
+
+        Witnesses of an event react to it first. The other NPCs may start
+        an exchange with another idle NPC, or have an idle thought.
+        """
+
+        actions = []
+        busy = set()
+        for event in events:
+            for npc in self.npcs:
+                if npc.id in busy or (event.npc_ids is not None and npc.id not in event.npc_ids):
+                    continue
+                busy.add(npc.id)
+                actions.append(NPCAction(ActionKind.REACTION, npc, event=event))
+
+        idle = [npc for npc in self.npcs if npc.id not in busy]
+        self._rng.shuffle(idle)
+        while idle:
+            npc = idle.pop()
+            draw = self._rng.random()
+            if draw < self.exchange_probability and idle:
+                actions.append(NPCAction(ActionKind.EXCHANGE, npc, partner=idle.pop()))
+            elif draw < self.exchange_probability + self.thought_probability:
+                actions.append(NPCAction(ActionKind.THOUGHT, npc))
+
+        return actions
+
+    def _admit(self, actions: list[NPCAction], stats: TickStats) -> list[NPCAction]:
+        """
+        Keep the actions that fit the token budget of the tick, highest priority first.
+        """
+        admitted = []
+        for action in sorted(actions, key=lambda action: action.kind):
+            tokens = self._estimate_tokens(action)
+            if stats.estimated_tokens + tokens > stats.token_budget:
+                stats.deferred += 1
+                continue
+            stats.estimated_tokens += tokens
+            kind = action.kind.name.lower()
+            stats.actions[kind] = stats.actions.get(kind, 0) + 1
+            admitted.append(action)
+
+        metrics.increment("simulation.deferred", stats.deferred)
+        for kind, count in stats.actions.items():
+            metrics.increment(f"simulation.actions.{kind}", count)
+
+        return admitted
+
+    def _estimate_tokens(self, action: NPCAction) -> int:
+        if action.kind == ActionKind.THOUGHT:
+            # The instructions are shared by the whole batch.
+            return THOUGHT_TOKENS_ESTIMATE + THOUGHTS_PROMPT_TOKENS_ESTIMATE // self.thought_batch_size
+        if action.kind == ActionKind.EXCHANGE:
+            return 2 * self.turn_tokens_estimate
+
+        return self.turn_tokens_estimate
+
+    async def _run_turns(
+        self, action: NPCAction, semaphore: asyncio.Semaphore, stats: TickStats
+    ) -> None:
+        try:
+            if action.kind == ActionKind.REACTION:
+                message = self._event_prompt.format(event=action.event.description)
+                await self._run_turn(action.npc, message, semaphore, stats)
+                return
+
+            npc, partner = action.npc, action.partner
+            opening = await self._run_turn(
+                npc, self._opening_prompt.format(partner_name=partner.agent.name), semaphore, stats
+            )
+            reply = await self._run_turn(
+                partner,
+                self._reply_prompt.format(partner_name=npc.agent.name, message=opening),
+                semaphore,
+                stats,
+            )
+            # The NPC that opened the exchange remembers the answer too.
+            answer = self._reply_prompt.format(partner_name=partner.agent.name, message=reply)
+            await self._remember(npc, HumanMessage(content=answer))
+        except Exception as e:
+            stats.failed += 1
+            metrics.increment("simulation.failed")
+            logger.warning(f"Simulation {action.kind.name.lower()} of NPC {action.npc.id} failed: {e}")
+
+    async def _run_turn(
+        self, npc: NPC, message: str, semaphore: asyncio.Semaphore, stats: TickStats
+    ) -> str:
+        """
+        Run a turn of the conversation workflow on the NPC's thread, and return its answer.
+
+        The tokens of every LLM call of the turn count, e.g. the summary and
+        the retrieval, not just the answer. A failed turn only counts what
+        the models reported.
+        """
+        usage = TokenUsageCallbackHandler()
+        estimated_tokens = 0
+        try:
+            async with semaphore:
+                output_state = await self.graph.ainvoke(
+                    input={
+                        "messages": [HumanMessage(content=message)],
+                        "agent_id": npc.agent.id,
+                        "player_id": "",
+                        "agent_name": npc.agent.name,
+                        "agent_perspective": npc.agent.perspective,
+                        "agent_style": npc.agent.style,
+                        "agent_context": "",
+                    },
+                    config={"configurable": {"thread_id": npc.thread_id}, "callbacks": [usage]},
+                )
+            estimated_tokens = self.turn_tokens_estimate
+        finally:
+            stats.calls += 1
+            self._record_tokens(usage, estimated_tokens, stats)
+
+        return output_state["messages"][-1].content
+
+    async def _run_thoughts(
+        self, npcs: list[NPC], semaphore: asyncio.Semaphore, stats: TickStats
+    ) -> None:
+        """
+        Generate the idle thoughts of a batch of NPCs with one LLM call.
+        """
+        usage = TokenUsageCallbackHandler()
+        try:
+            async with semaphore:
+                response = await self.thoughts_chain.ainvoke(
+                    {
+                        "npcs": [
+                            {
+                                "id": npc.id,
+                                "name": npc.agent.name,
+                                "perspective": npc.agent.perspective,
+                                "style": npc.agent.style,
+                            }
+                            for npc in npcs
+                        ]
+                    },
+                    config={"callbacks": [usage]},
+                )
+            stats.calls += 1
+            self._record_tokens(
+                usage,
+                THOUGHTS_PROMPT_TOKENS_ESTIMATE + THOUGHT_TOKENS_ESTIMATE * len(npcs),
+                stats,
+            )
+            thoughts = {
+                thought.id: thought.thought
+                for thought in IdleThoughts.model_validate_json(response.content).thoughts
+            }
+        except Exception as e:
+            stats.failed += len(npcs)
+            metrics.increment("simulation.failed", len(npcs))
+            logger.warning(f"Idle thoughts of {len(npcs)} NPCs failed: {e}")
+            return
+
+        # NPCs the model forgot count as failed, and remember nothing.
+        results = await asyncio.gather(
+            *(
+                self._remember(npc, AIMessage(content=thoughts[npc.id]))
+                for npc in npcs
+                if npc.id in thoughts
+            ),
+            return_exceptions=True,
+        )
+        failed = len(npcs) - len(thoughts.keys() & {npc.id for npc in npcs})
+        failed += sum(isinstance(result, Exception) for result in results)
+        if failed:
+            stats.failed += failed
+            metrics.increment("simulation.failed", failed)
+
+    async def _remember(self, npc: NPC, message: BaseMessage) -> None:
+        """
+        Append a message to the NPC's thread, as if it came out of a turn.
+        """
+        await self.graph.aupdate_state(
+            {"configurable": {"thread_id": npc.thread_id}},
+            {"messages": [message]},
+            as_node="connector_node",
+        )
+
+    def _record_tokens(
+        self, usage: TokenUsageCallbackHandler, estimated_tokens: int, stats: TickStats
+    ) -> None:
+        """
+        Count the tokens the models reported, or the estimate if they reported none.
+        """
+        tokens = usage.total_tokens if usage.reported else estimated_tokens
+        stats.tokens += tokens
+        metrics.increment("simulation.tokens", tokens)
+        metrics.increment("simulation.calls")
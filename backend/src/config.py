@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -13,7 +14,52 @@ class Settings(BaseSettings):
     GROQ_API_KEY: str
     GROQ_LLM_MODEL: str = "llama-3.3-70b-versatile"
     GROQ_LLM_MODEL_CONTEXT_SUMMARY: str = "llama-3.1-8b-instant"
-    
+
+    # --- LLM Scheduler Configuration ---
+    LLM_SCHEDULER_ENABLED: bool = True
+    LLM_SCHEDULER_BUDGET_STORE: str = Field(
+        default="sqlite",
+        description="Where the rate-limit budgets live: 'sqlite' to share them between the API workers of a node, or 'memory' for one process.",
+    )
+    LLM_SCHEDULER_BUDGET_PATH: Path = Path("data/llm_budget.sqlite")
+    LLM_SCHEDULER_REQUESTS_PER_MINUTE: int | None = Field(
+        default=None,
+        description="Requests per minute of the models without their own limits. With the tokens per minute, unset by default: those models aren't throttled, only prioritized and retried.",
+    )
+    LLM_SCHEDULER_TOKENS_PER_MINUTE: int | None = None
+    LLM_SCHEDULER_MODEL_LIMITS: dict[str, dict[str, int]] = Field(
+        default_factory=dict,
+        description="Limits of your Groq account per model, e.g. {\"llama-3.1-8b-instant\": {\"requests_per_minute\": 30, \"tokens_per_minute\": 20000}}.",
+    )
+    LLM_SCHEDULER_PRIORITY_RESERVES: list[float] = Field(
+        default=[0.0, 0.1, 0.25, 0.5],
+        description="Fraction of each budget a request of each priority, from interactive to batch, must leave untouched, so background work can't drain it.",
+    )
+    LLM_SCHEDULER_OUTPUT_TOKENS_ESTIMATE: int = 300
+    LLM_SCHEDULER_MAX_RETRIES: int = 3
+    LLM_SCHEDULER_BASE_BACKOFF_SECONDS: float = 0.5
+    LLM_SCHEDULER_MAX_BACKOFF_SECONDS: float = 20.0
+
+    # --- LLM Routing Configuration ---
+    LLM_TIER_MODELS: dict[str, list[str]] = Field(
+        default_factory=dict,
+        description="Models of the 'quality' and 'fast' tiers, in fallback order. By default, GROQ_LLM_MODEL and GROQ_LLM_MODEL_CONTEXT_SUMMARY back each other up.",
+    )
+    LLM_ROUTE_TIERS: dict[str, str] = Field(
+        default_factory=dict,
+        description="Tier of a route, overriding the one its chain declares, e.g. {\"conversation_summary\": \"quality\"}.",
+    )
+    LLM_HEDGED_ROUTES: list[str] = Field(
+        default=["conversation"],
+        description="Routes whose slow calls are raced against the same call on the route's next model.",
+    )
+    LLM_HEDGE_FIRST_TOKEN_SECONDS: float = 2.0
+    LLM_HEDGE_RESPONSE_SECONDS: float = 10.0
+    LLM_REQUEST_TIMEOUT_SECONDS: float = Field(
+        default=30.0,
+        description="Timeout of a Groq request, so a stalled call fails over instead of hanging the conversation.",
+    )
+
     # --- OpenAI Configuration (Required for evaluation) ---
     OPENAI_API_KEY: str
 
@@ -34,6 +80,13 @@ class Settings(BaseSettings):
     MONGO_STATE_CHECKPOINT_COLLECTION: str = "agent_state_checkpoints"
     MONGO_STATE_WRITES_COLLECTION: str = "agent_state_writes"
     MONGO_LONG_TERM_MEMORY_COLLECTION: str = "agent_long_term_memory"
+    MONGO_SHARD_CONVERSATIONS: bool = Field(
+        default=False,
+        description="Whether the checkpoint collections are sharded on thread_id. Resets shard them again after dropping them.",
+    )
+    MONGO_RESET_BATCH_SIZE: int = Field(
+        default=1000, description="Documents deleted per batch by background conversation resets."
+    )
 
     ## -- Qdrant Configuration --
     QDRANT_URL: str = "http://localhost:6333"
@@ -41,6 +94,23 @@ class Settings(BaseSettings):
         default=None, description="API key for Qdrant Cloud. If provided, will use cloud instance instead of local."
     )
     QDRANT_COLLECTION_NAME: str = "adaptive-agents"
+    QDRANT_PREFER_GRPC: bool = Field(
+        default=False, description="Use the gRPC transport instead of REST for Qdrant requests."
+    )
+    QDRANT_GRPC_PORT: int = 6334
+    QDRANT_TIMEOUT: int = 10
+    QDRANT_MAX_CONNECTIONS: int = 32
+    QDRANT_HNSW_M: int = 16
+    QDRANT_HNSW_EF_CONSTRUCT: int = 100
+    QDRANT_HNSW_PAYLOAD_M: int | None = None
+    QDRANT_SEARCH_HNSW_EF: int | None = None
+    QDRANT_ON_DISK_VECTORS: bool = False
+    QDRANT_QUANTIZATION: Literal["none", "scalar", "binary"] = Field(
+        default="none", description="Vector quantization: 'none', 'scalar' (int8) or 'binary'."
+    )
+    QDRANT_QUANTIZATION_ALWAYS_RAM: bool = True
+    QDRANT_QUANTIZATION_RESCORE: bool = True
+    QDRANT_QUANTIZATION_OVERSAMPLING: float = 2.0
     QDRANT_URL: str 
     
 
@@ -54,6 +124,27 @@ class Settings(BaseSettings):
         description="Project name for Comet ML and Opik tracking.",
     )
 
+    # --- Checkpointer Configuration ---
+    CHECKPOINTER_BACKEND: str = Field(
+        default="mongo",
+        description="Where conversation checkpoints are stored: 'mongo', or 'sqlite' for an embedded database on single-node deployments.",
+    )
+    SQLITE_CHECKPOINT_PATH: Path = Path("data/checkpoints.sqlite")
+    SQLITE_COMMIT_INTERVAL_MS: float = Field(
+        default=50,
+        description="Maximum delay before SQLite checkpoint writes are committed together. A crash loses at most this window of writes; 0 commits every write.",
+    )
+    CHECKPOINT_CACHE_ENABLED: bool = True
+    CHECKPOINT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CHECKPOINT_CACHE_VALIDATION: str = Field(
+        default="version",
+        description="'version' checks the cached checkpoint ID against the latest one in the database before a cache hit, 'none' trusts the cache, which is only safe when each thread is served by a single worker.",
+    )
+    CONVERSATION_EXPORT_BATCH_SIZE: int = Field(
+        default=500,
+        description="Checkpoint IDs fetched per round trip when exporting conversations.",
+    )
+
     # --- Agents Configuration ---
     TOTAL_MESSAGES_SUMMARY_TRIGGER: int = 30
     TOTAL_MESSAGES_AFTER_SUMMARY: int = 5
@@ -64,10 +155,115 @@ class Settings(BaseSettings):
     RAG_TOP_K: int = 3
     RAG_DEVICE: str = "cpu"
     RAG_CHUNK_SIZE: int = 256
+    RAG_RETRIEVAL_MODE: str = Field(
+        default="dense",
+        description="'dense' for embedding search only, 'hybrid' to fuse dense and BM25 sparse results with reciprocal rank fusion.",
+    )
+    RAG_SPARSE_VECTOR_NAME: str = "bm25"
+    RAG_HYBRID_PREFETCH_K: int = 20
+
+    # --- RAG Context Packing Configuration ---
+    RAG_CONTEXT_PACKING: bool = True
+    RAG_FETCH_K: int = 20
+    RAG_CONTEXT_TOKEN_BUDGET: int = 600
+    RAG_MAX_CONTEXT_CHUNKS: int = 5
+    RAG_MMR_LAMBDA: float = 0.7
+    RAG_MIN_RELEVANCE: float = 0.2
+    RAG_DUPLICATE_SIMILARITY: float = 0.95
+
+    # --- Embedding Backend Configuration ---
+    RAG_EMBEDDING_BACKEND: str = Field(
+        default="local",
+        description="Where embeddings are computed: 'local' (in-process PyTorch model), 'onnx' (in-process ONNX Runtime model) or 'server' (shared embedding server).",
+    )
+    RAG_EMBEDDING_SERVER_SOCKET_PATH: Path = Path("/tmp/adaptive-agents-embeddings.sock")
+    RAG_EMBEDDING_SERVER_MAX_BATCH_SIZE: int = 64
+    RAG_EMBEDDING_SERVER_MAX_WAIT_MS: float = 5.0
+    RAG_ONNX_MODEL_DIR: Path = Path("models/all-MiniLM-L6-v2-onnx")
+    RAG_ONNX_QUANTIZED: bool = True
+    RAG_ONNX_NUM_THREADS: int = 0
+
+    # --- RAG Router Configuration ---
+    RAG_ROUTER_MODE: str = Field(
+        default="off",
+        description="'off' lets the conversation model decide with a tool call whether to retrieve, 'shadow' also logs what the local router would have decided, 'on' lets the router decide and skips the tool call.",
+    )
+    RAG_ROUTER_PATH: Path = Path("data/rag_router.npz")
+    RAG_ROUTER_DECISIONS_PATH: Path = Field(
+        default=Path("data/rag_router_decisions.jsonl"),
+        description="Log of the retrieval decisions of the conversation model and of the router, to train and evaluate the router.",
+    )
+    RAG_ROUTER_TOPICS_PER_AGENT: int = 8
+    RAG_ROUTER_THRESHOLD: float = Field(
+        default=0.35,
+        description="Default score above which the router retrieves, until one is tuned on the decisions log.",
+    )
+
+    # --- Long-Term Memory Ingestion Configuration ---
+    LONG_TERM_MEMORY_EXTRACTION_WORKERS: int = 8
+    LONG_TERM_MEMORY_PROCESS_WORKERS: int = Field(
+        default=0,
+        description="Processes splitting and deduplicating documents. 0 uses every CPU core.",
+    )
+    LONG_TERM_MEMORY_EMBEDDING_BATCH_SIZE: int = 64
+    LONG_TERM_MEMORY_EMBEDDING_WORKERS: int = Field(
+        default=0,
+        description="Processes embedding chunks on CPU. 0 uses one process per four CPU cores, 1 embeds in-process.",
+    )
+    LONG_TERM_MEMORY_UPSERT_BATCH_SIZE: int = 256
+    LONG_TERM_MEMORY_UPSERT_WORKERS: int = 2
+    LONG_TERM_MEMORY_QUEUE_SIZE: int = 8
+    LONG_TERM_MEMORY_LSH_MAX_SEGMENTS: int = 16
+
+    # --- Evaluation Configuration ---
+    EVALUATION_WORKERS: int = Field(
+        default=8,
+        description="Evaluation samples replayed through the agents at once, and threads scoring them.",
+    )
+    EVALUATION_MAX_RETRIES: int = 5
+    EVALUATION_BASE_BACKOFF_SECONDS: float = 1.0
+    EVALUATION_MAX_BACKOFF_SECONDS: float = 60.0
+    EVALUATION_CACHE_DIR: Path = Field(
+        default=Path("data/evaluation_cache"),
+        description="On-disk cache of the agent outputs, keyed by prompt version, model and sample input.",
+    )
+    EVALUATION_GENERATION_WORKERS: int = 8
+    EVALUATION_GENERATION_REQUESTS_PER_MINUTE: float = Field(
+        default=30,
+        description="Rate of the evaluation dataset generation requests, shared by all the workers. Only used with the LLM scheduler disabled, as it paces them otherwise.",
+    )
+    EVALUATION_GENERATION_SHARD_SIZE: int = 500
+    EVALUATION_GENERATION_DIR: Path = Field(
+        default=Path("data/evaluation_generation"),
+        description="JSONL shards of the generated evaluation conversations, read back to resume a run.",
+    )
+
+    # --- Simulation Configuration ---
+    SIMULATION_TICK_SECONDS: float = Field(
+        default=30.0,
+        description="Minimum duration of a simulation tick. A tick that takes longer starts the next one late.",
+    )
+    SIMULATION_CONCURRENCY: int = Field(
+        default=16,
+        description="Agent turns and batched LLM calls of the simulation in flight at once, across all NPCs.",
+    )
+    SIMULATION_TICK_TOKEN_BUDGET: int = Field(
+        default=20000,
+        description="Estimated LLM tokens a simulation tick may spend. Actions that don't fit are dropped for the tick, and tokens spent beyond it are taken from the next tick's budget.",
+    )
+    SIMULATION_TURN_TOKENS_ESTIMATE: int = 1500
+    SIMULATION_THOUGHT_BATCH_SIZE: int = Field(
+        default=10,
+        description="NPCs whose idle thoughts are generated by a single LLM call.",
+    )
+    SIMULATION_EXCHANGE_PROBABILITY: float = 0.1
+    SIMULATION_THOUGHT_PROBABILITY: float = 0.2
 
     # --- Paths Configuration ---
     EVALUATION_DATASET_FILE_PATH: Path = Path("data/evaluation_dataset.json")
     EXTRACTION_METADATA_FILE_PATH: Path = Path("data/extraction_metadata.json")
+    LONG_TERM_MEMORY_MANIFEST_FILE_PATH: Path = Path("data/long_term_memory_manifest.json")
+    LONG_TERM_MEMORY_LSH_INDEX_DIR: Path = Path("data/long_term_memory_lsh_index")
 
 
 settings = Settings()
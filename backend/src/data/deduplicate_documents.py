@@ -1,15 +1,188 @@
+import hashlib
 import re
+from functools import lru_cache
 from typing import List, Tuple
 
-from datasketch import MinHash, MinHashLSH
+import numpy as np
 from langchain_core.documents import Document
 from loguru import logger
 
 from src.config import settings
 
+SHINGLE_SIZE = 3
+
+# Large odd constant used to combine word hashes into shingle hashes.
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+
+
+class MinHashDeduplicator:
+    """Near-duplicate detection with MinHash signatures and LSH banding.
+
+    Signatures are computed for a whole batch of texts at once: every word-level
+    shingle of every text is hashed in one NumPy pass, permuted with vectorized
+    multiply-shift hashing and reduced to per-text minimums. Candidate pairs are
+    then found by bucketing band keys with a sort, linking every text of a bucket
+    to the bucket's first text only, so the cost stays linear in the number of
+    texts even when thousands of them share a bucket.
+
+    Args:
+        threshold: Estimated Jaccard similarity above which two texts are duplicates.
+        num_perm: Number of hash permutations (length of each signature).
+        seed: Seed of the permutations. Signatures are only comparable between
+            deduplicators built with the same `num_perm` and `seed`.
+        block_size: Maximum number of shingles hashed at once, which caps the
+            memory used by the permutation matrix.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        num_perm: int = 128,
+        seed: int = 1,
+        block_size: int = 1 << 16,
+    ) -> None:
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.seed = seed
+        self.block_size = block_size
+        self.num_bands, self.band_size = get_optimal_lsh_params(threshold, num_perm)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, texts: list[str]) -> np.ndarray:
+        """Compute the MinHash signatures of `texts`.
+
+        Returns:
+            np.ndarray: `(len(texts), num_perm)` uint32 signatures. Texts without
+                any word get a signature of all `0xFFFFFFFF` and never match.
+        """
+
+        shingle_hashes, shingle_counts = self._shingle_hashes(texts)
+        signatures = np.full((len(texts), self.num_perm), _MAX_HASH, dtype=np.uint32)
+
+        doc_ids = np.flatnonzero(shingle_counts)
+        offsets = np.concatenate([[0], np.cumsum(shingle_counts[doc_ids])])
+        start = 0
+        while start < len(doc_ids):
+            # Take as many texts as fit in the block, but at least one.
+            end = max(
+                start + 1,
+                int(np.searchsorted(offsets, offsets[start] + self.block_size, side="right")) - 1,
+            )
+            block = shingle_hashes[offsets[start] : offsets[end]]
+            # Permutations along rows: reducing contiguous runs of each row is
+            # much faster than reducing across rows.
+            permuted = (
+                (self._a[:, None] * block[None, :] + self._b[:, None]) >> np.uint64(32)
+            ).astype(np.uint32)
+            signatures[doc_ids[start:end]] = np.minimum.reduceat(
+                permuted, offsets[start:end] - offsets[start], axis=1
+            ).T
+            start = end
+
+        return signatures
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """Hash every LSH band of every signature into a single 64-bit key.
+
+        Returns:
+            np.ndarray: `(len(signatures), num_bands)` uint64 band keys.
+        """
+
+        bands = signatures[:, : self.num_bands * self.band_size].astype(np.uint64)
+        bands = bands.reshape(len(signatures), self.num_bands, self.band_size)
+
+        keys = np.zeros((len(signatures), self.num_bands), dtype=np.uint64)
+        for row in range(self.band_size):
+            keys = (keys ^ bands[:, :, row]) * _HASH_MULTIPLIER
+        # Salt with the band index, so equal rows in different bands differ.
+        return keys ^ np.arange(self.num_bands, dtype=np.uint64)
+
+    def find_duplicates(
+        self,
+        signatures: np.ndarray,
+        groups: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Find the pairs of signatures above the similarity threshold.
+
+        Pairs link each duplicate to the first signature of a shared bucket rather
+        than to every other duplicate, so a cluster of `k` near-duplicates yields
+        about `k` pairs instead of `k²`. Resolve them into clusters with
+        `cluster_duplicates()`.
+
+        Args:
+            signatures: Signatures returned by `signatures()`.
+            groups: Optional group label of each signature. Pairs are only
+                reported within the same group, which dedups many groups (e.g.
+                agents) in a single pass.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: `(num_pairs, 2)` index pairs, with
+                `i < j` and sorted, and the estimated similarity of each pair.
+        """
+
+        empty = (signatures == _MAX_HASH).all(axis=1)
+        pairs = find_candidate_pairs(self.band_keys(signatures), exclude=empty, groups=groups)
+
+        similarities = estimate_similarities(signatures, pairs)
+        keep = similarities >= self.threshold
+
+        return pairs[keep], similarities[keep]
+
+    def _shingle_hashes(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Hash the word shingles of every text into one flat array.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The uint64 shingle hashes of all texts,
+                concatenated in order, and the number of shingles of each text.
+        """
+
+        vocabulary: dict[str, int] = {}
+        word_ids: list[int] = []
+        word_counts = np.zeros(len(texts), dtype=np.int64)
+        word_pattern = re.compile(r"\w+")
+        for i, text in enumerate(texts):
+            words = word_pattern.findall(text.lower())
+            if 0 < len(words) < SHINGLE_SIZE:
+                # Too short for a full shingle: pad, so the text is one shingle.
+                words = words + [""] * (SHINGLE_SIZE - len(words))
+            for word in words:
+                word_id = vocabulary.get(word)
+                if word_id is None:
+                    word_id = vocabulary[word] = len(vocabulary)
+                word_ids.append(word_id)
+            word_counts[i] = len(words)
+
+        word_hashes = np.fromiter(
+            (_hash_word(word) for word in vocabulary), dtype=np.uint64, count=len(vocabulary)
+        )
+        hashes = word_hashes[np.asarray(word_ids, dtype=np.int64)]
+
+        # Combine every window of SHINGLE_SIZE words, then keep the windows that
+        # don't straddle two texts.
+        num_windows = max(len(hashes) - SHINGLE_SIZE + 1, 0)
+        shingle_hashes = np.zeros(num_windows, dtype=np.uint64)
+        for offset in range(SHINGLE_SIZE):
+            shingle_hashes = (shingle_hashes ^ hashes[offset : offset + num_windows]) * _HASH_MULTIPLIER
+
+        shingle_counts = np.maximum(word_counts - SHINGLE_SIZE + 1, 0)
+        doc_of_word = np.repeat(np.arange(len(texts)), word_counts)
+        valid = doc_of_word[:num_windows] == doc_of_word[SHINGLE_SIZE - 1 :]
+        shingle_hashes = shingle_hashes[valid]
+
+        # Fold to 32 bits, the input width of the multiply-shift permutations.
+        shingle_hashes = (shingle_hashes ^ (shingle_hashes >> np.uint64(32))) & np.uint64(
+            0xFFFFFFFF
+        )
+
+        return shingle_hashes, shingle_counts
+
 
 def deduplicate_documents(
-    documents: List[Document], threshold: float = 0.7
+    documents: List[Document], threshold: float = 0.7, group_by: str | None = None
 ) -> List[Document]:
     """Remove duplicate documents from a list based on content similarity.
 
@@ -17,43 +190,83 @@ def deduplicate_documents(
     based on the specified similarity threshold.
 
     Args:
-        documents: List of documents to deduplicate.
+        documents: List of documents to check for duplicates.
         threshold: Similarity threshold to consider documents as duplicates.
             Value between 0.0 and 1.0, where higher values require more similarity.
+        group_by: Optional metadata key (e.g. "agent_id"). When set, documents
+            are only compared within the same group, so the chunks of many
+            agents can be deduplicated in one pass without dropping a chunk
+            that another agent also needs.
 
     Returns:
         List of documents with duplicates removed.
     """
 
+    deduplicator = MinHashDeduplicator(
+        threshold=threshold, num_perm=int(settings.RAG_CHUNK_SIZE * 0.5)
+    )
+    documents, _ = deduplicate_documents_with_signatures(documents, deduplicator, group_by)
+
+    return documents
+
+
+def deduplicate_documents_with_signatures(
+    documents: List[Document],
+    deduplicator: MinHashDeduplicator,
+    group_by: str | None = None,
+) -> tuple[List[Document], np.ndarray]:
+    """Remove duplicate documents and also return the signatures of the kept ones.
+
+    The signatures can be stored in a persistent LSH index, so later runs check
+    new documents against these ones without recomputing them.
+
+    Args:
+        documents: List of documents to check for duplicates.
+        deduplicator: Deduplicator computing the signatures and the pairs.
+        group_by: Optional metadata key restricting comparisons to documents of
+            the same group.
+
+    Returns:
+        tuple[List[Document], np.ndarray]: The documents with duplicates removed
+            and their MinHash signatures.
+    """
+
     if not documents:
-        return []
+        return [], np.empty((0, deduplicator.num_perm), dtype=np.uint32)
 
-    duplicates = find_duplicates(documents, threshold)
+    signatures = deduplicator.signatures([doc.page_content for doc in documents])
+
+    groups = None
+    if group_by is not None:
+        groups = np.asarray([str(doc.metadata.get(group_by)) for doc in documents])
+
+    pairs, _ = deduplicator.find_duplicates(signatures, groups=groups)
+    clusters = cluster_duplicates(len(documents), pairs)
+
+    # Keep the document with more content of each cluster, the first one on ties.
+    lengths = np.asarray([len(doc.page_content) for doc in documents])
+    order = np.lexsort((np.arange(len(documents)), -lengths, clusters))
+    first_of_cluster = np.r_[True, clusters[order][1:] != clusters[order][:-1]]
+    keep = np.sort(order[first_of_cluster])
 
     logger.info(
-        f"{len(duplicates)} / {len(documents)} documents are duplicates. Removing them."
+        f"{len(documents) - len(keep)} / {len(documents)} documents are duplicates. "
+        "Removing them."
     )
 
-    indices_to_remove = set()
-    for i, j, _ in duplicates:
-        # Keep the document with more content
-        if len(documents[i].page_content) >= len(documents[j].page_content):
-            indices_to_remove.add(j)
-        else:
-            indices_to_remove.add(i)
-
-    return [doc for i, doc in enumerate(documents) if i not in indices_to_remove]
+    return [documents[i] for i in keep.tolist()], signatures[keep]
 
 
 def find_duplicates(
     documents: List[Document],
     threshold: float = 0.7,
     num_perm: int = int(settings.RAG_CHUNK_SIZE * 0.5),
+    group_by: str | None = None,
 ) -> List[Tuple[int, int, float]]:
     """Find duplicate documents using MinHash algorithm.
 
-    Creates MinHash signatures for each document and uses Locality Sensitive Hashing (LSH)
-    to efficiently find similar document pairs.
+    Creates MinHash signatures for all documents in one vectorized batch and uses
+    Locality Sensitive Hashing (LSH) to efficiently find similar document pairs.
 
     Args:
         documents: List of documents to check for duplicates.
@@ -61,46 +274,164 @@ def find_duplicates(
             Higher values require more similarity between documents.
         num_perm: Number of permutations for MinHash. Higher values provide more
             accurate similarity estimates but require more computation.
+        group_by: Optional metadata key restricting comparisons to documents of
+            the same group.
 
     Returns:
         List of tuples containing (doc_index1, doc_index2, similarity_score)
-        for document pairs that exceed the similarity threshold.
+        for document pairs that exceed the similarity threshold. Each duplicate
+        is paired with the first document of its LSH bucket, not with every
+        other duplicate.
+    """
+
+    deduplicator = MinHashDeduplicator(threshold=threshold, num_perm=num_perm)
+    signatures = deduplicator.signatures([doc.page_content for doc in documents])
+
+    groups = None
+    if group_by is not None:
+        groups = np.asarray([str(doc.metadata.get(group_by)) for doc in documents])
+
+    pairs, similarities = deduplicator.find_duplicates(signatures, groups=groups)
+
+    return [
+        (int(i), int(j), float(similarity))
+        for (i, j), similarity in zip(pairs, similarities)
+    ]
+
+
+def find_candidate_pairs(
+    band_keys: np.ndarray,
+    exclude: np.ndarray | None = None,
+    groups: np.ndarray | None = None,
+) -> np.ndarray:
+    """Collect pairs of rows sharing at least one band key.
+
+    Each band is bucketed with a sort instead of a hash table, and every row of a
+    bucket is paired with the bucket's first row only (a star), so a bucket of
+    `k` rows costs `k - 1` pairs. Pairs found in several bands are only kept once.
+
+    Args:
+        band_keys: `(n, num_bands)` band keys.
+        exclude: Optional boolean mask of rows that never form pairs.
+        groups: Optional group label of each row. Rows of different groups are
+            never bucketed together.
+
+    Returns:
+        np.ndarray: `(num_pairs, 2)` int64 sorted, unique pairs with `i < j`.
     """
 
-    minhashes = []
-
-    for doc in documents:
-        minhash = MinHash(num_perm=num_perm)
-        text = doc.page_content.lower()
-        words = re.findall(r"\w+", text)
-
-        # Create shingles (3-grams of words)
-        for i in range(len(words) - 3):
-            shingle = " ".join(words[i : i + 3])
-            minhash.update(shingle.encode("utf-8"))
-        minhashes.append(minhash)
-
-    # Find similar document pairs using LSH (Locality Sensitive Hashing)
-    lsh = MinHashLSH(threshold=threshold, num_perm=num_perm)
-
-    # Add documents to LSH index
-    for i, minhash in enumerate(minhashes):
-        lsh.insert(i, minhash)
-
-    duplicates = []
-    for i, minhash in enumerate(minhashes):
-        similar_docs = lsh.query(minhash)
-        # Remove self from results
-        similar_docs = [j for j in similar_docs if j != i]
-
-        # Find duplicates
-        for j in similar_docs:
-            similarity = minhashes[i].jaccard(minhashes[j])
-            if similarity >= threshold:
-                # Ensure we don't add the same pair twice (in different order)
-                pair = tuple(sorted([i, j]))
-                duplicate_info = (*pair, similarity)
-                if duplicate_info not in duplicates:
-                    duplicates.append(duplicate_info)
-
-    return duplicates
+    num_rows = len(band_keys)
+    rows = np.arange(num_rows)
+    if exclude is not None:
+        rows = rows[~exclude]
+    if len(rows) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    group_codes = np.zeros(len(rows), dtype=np.int64)
+    if groups is not None:
+        _, group_codes = np.unique(np.asarray(groups)[rows], return_inverse=True)
+
+    encoded_pairs = []
+    for band in range(band_keys.shape[1]):
+        keys = band_keys[rows, band]
+        # Rows stay in ascending order within a bucket, so its first row is the
+        # smallest and every star pair is already i < j.
+        order = np.lexsort((rows, keys, group_codes))
+        sorted_keys = keys[order]
+        sorted_groups = group_codes[order]
+        sorted_rows = rows[order]
+
+        is_start = np.r_[
+            True,
+            (sorted_keys[1:] != sorted_keys[:-1]) | (sorted_groups[1:] != sorted_groups[:-1]),
+        ]
+        first_rows = sorted_rows[is_start][np.cumsum(is_start) - 1]
+        encoded_pairs.append(first_rows[~is_start] * num_rows + sorted_rows[~is_start])
+
+    if not encoded_pairs:
+        return np.empty((0, 2), dtype=np.int64)
+
+    encoded_pairs = np.unique(np.concatenate(encoded_pairs)).astype(np.int64)
+    return np.stack([encoded_pairs // num_rows, encoded_pairs % num_rows], axis=1)
+
+
+def cluster_duplicates(num_rows: int, pairs: np.ndarray) -> np.ndarray:
+    """Resolve duplicate pairs into clusters with a vectorized union-find.
+
+    Args:
+        num_rows: Number of rows the pairs index into.
+        pairs: `(num_pairs, 2)` duplicate pairs.
+
+    Returns:
+        np.ndarray: Cluster label of each row, the smallest row of its cluster.
+    """
+
+    labels = np.arange(num_rows)
+    if len(pairs) == 0:
+        return labels
+
+    left, right = pairs[:, 0], pairs[:, 1]
+    while True:
+        # Hook the root of each pair's side onto the smaller of the two roots.
+        lowest = np.minimum(labels[left], labels[right])
+        hooked = labels.copy()
+        np.minimum.at(hooked, labels[left], lowest)
+        np.minimum.at(hooked, labels[right], lowest)
+
+        # Pointer jumping until every row points at its root.
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+def estimate_similarities(
+    signatures: np.ndarray, pairs: np.ndarray, batch_size: int = 1 << 14
+) -> np.ndarray:
+    """Estimate the Jaccard similarity of each pair from its signatures."""
+
+    similarities = np.empty(len(pairs), dtype=np.float64)
+    for start in range(0, len(pairs), batch_size):
+        batch = pairs[start : start + batch_size]
+        similarities[start : start + batch_size] = (
+            signatures[batch[:, 0]] == signatures[batch[:, 1]]
+        ).mean(axis=1)
+
+    return similarities
+
+
+@lru_cache(maxsize=None)
+def get_optimal_lsh_params(threshold: float, num_perm: int) -> tuple[int, int]:
+    """Pick the number of bands and rows per band minimizing LSH errors.
+
+    Minimizes the sum of the false positive and false negative probabilities
+    around `threshold`, like `datasketch.MinHashLSH` does.
+
+    Returns:
+        tuple[int, int]: Number of bands and number of rows per band.
+    """
+
+    step = 0.001
+    similarities = np.arange(0.0, 1.0, step) + step / 2
+    below = similarities < threshold
+
+    best_params, best_error = (1, num_perm), float("inf")
+    for num_bands in range(1, num_perm + 1):
+        for band_size in range(1, num_perm // num_bands + 1):
+            candidate = 1 - (1 - similarities**band_size) ** num_bands
+            false_positive = candidate[below].sum() * step
+            false_negative = (1 - candidate[~below]).sum() * step
+            error = false_positive + false_negative
+            if error < best_error:
+                best_params, best_error = (num_bands, band_size), error
+
+    return best_params
+
+
+def _hash_word(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
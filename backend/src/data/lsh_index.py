@@ -0,0 +1,289 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from .deduplicate_documents import MinHashDeduplicator, estimate_similarities
+
+LSH_INDEX_VERSION = 1
+
+_META_FILE_NAME = "meta.json"
+
+
+class LSHIndex:
+    """Persistent, memory-mapped LSH index of the MinHash signatures of indexed chunks.
+
+    Entries are keyed by Qdrant point id and labelled with a group (the agent
+    id), so new chunks are checked against every chunk already in the
+    collection without recomputing old signatures.
+
+    The index is a list of immutable segments, one per `add()` call. Each
+    segment stores its signatures, point ids and groups, plus its band keys
+    sorted for binary search, as `.npy` files that are memory-mapped when
+    queried. Deleted points are recorded as tombstones and dropped for good by
+    `compact()`, which merges all segments into one.
+
+    Segment files are written before the metadata file that lists them and the
+    tombstones, and the metadata file is replaced atomically, so an interrupted
+    write never leaves a half-written segment visible.
+
+    Args:
+        directory: Directory holding the index files.
+        deduplicator: Deduplicator computing band keys and holding the
+            similarity threshold. Stored signatures are only valid for the same
+            `num_perm` and `seed`.
+    """
+
+    def __init__(self, directory: Path, deduplicator: MinHashDeduplicator) -> None:
+        self.directory = Path(directory)
+        self.deduplicator = deduplicator
+        self.segments: list[str] = []
+        self.next_segment = 0
+        self.tombstones: set[str] = set()
+
+    @classmethod
+    def load(cls, directory: Path, deduplicator: MinHashDeduplicator) -> "LSHIndex":
+        index = cls(directory, deduplicator)
+
+        meta_path = index.directory / _META_FILE_NAME
+        if not meta_path.exists():
+            return index
+
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+
+        if meta.get("version") != LSH_INDEX_VERSION or meta.get("params") != index._params():
+            logger.warning("The LSH index was built with other MinHash parameters. Resetting it.")
+            index.reset()
+            return index
+
+        index.segments = meta["segments"]
+        index.next_segment = meta["next_segment"]
+        index.tombstones = set(meta["tombstones"])
+
+        return index
+
+    def __len__(self) -> int:
+        return sum(len(self._load_segment(segment)["point_ids"]) for segment in self.segments)
+
+    def query(
+        self,
+        signatures: np.ndarray,
+        group: str,
+        point_ids: list[str],
+        exclude: set[str] | None = None,
+    ) -> np.ndarray:
+        """Check which signatures duplicate a live entry of the same group.
+
+        Args:
+            signatures: Signatures of the chunks to check.
+            group: Group the chunks belong to. Only entries of that group match.
+            point_ids: Point ids of the chunks. An entry never matches its own
+                point id, so re-adding a chunk isn't reported as a duplicate.
+            exclude: Point ids of entries to ignore, e.g. chunks about to be
+                deleted in the same update.
+
+        Returns:
+            np.ndarray: Boolean mask of the signatures with a duplicate in the index.
+        """
+
+        duplicates = np.zeros(len(signatures), dtype=bool)
+        if len(signatures) == 0 or not self.segments:
+            return duplicates
+
+        ignored = self.tombstones | (exclude or set())
+        query_keys = self.deduplicator.band_keys(signatures).ravel()
+        query_rows = np.repeat(np.arange(len(signatures)), self.deduplicator.num_bands)
+        query_point_ids = np.asarray(point_ids, dtype="S36")
+
+        for segment in self.segments:
+            data = self._load_segment(segment)
+
+            # Range of entries sharing each query band key.
+            lower = np.searchsorted(data["sorted_keys"], query_keys, side="left")
+            upper = np.searchsorted(data["sorted_keys"], query_keys, side="right")
+            counts = upper - lower
+            if not counts.any():
+                continue
+
+            positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            positions += np.repeat(lower, counts)
+            rows = query_rows.repeat(counts)
+            entries = data["sorted_rows"][positions]
+
+            candidates = np.unique(np.stack([rows, entries], axis=1), axis=0)
+            candidates = candidates[~duplicates[candidates[:, 0]]]
+            if len(candidates) == 0:
+                continue
+
+            entry_point_ids = data["point_ids"][candidates[:, 1]]
+            keep = (data["groups"][candidates[:, 1]] == group) & (
+                entry_point_ids != query_point_ids[candidates[:, 0]]
+            )
+            if ignored:
+                keep &= ~np.isin(entry_point_ids, np.asarray(list(ignored), dtype="S36"))
+            candidates = candidates[keep]
+
+            similarities = _estimate_cross_similarities(
+                signatures, data["signatures"], candidates
+            )
+            duplicates[candidates[similarities >= self.deduplicator.threshold, 0]] = True
+
+        return duplicates
+
+    def add(self, point_ids: list[str], signatures: np.ndarray, group: str) -> None:
+        """Store the signatures of new points of `group` in a new segment."""
+
+        if len(point_ids) == 0:
+            return
+
+        segment = f"{self.next_segment:08d}"
+        self._write_segment(
+            segment,
+            point_ids=np.asarray(point_ids, dtype="S36"),
+            groups=np.asarray([group] * len(point_ids)),
+            signatures=np.ascontiguousarray(signatures, dtype=np.uint32),
+        )
+
+        # A point added again is live again.
+        self.tombstones.difference_update(point_ids)
+        self.segments.append(segment)
+        self.next_segment += 1
+        self._save_meta()
+
+    def remove(self, point_ids: list[str]) -> None:
+        """Tombstone the entries of deleted points."""
+
+        if not point_ids:
+            return
+
+        self.tombstones.update(point_ids)
+        self._save_meta()
+
+    def compact(self) -> None:
+        """Merge all segments into one, dropping tombstoned and superseded entries."""
+
+        if len(self.segments) <= 1 and not self.tombstones:
+            return
+
+        point_ids, groups, signatures = [], [], []
+        for segment in self.segments:
+            data = self._load_segment(segment)
+            point_ids.append(np.asarray(data["point_ids"]))
+            groups.append(np.asarray(data["groups"]))
+            signatures.append(np.asarray(data["signatures"]))
+
+        old_segments = self.segments
+        tombstones = np.asarray(sorted(self.tombstones), dtype="S36")
+        self.segments = []
+        self.tombstones = set()
+        if point_ids:
+            point_ids = np.concatenate(point_ids)
+            groups = np.concatenate(groups).astype(str)
+            signatures = np.concatenate(signatures)
+
+            # Keep the latest entry of every point, and only live points.
+            _, last = np.unique(point_ids[::-1], return_index=True)
+            keep = np.sort(len(point_ids) - 1 - last)
+            keep = keep[~np.isin(point_ids[keep], tombstones)]
+
+            if len(keep):
+                segment = f"{self.next_segment:08d}"
+                self._write_segment(
+                    segment,
+                    point_ids=point_ids[keep],
+                    groups=groups[keep],
+                    signatures=signatures[keep],
+                )
+                self.segments = [segment]
+                self.next_segment += 1
+
+        self._save_meta()
+        for segment in old_segments:
+            self._delete_segment(segment)
+        logger.info(
+            f"Compacted the LSH index from {len(old_segments)} segments to {len(self.segments)}."
+        )
+
+    def reset(self) -> None:
+        """Drop every entry, e.g. when the collection is rebuilt from scratch."""
+
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+        self.segments = []
+        self.next_segment = 0
+        self.tombstones = set()
+        self._save_meta()
+
+    def _params(self) -> dict:
+        return {
+            "num_perm": self.deduplicator.num_perm,
+            "seed": self.deduplicator.seed,
+            "num_bands": self.deduplicator.num_bands,
+            "band_size": self.deduplicator.band_size,
+        }
+
+    def _save_meta(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "version": LSH_INDEX_VERSION,
+            "params": self._params(),
+            "segments": self.segments,
+            "next_segment": self.next_segment,
+            "tombstones": sorted(self.tombstones),
+        }
+
+        tmp_path = self.directory / f"{_META_FILE_NAME}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.directory / _META_FILE_NAME)
+
+    def _write_segment(
+        self,
+        segment: str,
+        point_ids: np.ndarray,
+        groups: np.ndarray,
+        signatures: np.ndarray,
+    ) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        band_keys = self.deduplicator.band_keys(signatures).ravel()
+        order = np.argsort(band_keys, kind="stable")
+        arrays = {
+            "point_ids": point_ids,
+            "groups": groups,
+            "signatures": signatures,
+            "sorted_keys": band_keys[order],
+            "sorted_rows": (order // self.deduplicator.num_bands).astype(np.int64),
+        }
+        for name, array in arrays.items():
+            np.save(self.directory / f"{segment}.{name}.npy", array)
+
+    def _load_segment(self, segment: str) -> dict[str, np.ndarray]:
+        return {
+            name: np.load(self.directory / f"{segment}.{name}.npy", mmap_mode="r")
+            for name in ("point_ids", "groups", "signatures", "sorted_keys", "sorted_rows")
+        }
+
+    def _delete_segment(self, segment: str) -> None:
+        for path in self.directory.glob(f"{segment}.*.npy"):
+            path.unlink()
+
+
+def _estimate_cross_similarities(
+    signatures: np.ndarray, stored_signatures: np.ndarray, pairs: np.ndarray
+) -> np.ndarray:
+    """Estimate the similarity of (query row, stored row) pairs."""
+
+    if len(pairs) == 0:
+        return np.empty(0, dtype=np.float64)
+
+    # Only gather the stored rows involved, then compare within one array.
+    stored_rows, stored_pairs = np.unique(pairs[:, 1], return_inverse=True)
+    combined = np.concatenate([signatures, np.asarray(stored_signatures[stored_rows])])
+    combined_pairs = np.stack([pairs[:, 0], len(signatures) + stored_pairs], axis=1)
+
+    return estimate_similarities(combined, combined_pairs)
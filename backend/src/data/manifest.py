@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+# Namespace of the deterministic point ids, so re-ingesting an unchanged chunk
+# always maps to the same Qdrant point.
+POINT_ID_NAMESPACE = uuid.UUID("7d1f6f5c-3f7e-4c1a-9a51-1f7c2b8e4d20")
+
+MANIFEST_VERSION = 1
+
+
+def get_chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_point_id(agent_id: str, source: str, chunk_hash: str) -> str:
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{agent_id}:{source}:{chunk_hash}"))
+
+
+def get_document_point_id(document: Document) -> str:
+    """Get the deterministic point id of a chunk from its agent, source and content."""
+
+    return get_point_id(
+        agent_id=document.metadata.get("agent_id", ""),
+        source=document.metadata.get("source", ""),
+        chunk_hash=get_chunk_hash(document.page_content),
+    )
+
+
+def get_documents_hash(documents: list[Document]) -> str:
+    """Fingerprint the raw documents of an agent, before splitting."""
+
+    digest = hashlib.sha256()
+    for document in documents:
+        digest.update(document.metadata.get("source", "").encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(document.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_settings_hash(ingestion_settings: dict) -> str:
+    """Fingerprint the settings that shape the indexed chunks and their vectors."""
+
+    return hashlib.sha256(
+        json.dumps(ingestion_settings, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class IngestionManifest:
+    """Local record of what is indexed in the long-term memory collection.
+
+    For every agent it keeps the fingerprint of its raw documents and the ids
+    and content hashes of its indexed chunks, so later runs only upsert changed
+    chunks and delete removed ones. It also tracks the agents completed by the
+    current run, so an interrupted run resumes from the last completed agent,
+    and the fingerprint of the ingestion settings (splitter, chunk size,
+    embedding model...), as chunks indexed with other settings must all be
+    re-indexed.
+
+    The manifest is written atomically after every agent.
+
+    Args:
+        path: Path of the manifest JSON file.
+        data: Parsed manifest content.
+    """
+
+    def __init__(self, path: Path, data: dict | None = None) -> None:
+        self.path = Path(path)
+        self.data = data or self._empty()
+
+    @classmethod
+    def load(cls, path: Path) -> "IngestionManifest":
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+
+        with open(path, "r") as f:
+            data = json.load(f)
+
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+
+        return cls(path, data)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+    def reset(self) -> None:
+        self.data = self._empty()
+
+    # --- Runs ---
+
+    def start_run(self, agent_ids: list[str]) -> bool:
+        """Start a run over `agent_ids`, resuming the previous one if it was interrupted.
+
+        Returns:
+            bool: Whether an interrupted run over the same agents is resumed.
+        """
+
+        run = self.data.get("run")
+        if run and not run["finished"] and run["agents"] == agent_ids:
+            return True
+
+        self.data["run"] = {"agents": agent_ids, "completed": [], "finished": False}
+        return False
+
+    def is_run_interrupted(self) -> bool:
+        run = self.data.get("run")
+        return bool(run) and not run["finished"]
+
+    def is_completed_in_run(self, agent_id: str) -> bool:
+        return agent_id in self.data["run"]["completed"]
+
+    def finish_run(self) -> None:
+        self.data["run"]["finished"] = True
+
+    # --- Settings ---
+
+    def get_settings_hash(self) -> str | None:
+        return self.data.get("settings_hash")
+
+    def set_settings_hash(self, settings_hash: str) -> None:
+        self.data["settings_hash"] = settings_hash
+
+    # --- Agents ---
+
+    def get_indexed_agents(self) -> list[str]:
+        return list(self.data["agents"])
+
+    def get_documents_hash(self, agent_id: str) -> str | None:
+        return self.data["agents"].get(agent_id, {}).get("documents_hash")
+
+    def get_points(self, agent_id: str) -> dict[str, str]:
+        return self.data["agents"].get(agent_id, {}).get("points", {})
+
+    def complete_agent(
+        self, agent_id: str, documents_hash: str, points: dict[str, str]
+    ) -> None:
+        self.data["agents"][agent_id] = {
+            "documents_hash": documents_hash,
+            "points": points,
+        }
+        if agent_id not in self.data["run"]["completed"]:
+            self.data["run"]["completed"].append(agent_id)
+
+    def remove_agent(self, agent_id: str) -> None:
+        self.data["agents"].pop(agent_id, None)
+
+    @staticmethod
+    def _empty() -> dict:
+        return {"version": MANIFEST_VERSION, "settings_hash": None, "agents": {}, "run": None}
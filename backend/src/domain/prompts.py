@@ -62,7 +62,14 @@ Summary of conversation earlier between {{agent_name}} and the user:
 {{summary}}
 
 ---
+{% if retrieved_context %}
+Information about {{agent_name}} relevant to the user's last message. Use it when it helps
+answer, but never quote it verbatim:
 
+{{retrieved_context}}
+
+---
+{% endif %}
 The conversation between {{agent_name}} and the user starts now.
 """
 
@@ -140,3 +147,53 @@ EVALUATION_DATASET_GENERATION_PROMPT = Prompt(
     name="evaluation_dataset_generation_prompt",
     prompt=__EVALUATION_DATASET_GENERATION_PROMPT,
 )
+
+# --- Simulation ---
+
+__SIMULATION_EXCHANGE_OPENING_PROMPT = """(You run into {{partner_name}} while walking around town. Start a short conversation with them about technology and AI.)"""
+
+SIMULATION_EXCHANGE_OPENING_PROMPT = Prompt(
+    name="simulation_exchange_opening_prompt",
+    prompt=__SIMULATION_EXCHANGE_OPENING_PROMPT,
+)
+
+__SIMULATION_EXCHANGE_REPLY_PROMPT = """{{partner_name}} says: {{message}}"""
+
+SIMULATION_EXCHANGE_REPLY_PROMPT = Prompt(
+    name="simulation_exchange_reply_prompt",
+    prompt=__SIMULATION_EXCHANGE_REPLY_PROMPT,
+)
+
+__SIMULATION_EVENT_PROMPT = """(Something just happened in town: {{event}}. React to it in one or two sentences.)"""
+
+SIMULATION_EVENT_PROMPT = Prompt(
+    name="simulation_event_prompt",
+    prompt=__SIMULATION_EVENT_PROMPT,
+)
+
+__SIMULATION_IDLE_THOUGHTS_PROMPT = """
+Each of the characters below is walking around town alone. Write what crosses their mind right now:
+one short thought per character, in the first person, in their own talking style, about technology
+and AI. Each thought must not exceed 30 words.
+
+Return the thoughts in the following JSON format, with one entry per character:
+
+{
+    "thoughts": [
+        {"id": "<character_id>", "thought": "<thought>"}
+    ]
+}
+
+Characters:
+{% for npc in npcs %}
+- id: {{npc.id}}
+  name: {{npc.name}}
+  perspective: {{npc.perspective}}
+  talking style: {{npc.style}}
+{% endfor %}
+"""
+
+SIMULATION_IDLE_THOUGHTS_PROMPT = Prompt(
+    name="simulation_idle_thoughts_prompt",
+    prompt=__SIMULATION_IDLE_THOUGHTS_PROMPT,
+)
@@ -4,8 +4,11 @@ from pydantic import BaseModel
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from src.application.conversation_service.checkpointer import close_checkpointer
+
 from .chat import router as chat_router
 from .memory import router as memory_router
+from .metrics import router as metrics_router
 from fastapi import WebSocket
 import os
 from dotenv import load_dotenv
@@ -24,6 +27,7 @@ async def lifespan(app: FastAPI):
     yield
     # Do things after app stops e.g Clean up the ML models and release the resources
     print("Shutting down...")
+    await close_checkpointer()
     optik_tracer = OpikTracer()
     optik_tracer.shutdown()
 
@@ -34,6 +38,7 @@ app = FastAPI(lifespan=lifespan)
 # include routers
 app.include_router(chat_router)
 app.include_router(memory_router)
+app.include_router(metrics_router)
 
 
 app.add_middleware(
@@ -11,6 +11,7 @@ router = APIRouter()
 class ChatMessage(BaseModel):
     message: str
     agent_id: str
+    player_id: str | None = None
 
 @router.post("/chat")
 async def chat(chat_message: ChatMessage):
@@ -25,6 +26,7 @@ async def chat(chat_message: ChatMessage):
             agent_perspective=agent.perspective,
             agent_style=agent.style,
             agent_context="",
+            player_id=chat_message.player_id,
         )
         return {"response": response}
     except Exception as e:
@@ -64,6 +66,7 @@ async def websocket_chat(websocket: WebSocket):
                     agent_perspective=agent.perspective,
                     agent_style=agent.style,
                     agent_context="",
+                    player_id=data.get("player_id"),
                 )
 
                 # Send initial message to indicate streaming has started
@@ -1,12 +1,36 @@
+from datetime import datetime
+
 from fastapi import APIRouter, HTTPException
-from src.application.conversation_service.reset_conversation import reset_conversation_state, reset_specific_conversation
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from src.application.conversation_service.export_conversations import (
+    decode_cursor,
+    encode_ndjson,
+    export_conversations,
+)
+from src.application.conversation_service.reset_conversation import (
+    get_reset_job,
+    list_reset_jobs,
+    reset_agent_conversations,
+    reset_conversation_state,
+    reset_conversations_with_prefix,
+    reset_specific_conversation,
+    start_reset_job,
+)
 
 router = APIRouter()
 
 
+class ResetJobRequest(BaseModel):
+    thread_id: str | None = None
+    prefix: str | None = None
+    agent_id: str | None = None
+
+
 @router.post("/reset-memory")
 async def reset_all_conversations():
-    """Reset all conversation checkpoints in MongoDB"""
+    """Reset all conversation checkpoints"""
     try:
         result = await reset_conversation_state()
         if result["success"]:
@@ -17,9 +41,65 @@ async def reset_all_conversations():
         raise HTTPException(status_code=500, detail=f"Failed to reset conversations: {str(e)}")
 
 
+@router.post("/reset-memory/jobs", status_code=202)
+async def start_reset_job_endpoint(request: ResetJobRequest | None = None):
+    """Start a background reset of the matching conversations, or of all of them"""
+    request = request or ResetJobRequest()
+    if sum(value is not None for value in request.model_dump().values()) > 1:
+        raise HTTPException(
+            status_code=400, detail="Pass at most one of thread_id, prefix or agent_id."
+        )
+
+    job = start_reset_job(
+        thread_id=request.thread_id, prefix=request.prefix, agent_id=request.agent_id
+    )
+    return job.to_dict()
+
+
+@router.get("/reset-memory/jobs")
+async def list_reset_jobs_endpoint():
+    """List the background reset jobs of this worker"""
+    return [job.to_dict() for job in list_reset_jobs()]
+
+
+@router.get("/reset-memory/jobs/{job_id}")
+async def get_reset_job_endpoint(job_id: str):
+    """Get the progress of a background reset job"""
+    job = get_reset_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Reset job {job_id} not found")
+    return job.to_dict()
+
+
+@router.delete("/reset-memory/prefix/{prefix}")
+async def reset_conversations_with_prefix_endpoint(prefix: str):
+    """Reset every conversation thread whose ID starts with the prefix"""
+    try:
+        result = await reset_conversations_with_prefix(prefix)
+        if result["success"]:
+            return result
+        else:
+            raise HTTPException(status_code=500, detail=result["message"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to reset threads starting with {prefix}: {str(e)}")
+
+
+@router.delete("/reset-memory/agent/{agent_id}")
+async def reset_agent_conversations_endpoint(agent_id: str):
+    """Reset an agent's main conversation thread and its new threads"""
+    try:
+        result = await reset_agent_conversations(agent_id)
+        if result["success"]:
+            return result
+        else:
+            raise HTTPException(status_code=500, detail=result["message"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to reset agent {agent_id}: {str(e)}")
+
+
 @router.delete("/reset-memory/{thread_id}")
 async def reset_specific_conversation_endpoint(thread_id: str):
-    """Reset a specific conversation thread in MongoDB"""
+    """Reset a specific conversation thread"""
     try:
         result = await reset_specific_conversation(thread_id)
         if result["success"]:
@@ -27,4 +107,28 @@ async def reset_specific_conversation_endpoint(thread_id: str):
         else:
             raise HTTPException(status_code=500, detail=result["message"])
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to reset thread {thread_id}: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to reset thread {thread_id}: {str(e)}")
+
+
+@router.get("/conversations/export")
+async def export_conversations_endpoint(
+    agent_id: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    compress: bool = False,
+):
+    """Stream the latest message history of every thread as NDJSON, optionally gzipped"""
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    records = export_conversations(agent_id=agent_id, since=since, until=until, cursor=cursor)
+    filename = "conversations.ndjson.gz" if compress else "conversations.ndjson"
+    return StreamingResponse(
+        encode_ndjson(records, compress=compress),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from src.application.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """Return the in-process metrics of this worker"""
+    return metrics.snapshot()
@@ -1,21 +1,135 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
 from loguru import logger
 from langchain.schema.retriever import BaseRetriever
 from langchain_core.documents import Document
+from langchain_qdrant import RetrievalMode
+from qdrant_client import models
 
 
-from src.application.rag import get_retriever, get_splitter
+from src.application.pipeline import Pipeline, PipelineStage
+from src.application.rag import get_agent_filter, get_retriever, get_splitter
+from src.application.rag.splitter import ENCODING_NAME, Splitter
+from src.application.rag.bulk_embeddings import BulkEmbedder
+from src.application.rag.qdrant import (
+    delete_collection,
+    get_async_qdrant_client,
+    get_qdrant_client,
+)
 from src.config import settings
 from src.domain.adaptive_agent import AdaptiveAgentExtract, AdaptiveAgent
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from src.data import get_extraction_generator, deduplicate_documents
+from src.domain.agent_factory import AgentsFactory
+from src.data.deduplicate_documents import (
+    MinHashDeduplicator,
+    deduplicate_documents_with_signatures,
+)
+from src.data.extract import extract
+from src.data.lsh_index import LSHIndex
+from src.data.manifest import (
+    IngestionManifest,
+    get_chunk_hash,
+    get_document_point_id,
+    get_documents_hash,
+    get_settings_hash,
+)
+
+DEDUPLICATION_THRESHOLD = 0.7
+DEDUPLICATION_NUM_PERM = int(settings.RAG_CHUNK_SIZE * 0.5)
+
+
+@dataclass
+class SplitChunks:
+    """Chunks of one agent, passed from the split to the embed stage."""
 
-Splitter = RecursiveCharacterTextSplitter
+    unchanged_points: dict[str, str]
+    new_chunks: list[Document]
+    new_point_ids: list[str]
+    new_signatures: np.ndarray
+
+
+@dataclass
+class AgentUpdate:
+    """Changes of one agent's chunks, passed from the embed to the commit stage."""
+
+    agent: AdaptiveAgent
+    documents_hash: str
+    points: dict[str, str]
+    new_point_ids: list[str]
+    new_signatures: np.ndarray
+    removed_ids: list[str]
+    upserts: list[asyncio.Future]
 
 
 class LongTermMemoryCreator:
-    def __init__(self, retriever: BaseRetriever, splitter: Splitter)-> None:
+    """Builds the agents' long-term memory collection.
+
+    Ingestion runs as a pipeline of concurrent stages connected by bounded
+    queues: sources are extracted in threads, split and deduplicated in a
+    process pool, embedded in length-bucketed batches by a second process pool
+    and committed. While one agent is embedded the next ones are already being
+    extracted and split, so wall-clock time is bound by the slowest stage rather
+    than by the sum of all stages over all agents. Embedded points are upserted
+    as soon as a batch of them is ready, while the rest of the agent is still
+    being embedded.
+
+    Besides the per-agent deduplication, new chunks are checked against a
+    persistent LSH index of every chunk already indexed for the same agent, so
+    content duplicated by a newly added source is skipped too.
+
+    Args:
+        retriever: Retriever over the long-term memory vector store.
+        chunk_size: Number of tokens of each chunk.
+        manifest_path: Path of the ingestion manifest.
+        lsh_index_dir: Directory of the persistent LSH index.
+        lsh_max_segments: Number of LSH index segments above which the index is
+            compacted at the end of a run.
+        extraction_workers: Number of agents extracted concurrently.
+        process_workers: Number of processes splitting and deduplicating
+            documents. 0 uses every CPU core.
+        embedding_batch_size: Number of chunks embedded per model call.
+        embedding_workers: Number of processes embedding chunks. 0 uses one
+            process per four CPU cores, 1 embeds in-process.
+        upsert_batch_size: Number of points per Qdrant upsert request.
+        upsert_workers: Number of concurrent Qdrant upsert requests, and of
+            agents committed concurrently.
+        queue_size: Maximum number of agents waiting in front of each stage.
+    """
+
+    def __init__(
+        self,
+        retriever: BaseRetriever,
+        chunk_size: int,
+        manifest_path: Path,
+        lsh_index_dir: Path,
+        lsh_max_segments: int = 16,
+        extraction_workers: int = 8,
+        process_workers: int = 0,
+        embedding_batch_size: int = 64,
+        embedding_workers: int = 1,
+        upsert_batch_size: int = 256,
+        upsert_workers: int = 2,
+        queue_size: int = 8,
+    ) -> None:
         self.retriever = retriever
-        self.splitter = splitter
+        self.chunk_size = chunk_size
+        self.manifest_path = manifest_path
+        self.lsh_index_dir = lsh_index_dir
+        self.lsh_max_segments = lsh_max_segments
+        self.extraction_workers = extraction_workers
+        self.process_workers = process_workers or multiprocessing.cpu_count()
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_workers = embedding_workers
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_workers = upsert_workers
+        self.queue_size = queue_size
 
     @classmethod
     def build_from_settings(cls) -> "LongTermMemoryCreator":
@@ -24,34 +138,389 @@ class LongTermMemoryCreator:
             k=settings.RAG_TOP_K,
             device=settings.RAG_DEVICE,
         )
-        splitter = get_splitter(chunk_size=settings.RAG_CHUNK_SIZE)
-        return cls(retriever, splitter)
+        return cls(
+            retriever,
+            chunk_size=settings.RAG_CHUNK_SIZE,
+            manifest_path=settings.LONG_TERM_MEMORY_MANIFEST_FILE_PATH,
+            lsh_index_dir=settings.LONG_TERM_MEMORY_LSH_INDEX_DIR,
+            lsh_max_segments=settings.LONG_TERM_MEMORY_LSH_MAX_SEGMENTS,
+            extraction_workers=settings.LONG_TERM_MEMORY_EXTRACTION_WORKERS,
+            process_workers=settings.LONG_TERM_MEMORY_PROCESS_WORKERS,
+            embedding_batch_size=settings.LONG_TERM_MEMORY_EMBEDDING_BATCH_SIZE,
+            embedding_workers=settings.LONG_TERM_MEMORY_EMBEDDING_WORKERS,
+            upsert_batch_size=settings.LONG_TERM_MEMORY_UPSERT_BATCH_SIZE,
+            upsert_workers=settings.LONG_TERM_MEMORY_UPSERT_WORKERS,
+            queue_size=settings.LONG_TERM_MEMORY_QUEUE_SIZE,
+        )
+
+    def __call__(self, agents: list[AdaptiveAgentExtract], full_rebuild: bool = False) -> None:
+        """Incrementally sync the long-term memory with the agents' sources.
+
+        Only chunks that changed since the last run are embedded and upserted, and
+        chunks that disappeared are deleted. An interrupted run resumes after the
+        last completed agent.
+
+        Args:
+            agents: Agents whose sources make up the long-term memory.
+            full_rebuild: Whether to drop the collection and re-index everything.
+        """
 
-    def __call__(self, agents: list[AdaptiveAgentExtract]) -> None:
         if len(agents) == 0:
             logger.warning("No agents to extract. Exiting...")
             return
-        
-        # First clear the long term memory collection to avoid duplicates.
-        try:
-            self.retriever.vectorstore.client.delete_collection(settings.QDRANT_COLLECTION_NAME)
-        except Exception:
-            pass  # Collection might not exist yet
-        
-        # Recreate the retriever after collection deletion
-        from src.application.rag import get_retriever
-        self.retriever = get_retriever(
-            embedding_model_id=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
-            k=settings.RAG_TOP_K,
+
+        manifest = IngestionManifest.load(self.manifest_path)
+        lsh_index = LSHIndex.load(
+            self.lsh_index_dir,
+            MinHashDeduplicator(DEDUPLICATION_THRESHOLD, num_perm=DEDUPLICATION_NUM_PERM),
+        )
+        if not full_rebuild and not self._is_in_sync(manifest):
+            logger.warning("The long-term memory collection is out of sync with the manifest.")
+            full_rebuild = True
+
+        settings_hash = self._get_settings_hash()
+        if (
+            not full_rebuild
+            and manifest.get_indexed_agents()
+            and manifest.get_settings_hash() != settings_hash
+        ):
+            logger.warning(
+                "The ingestion settings changed since the long-term memory was indexed."
+            )
+            full_rebuild = True
+
+        if full_rebuild:
+            logger.info("Rebuilding the long-term memory from scratch.")
+            try:
+                delete_collection(settings.QDRANT_COLLECTION_NAME)
+            except Exception:
+                pass  # Collection might not exist yet
+            manifest.reset()
+            lsh_index.reset()
+
+            # Recreate the retriever after collection deletion
+            self.retriever = get_retriever(
+                embedding_model_id=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
+                k=settings.RAG_TOP_K,
+                device=settings.RAG_DEVICE,
+            )
+
+        manifest.set_settings_hash(settings_hash)
+
+        agent_ids = [agent.id for agent in agents]
+        for agent_id in set(manifest.get_indexed_agents()) - set(agent_ids):
+            logger.info(f"Removing agent '{agent_id}' from the long-term memory.")
+            point_ids = list(manifest.get_points(agent_id))
+            self.retriever.vectorstore.delete(ids=point_ids)
+            lsh_index.remove(point_ids)
+            manifest.remove_agent(agent_id)
+            manifest.save()
+
+        if manifest.start_run(agent_ids):
+            logger.info("Resuming the interrupted long-term memory run.")
+        pending_agents = [agent for agent in agents if not manifest.is_completed_in_run(agent.id)]
+
+        asyncio.run(self._ingest(pending_agents, manifest, lsh_index))
+
+        if len(lsh_index.segments) > self.lsh_max_segments:
+            lsh_index.compact()
+
+        manifest.finish_run()
+        manifest.save()
+
+    async def _ingest(
+        self,
+        agents: list[AdaptiveAgentExtract],
+        manifest: IngestionManifest,
+        lsh_index: LSHIndex,
+    ) -> None:
+        agents_factory = AgentsFactory()
+        loop = asyncio.get_running_loop()
+
+        # Spawned rather than forked: forking while extraction threads hold locks
+        # can deadlock the workers.
+        with ProcessPoolExecutor(
+            max_workers=self.process_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as process_pool, BulkEmbedder(
+            self.retriever.vectorstore.embeddings,
+            model_id=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
             device=settings.RAG_DEVICE,
+            batch_size=self.embedding_batch_size,
+            workers=self.embedding_workers,
+        ) as embedder:
+            upsert_slots = asyncio.Semaphore(self.upsert_workers)
+
+            async def extract_agent(agent_extract: AdaptiveAgentExtract):
+                agent = agents_factory.get_agent(agent_extract.id)
+                docs = await asyncio.to_thread(extract, agent, agent_extract.urls)
+                logger.info(f"Extracted {len(docs)} documents for agent '{agent.id}'.")
+
+                return agent, docs
+
+            async def split_agent(item: tuple[AdaptiveAgent, list[Document]]):
+                agent, docs = item
+                documents_hash = get_documents_hash(docs)
+                if documents_hash == manifest.get_documents_hash(agent.id):
+                    logger.info(f"Sources of agent '{agent.id}' are unchanged. Skipping.")
+                    manifest.complete_agent(agent.id, documents_hash, manifest.get_points(agent.id))
+                    manifest.save()
+                    return None
+
+                split_chunks = await loop.run_in_executor(
+                    process_pool,
+                    split_and_deduplicate,
+                    docs,
+                    self.chunk_size,
+                    set(manifest.get_points(agent.id)),
+                    DEDUPLICATION_THRESHOLD,
+                    DEDUPLICATION_NUM_PERM,
+                )
+
+                return agent, documents_hash, split_chunks
+
+            pipeline = Pipeline(
+                name="ingestion",
+                stages=[
+                    PipelineStage("extract", extract_agent, workers=self.extraction_workers),
+                    PipelineStage("split", split_agent, workers=self.process_workers),
+                    PipelineStage(
+                        "embed",
+                        lambda item: self._embed_agent(
+                            item, manifest, lsh_index, embedder, upsert_slots
+                        ),
+                        workers=1,
+                    ),
+                    PipelineStage(
+                        "commit",
+                        lambda item: self._commit_agent(item, manifest, lsh_index),
+                        workers=self.upsert_workers,
+                    ),
+                ],
+                queue_size=self.queue_size,
+            )
+            await pipeline.run(agents)
+
+    async def _embed_agent(
+        self,
+        item: tuple[AdaptiveAgent, str, SplitChunks],
+        manifest: IngestionManifest,
+        lsh_index: LSHIndex,
+        embedder: BulkEmbedder,
+        upsert_slots: asyncio.Semaphore,
+    ) -> AgentUpdate:
+        """Diff an agent's chunks against the manifest, then embed and upsert the new ones.
+
+        Upserts are started as soon as a batch of points is embedded, and are
+        awaited by the commit stage.
+        """
+
+        agent, documents_hash, split_chunks = item
+
+        points = dict(split_chunks.unchanged_points)
+        for chunk, point_id in zip(split_chunks.new_chunks, split_chunks.new_point_ids):
+            points[point_id] = get_chunk_hash(chunk.page_content)
+        removed_ids = [
+            point_id for point_id in manifest.get_points(agent.id) if point_id not in points
+        ]
+
+        # Skip new chunks duplicating content already indexed for the agent,
+        # ignoring the chunks this update deletes.
+        duplicates = lsh_index.query(
+            split_chunks.new_signatures,
+            group=agent.id,
+            point_ids=split_chunks.new_point_ids,
+            exclude=set(removed_ids),
+        )
+        new_chunks: dict[str, int] = {}
+        for i, point_id in enumerate(split_chunks.new_point_ids):
+            if duplicates[i]:
+                del points[point_id]
+            else:
+                new_chunks[point_id] = i
+        chunks = [split_chunks.new_chunks[i] for i in new_chunks.values()]
+        new_point_ids = list(new_chunks)
+
+        vectorstore = self.retriever.vectorstore
+        qdrant_client = get_async_qdrant_client()
+
+        async def upsert(batch_points: list[models.PointStruct]) -> None:
+            async with upsert_slots:
+                await qdrant_client.upsert(
+                    collection_name=settings.QDRANT_COLLECTION_NAME, points=batch_points
+                )
+
+        upserts: list[asyncio.Future] = []
+        pending_points: list[models.PointStruct] = []
+        start = time.perf_counter()
+        async for indices, dense_vectors in embedder.embed(
+            [chunk.page_content for chunk in chunks]
+        ):
+            texts = [chunks[i].page_content for i in indices]
+            vectors = await asyncio.to_thread(self._build_vectors, texts, dense_vectors)
+            pending_points.extend(
+                models.PointStruct(
+                    id=new_point_ids[i],
+                    vector=vector,
+                    payload={
+                        vectorstore.content_payload_key: chunks[i].page_content,
+                        vectorstore.metadata_payload_key: chunks[i].metadata,
+                    },
+                )
+                for i, vector in zip(indices, vectors)
+            )
+            while len(pending_points) >= self.upsert_batch_size:
+                batch_points = pending_points[: self.upsert_batch_size]
+                upserts.append(asyncio.ensure_future(upsert(batch_points)))
+                del pending_points[: self.upsert_batch_size]
+        if pending_points:
+            upserts.append(asyncio.ensure_future(upsert(pending_points)))
+        seconds = time.perf_counter() - start
+
+        logger.info(
+            f"Agent '{agent.id}': {len(chunks)} new, {len(removed_ids)} removed, "
+            f"{len(points) - len(chunks)} unchanged chunks, "
+            f"{int(duplicates.sum())} duplicates of indexed chunks. "
+            f"Embedded at {len(chunks) / max(seconds, 1e-9):.1f} chunks/s."
+        )
+
+        return AgentUpdate(
+            agent=agent,
+            documents_hash=documents_hash,
+            points=points,
+            new_point_ids=new_point_ids,
+            new_signatures=split_chunks.new_signatures[list(new_chunks.values())],
+            removed_ids=removed_ids,
+            upserts=upserts,
+        )
+
+    def _build_vectors(self, texts: list[str], dense_vectors: np.ndarray) -> list[dict]:
+        vectorstore = self.retriever.vectorstore
+        vectors = [{vectorstore.vector_name: vector.tolist()} for vector in dense_vectors]
+
+        if vectorstore.retrieval_mode == RetrievalMode.HYBRID:
+            sparse_vectors = vectorstore.sparse_embeddings.embed_documents(texts)
+            for vector, sparse_vector in zip(vectors, sparse_vectors):
+                vector[vectorstore.sparse_vector_name] = models.SparseVector(
+                    indices=sparse_vector.indices, values=sparse_vector.values
+                )
+
+        return vectors
+
+    async def _commit_agent(
+        self,
+        update: AgentUpdate,
+        manifest: IngestionManifest,
+        lsh_index: LSHIndex,
+    ) -> None:
+        """Wait for an agent's upserts and delete its removed points, then record it."""
+
+        qdrant_client = get_async_qdrant_client()
+
+        await asyncio.gather(*update.upserts)
+        lsh_index.add(update.new_point_ids, update.new_signatures, group=update.agent.id)
+        if update.removed_ids:
+            await qdrant_client.delete(
+                collection_name=settings.QDRANT_COLLECTION_NAME,
+                points_selector=models.PointIdsList(points=update.removed_ids),
+            )
+            lsh_index.remove(update.removed_ids)
+
+        manifest.complete_agent(update.agent.id, update.documents_hash, update.points)
+        manifest.save()
+
+    def _get_settings_hash(self) -> str:
+        """
+        Fingerprint the settings the chunks and vectors of the collection depend on.
+        """
+        return get_settings_hash(
+            {
+                "splitter": f"{Splitter.__name__}:{ENCODING_NAME}",
+                "chunk_size": self.chunk_size,
+                "deduplication": [DEDUPLICATION_THRESHOLD, DEDUPLICATION_NUM_PERM],
+                "embedding_model_id": settings.RAG_TEXT_EMBEDDING_MODEL_ID,
+                "embedding_model_dim": settings.RAG_TEXT_EMBEDDING_MODEL_DIM,
+                "embedding_backend": settings.RAG_EMBEDDING_BACKEND,
+                "retrieval_mode": settings.RAG_RETRIEVAL_MODE,
+            }
         )
-        
-        extraction_generator = get_extraction_generator(agents)
-        for _, docs in extraction_generator:
-            chunked_docs = self.splitter.split_documents(docs)
-            chunked_docs = deduplicate_documents(chunked_docs, threshold=0.7)
-            self.retriever.vectorstore.add_documents(chunked_docs)
 
+    def _is_in_sync(self, manifest: IngestionManifest) -> bool:
+        """Check that the collection holds exactly the points listed in the manifest.
+
+        Interrupted runs are trusted: the agent that was being indexed is simply
+        processed again, and its upserts are idempotent.
+        """
+
+        if manifest.is_run_interrupted():
+            return True
+
+        qdrant_client = get_qdrant_client()
+        if not qdrant_client.collection_exists(settings.QDRANT_COLLECTION_NAME):
+            return False
+
+        indexed_points = sum(
+            len(manifest.get_points(agent_id)) for agent_id in manifest.get_indexed_agents()
+        )
+        collection_points = qdrant_client.count(
+            collection_name=settings.QDRANT_COLLECTION_NAME, exact=True
+        ).count
+
+        return collection_points == indexed_points
+
+
+def split_and_deduplicate(
+    documents: list[Document],
+    chunk_size: int,
+    indexed_point_ids: set[str],
+    threshold: float,
+    num_perm: int,
+) -> SplitChunks:
+    """Split an agent's documents and deduplicate the chunks that aren't indexed yet.
+
+    Indexed chunks were deduplicated when they were added, so only the new ones
+    get MinHash signatures. Duplicates between new and indexed chunks are found
+    afterwards with the persistent LSH index. The splitter stores each chunk's
+    token count, so context packing doesn't re-tokenize at query time.
+
+    Runs in the ingestion process pool, so it must stay a picklable module-level function.
+    """
+
+    unchanged_points: dict[str, str] = {}
+    new_chunks: list[Document] = []
+    for chunk in _get_splitter(chunk_size).split_documents(documents):
+        point_id = get_document_point_id(chunk)
+        if point_id in indexed_point_ids:
+            unchanged_points[point_id] = get_chunk_hash(chunk.page_content)
+        elif point_id not in unchanged_points:
+            new_chunks.append(chunk)
+
+    new_chunks, new_signatures = deduplicate_documents_with_signatures(
+        new_chunks, _get_deduplicator(threshold, num_perm)
+    )
+
+    # Exact copies share a point id: keep the first one.
+    new_point_ids = [get_document_point_id(chunk) for chunk in new_chunks]
+    first = {point_id: i for i, point_id in reversed(list(enumerate(new_point_ids)))}
+    keep = sorted(first.values())
+
+    return SplitChunks(
+        unchanged_points=unchanged_points,
+        new_chunks=[new_chunks[i] for i in keep],
+        new_point_ids=[new_point_ids[i] for i in keep],
+        new_signatures=new_signatures[keep],
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_splitter(chunk_size: int):
+    # Built once per worker process.
+    return get_splitter(chunk_size=chunk_size)
+
+
+@lru_cache(maxsize=None)
+def _get_deduplicator(threshold: float, num_perm: int) -> MinHashDeduplicator:
+    return MinHashDeduplicator(threshold=threshold, num_perm=num_perm)
 
 
 class LongTermMemoryRetriever:
@@ -68,5 +537,8 @@ class LongTermMemoryRetriever:
 
         return cls(retriever)
 
-    def __call__(self, query: str) -> list[Document]:
-        return self.retriever.invoke(query)
+    def __call__(self, query: str, agent_id: str | None = None) -> list[Document]:
+        if agent_id is None:
+            return self.retriever.invoke(query)
+
+        return self.retriever.invoke(query, filter=get_agent_filter(agent_id))
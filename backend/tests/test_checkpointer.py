@@ -0,0 +1,120 @@
+import asyncio
+
+import aiosqlite
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.constants import ERROR
+
+from src.application.conversation_service import sqlite
+from src.application.conversation_service.checkpointer import (
+    CachedCheckpointSaver,
+    CheckpointCache,
+    close_checkpointer,
+    get_checkpointer,
+)
+from src.config import settings
+
+
+def test_concurrent_first_calls_open_one_connection(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CHECKPOINTER_BACKEND", "sqlite")
+    monkeypatch.setattr(settings, "SQLITE_CHECKPOINT_PATH", tmp_path / "checkpoints.sqlite")
+
+    connect = aiosqlite.connect
+    connections = []
+
+    def counting_connect(*args, **kwargs):
+        connections.append(args)
+        return connect(*args, **kwargs)
+
+    monkeypatch.setattr(aiosqlite, "connect", counting_connect)
+
+    async def get_one():
+        async with get_checkpointer() as checkpointer:
+            return checkpointer
+
+    async def run():
+        try:
+            checkpointers = await asyncio.gather(*(get_one() for _ in range(5)))
+            sqlite_checkpointers = await asyncio.gather(
+                *(sqlite.get_sqlite_checkpointer() for _ in range(5))
+            )
+        finally:
+            await close_checkpointer()
+
+        return checkpointers, sqlite_checkpointers
+
+    checkpointers, sqlite_checkpointers = asyncio.run(run())
+
+    assert len(connections) == 1
+    assert len({id(checkpointer) for checkpointer in checkpointers}) == 1
+    assert len({id(checkpointer) for checkpointer in sqlite_checkpointers}) == 1
+
+
+def test_group_commit_waits_for_the_saver_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CHECKPOINTER_BACKEND", "sqlite")
+    monkeypatch.setattr(settings, "SQLITE_CHECKPOINT_PATH", tmp_path / "checkpoints.sqlite")
+    monkeypatch.setattr(settings, "SQLITE_COMMIT_INTERVAL_MS", 10)
+
+    async def count_committed() -> int:
+        async with aiosqlite.connect(tmp_path / "checkpoints.sqlite") as reader:
+            async with reader.execute(f"SELECT COUNT(*) FROM {sqlite.WRITES_TABLE}") as cursor:
+                return (await cursor.fetchone())[0]
+
+    async def run():
+        checkpointer = await sqlite.get_sqlite_checkpointer()
+        try:
+            async with checkpointer.lock:
+                for idx in range(2):
+                    await checkpointer.conn.execute(
+                        f"INSERT INTO {sqlite.WRITES_TABLE} "
+                        "(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel) "
+                        "VALUES ('thread', '', 'checkpoint', 'task', ?, 'channel')",
+                        (idx,),
+                    )
+                    await checkpointer.conn.commit()
+                    # The scheduled commit is due, but the write isn't finished.
+                    await asyncio.sleep(0.05)
+                    assert await count_committed() == 0
+
+            await asyncio.sleep(0.05)
+            return await count_committed()
+        finally:
+            await close_checkpointer()
+
+    assert asyncio.run(run()) == 2
+
+
+def test_prefix_range_past_the_last_code_points():
+    assert sqlite.get_prefix_range("abc") == ("abc", "abd")
+    assert sqlite.get_prefix_range("a퟿") == ("a퟿", "a")
+    assert sqlite.get_prefix_range("a\U0010ffff") == ("a\U0010ffff", "b")
+    assert sqlite.get_prefix_range("\U0010ffff") == ("\U0010ffff", None)
+
+
+def test_cached_writes_match_the_stored_ones_after_a_refill():
+    thread_config = {"configurable": {"thread_id": "thread", "checkpoint_ns": ""}}
+
+    async def run():
+        saver = MemorySaver()
+        config = await saver.aput(thread_config, empty_checkpoint(), {}, {})
+        await saver.aput_writes(config, [("a", 1), ("b", 2)], task_id="task")
+        await saver.aput_writes(config, [(ERROR, "first")], task_id="task")
+
+        # The first read fills the cache from the stored writes.
+        cached_saver = CachedCheckpointSaver(saver, CheckpointCache(max_bytes=1 << 20))
+        await cached_saver.aget_tuple(thread_config)
+        await cached_saver.aput_writes(config, [("a", 1), ("b", 2)], task_id="task")
+        await cached_saver.aput_writes(config, [(ERROR, "second")], task_id="task")
+
+        cached = await cached_saver.aget_tuple(thread_config)
+        stored = await saver.aget_tuple(thread_config)
+        return cached.pending_writes, stored.pending_writes
+
+    cached_writes, stored_writes = asyncio.run(run())
+
+    assert sorted(cached_writes) == sorted(stored_writes)
+    assert sorted(cached_writes) == [
+        ("task", ERROR, "second"),
+        ("task", "a", 1),
+        ("task", "b", 2),
+    ]
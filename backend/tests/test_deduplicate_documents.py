@@ -0,0 +1,165 @@
+import random
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.data.deduplicate_documents import (
+    SHINGLE_SIZE,
+    MinHashDeduplicator,
+    cluster_duplicates,
+    deduplicate_documents,
+    find_candidate_pairs,
+    find_duplicates,
+    get_optimal_lsh_params,
+)
+
+_VOCABULARY = [f"word{i}" for i in range(2_000)]
+
+
+def _random_text(rng: random.Random, num_words: int = 120) -> str:
+    return " ".join(rng.choice(_VOCABULARY) for _ in range(num_words))
+
+
+def _edit(rng: random.Random, text: str, num_edits: int = 2) -> str:
+    words = text.split()
+    for i in rng.sample(range(len(words)), num_edits):
+        words[i] = rng.choice(_VOCABULARY)
+    return " ".join(words)
+
+
+def test_shingle_hashes_count_the_shingles_of_each_text():
+    deduplicator = MinHashDeduplicator()
+    texts = ["one two three four five", "", "too short", "a b c"]
+
+    hashes, counts = deduplicator._shingle_hashes(texts)
+
+    # Short texts are padded into a single shingle, empty ones have none.
+    assert counts.tolist() == [5 - SHINGLE_SIZE + 1, 0, 1, 1]
+    assert len(hashes) == counts.sum()
+    assert hashes.max() <= 0xFFFFFFFF
+
+
+def test_shingle_hashes_do_not_straddle_texts():
+    deduplicator = MinHashDeduplicator()
+    texts = ["alpha beta gamma delta", "epsilon zeta eta", "theta iota"]
+
+    hashes, _ = deduplicator._shingle_hashes(texts)
+    separate = np.concatenate([deduplicator._shingle_hashes([text])[0] for text in texts])
+
+    assert np.array_equal(hashes, separate)
+
+
+def test_signatures_do_not_depend_on_the_block_size():
+    rng = random.Random(0)
+    texts = [_random_text(rng, rng.randint(0, 200)) for _ in range(50)]
+
+    signatures = MinHashDeduplicator(block_size=1 << 16).signatures(texts)
+    blocked = MinHashDeduplicator(block_size=64).signatures(texts)
+
+    assert signatures.shape == (50, 128)
+    assert np.array_equal(signatures, blocked)
+
+
+def test_signatures_of_empty_texts_never_match():
+    deduplicator = MinHashDeduplicator()
+
+    signatures = deduplicator.signatures(["", "   ", "", "!!"])
+    pairs, _ = deduplicator.find_duplicates(signatures)
+
+    assert (signatures == 0xFFFFFFFF).all()
+    assert len(pairs) == 0
+
+
+def test_find_candidate_pairs_links_buckets_as_stars():
+    band_keys = np.array([[1, 7], [2, 7], [1, 8], [1, 9], [3, 3]], dtype=np.uint64)
+
+    pairs = find_candidate_pairs(band_keys)
+
+    # Bucket {0, 2, 3} in band 0 and {0, 1} in band 1, each linked to row 0.
+    assert pairs.tolist() == [[0, 1], [0, 2], [0, 3]]
+
+
+def test_find_candidate_pairs_respects_exclude_and_groups():
+    band_keys = np.array([[1], [1], [1], [1]], dtype=np.uint64)
+
+    excluded = find_candidate_pairs(band_keys, exclude=np.array([True, False, False, False]))
+    grouped = find_candidate_pairs(band_keys, groups=np.array(["a", "b", "a", "b"]))
+
+    assert excluded.tolist() == [[1, 2], [1, 3]]
+    assert grouped.tolist() == [[0, 2], [1, 3]]
+
+
+def test_cluster_duplicates_follows_chains():
+    pairs = np.array([[3, 4], [1, 3], [5, 6], [0, 1]])
+
+    clusters = cluster_duplicates(8, pairs)
+
+    assert clusters.tolist() == [0, 0, 2, 0, 0, 5, 5, 7]
+    assert cluster_duplicates(3, np.empty((0, 2), dtype=np.int64)).tolist() == [0, 1, 2]
+
+
+def test_optimal_lsh_params_fit_in_the_signature():
+    for threshold in (0.5, 0.7, 0.9):
+        num_bands, band_size = get_optimal_lsh_params(threshold, 128)
+        assert num_bands * band_size <= 128
+
+    # A stricter threshold needs longer bands.
+    assert get_optimal_lsh_params(0.9, 128)[1] > get_optimal_lsh_params(0.5, 128)[1]
+
+
+def test_find_duplicates_finds_planted_near_duplicates():
+    rng = random.Random(1)
+    texts = [_random_text(rng) for _ in range(30)]
+    texts.append(_edit(rng, texts[4]))
+    texts.append(_edit(rng, texts[17]))
+
+    pairs = find_duplicates([Document(page_content=text) for text in texts], num_perm=128)
+
+    assert {(i, j) for i, j, _ in pairs} == {(4, 30), (17, 31)}
+    assert all(similarity >= 0.7 for _, _, similarity in pairs)
+
+
+def test_deduplicate_keeps_distinct_texts():
+    rng = random.Random(2)
+    documents = [Document(page_content=_random_text(rng)) for _ in range(40)]
+
+    assert deduplicate_documents(documents) == documents
+
+
+def test_deduplicate_collapses_a_cluster_to_its_longest_document():
+    rng = random.Random(3)
+    original = _random_text(rng)
+    cluster = [Document(page_content=_edit(rng, original)) for _ in range(5)]
+    longest = Document(page_content=original + " word1 word2")
+    documents = [Document(page_content=_random_text(rng)), *cluster, longest]
+
+    deduplicated = deduplicate_documents(documents)
+
+    assert deduplicated == [documents[0], longest]
+
+
+def test_deduplicate_only_compares_within_a_group():
+    rng = random.Random(4)
+    text = _random_text(rng)
+    documents = [
+        Document(page_content=text, metadata={"agent_id": "socrates"}),
+        Document(page_content=text, metadata={"agent_id": "plato"}),
+        Document(page_content=text, metadata={"agent_id": "plato"}),
+    ]
+
+    assert deduplicate_documents(documents, group_by="agent_id") == documents[:2]
+    assert deduplicate_documents(documents) == documents[:1]
+
+
+def test_deduplicate_handles_empty_and_short_texts():
+    documents = [
+        Document(page_content=""),
+        Document(page_content=""),
+        Document(page_content="Hi"),
+        Document(page_content="Hi"),
+        Document(page_content="Hello there"),
+    ]
+
+    assert deduplicate_documents([]) == []
+    # Empty texts never match, identical short texts do.
+    assert deduplicate_documents(documents) == [documents[0], documents[1], documents[2], documents[4]]
@@ -0,0 +1,136 @@
+import asyncio
+import random
+from typing import Any
+
+import groq
+import httpx
+import pytest
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.outputs import ChatResult
+
+from src.application.llm_scheduler import RoutedChatModel, routing
+from src.application.metrics import metrics
+from tools.benchmark_hedging import FakeSlowChatModel
+
+MESSAGES = [HumanMessage(content="What is virtue?")]
+
+
+class TrackedChatModel(FakeSlowChatModel):
+    """Fake model recording its calls, and failing them if `error` is set."""
+
+    calls: list[str] = []
+    error: Exception | None = None
+
+    async def _agenerate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        try:
+            if self.error is not None:
+                raise self.error
+            result = await super()._agenerate(messages, *args, **kwargs)
+        except asyncio.CancelledError:
+            self.calls.append(f"{self.model_name} cancelled")
+            raise
+        self.calls.append(f"{self.model_name} answered")
+
+        return result
+
+
+@pytest.fixture(autouse=True)
+def reset_routing(monkeypatch):
+    monkeypatch.setattr(routing, "_unavailable_until", {})
+    random.seed(0)
+
+
+def _model(name: str, first_token_seconds: float, **kwargs: Any) -> TrackedChatModel:
+    return TrackedChatModel(
+        model_name=name,
+        first_token_seconds=first_token_seconds,
+        straggler_rate=0.0,
+        calls=[],
+        **kwargs,
+    )
+
+
+async def _race_generate(model: RoutedChatModel) -> tuple[str, str]:
+    async def generate(candidate):
+        return await candidate._agenerate(MESSAGES)
+
+    winner, result = await model._race(generate, model.hedge_response_after)
+    # Let the cancelled loser unwind.
+    await asyncio.sleep(0)
+
+    return winner.model_name, result.generations[0].message.content
+
+
+def test_hedge_fires_after_the_deadline_and_the_first_answer_wins():
+    primary, fallback = _model("primary", 1.0), _model("fallback", 0.02)
+    model = RoutedChatModel(
+        route="test_hedge_wins", models=[primary, fallback], hedge_response_after=0.05
+    )
+
+    assert asyncio.run(_race_generate(model)) == ("fallback", "ok")
+    assert primary.calls == ["primary cancelled"]
+    assert fallback.calls == ["fallback answered"]
+    assert metrics.counter("llm_routing.hedges.test_hedge_wins") == 1
+    assert metrics.counter("llm_routing.hedge_wins.test_hedge_wins") == 1
+
+
+def test_no_hedge_before_the_deadline():
+    primary, fallback = _model("primary", 0.02), _model("fallback", 0.02)
+    model = RoutedChatModel(
+        route="test_no_hedge", models=[primary, fallback], hedge_response_after=0.5
+    )
+
+    assert asyncio.run(_race_generate(model)) == ("primary", "ok")
+    assert fallback.calls == []
+    assert metrics.counter("llm_routing.hedges.test_no_hedge") == 0
+
+
+def test_primary_wins_the_race_when_it_answers_first():
+    primary, fallback = _model("primary", 0.1), _model("fallback", 1.0)
+    model = RoutedChatModel(
+        route="test_primary_wins", models=[primary, fallback], hedge_response_after=0.02
+    )
+
+    assert asyncio.run(_race_generate(model)) == ("primary", "ok")
+    assert fallback.calls == ["fallback cancelled"]
+    assert metrics.counter("llm_routing.hedges.test_primary_wins") == 1
+    assert metrics.counter("llm_routing.hedge_wins.test_primary_wins") == 0
+
+
+def test_erroring_primary_falls_back():
+    error = groq.APIConnectionError(request=httpx.Request("POST", "https://api.groq.com"))
+    primary = _model("primary", 0.01, error=error)
+    fallback = _model("fallback", 0.01)
+    model = RoutedChatModel(
+        route="test_fallback", models=[primary, fallback], hedge_response_after=0.5
+    )
+
+    assert asyncio.run(_race_generate(model)) == ("fallback", "ok")
+    assert metrics.counter("llm_routing.fallbacks.test_fallback.primary") == 1
+    # The failing model is skipped by the next calls.
+    assert model._get_candidates() == [fallback]
+
+
+def test_error_of_the_last_model_is_raised():
+    error = groq.APIConnectionError(request=httpx.Request("POST", "https://api.groq.com"))
+    model = RoutedChatModel(
+        route="test_last_error", models=[_model("only", 0.01, error=error)]
+    )
+
+    with pytest.raises(groq.APIConnectionError):
+        asyncio.run(_race_generate(model))
+
+
+def test_hedged_stream_yields_the_first_stream_to_answer():
+    primary, fallback = _model("primary", 1.0), _model("fallback", 0.02, num_chunks=3)
+    model = RoutedChatModel(
+        route="test_hedged_stream", models=[primary, fallback], hedge_first_token_after=0.05
+    )
+
+    async def stream() -> list[str]:
+        return [chunk.content async for chunk in model.astream(MESSAGES)]
+
+    assert asyncio.run(stream()) == ["0 ", "1 ", "2 "]
+    assert metrics.counter("llm_routing.hedge_wins.test_hedged_stream") == 1
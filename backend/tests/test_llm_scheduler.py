@@ -0,0 +1,43 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from src.application.llm_scheduler import LLMScheduler, MemoryBudgetStore, ModelLimits, Priority
+
+LIMITS = ModelLimits(requests_per_minute=30, tokens_per_minute=6000)
+
+
+class FailingBudgetStore(MemoryBudgetStore):
+    def take(self, model, limits, tokens, reserve):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_acquire_fails_when_the_budget_store_fails():
+    scheduler = LLMScheduler(FailingBudgetStore(), default_limits=LIMITS)
+
+    async def run():
+        await asyncio.wait_for(scheduler.acquire("model", Priority.INTERACTIVE, 100), timeout=5)
+
+    with pytest.raises(sqlite3.OperationalError):
+        asyncio.run(run())
+
+
+def test_acquire_releases_requests_within_the_budget():
+    scheduler = LLMScheduler(MemoryBudgetStore(), default_limits=LIMITS)
+
+    async def run():
+        await asyncio.wait_for(
+            asyncio.gather(
+                *(scheduler.acquire("model", priority, 100) for priority in Priority)
+            ),
+            timeout=5,
+        )
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("reserves", [[0.0, 0.1], [0.0, 0.1, 0.25, 1.0], [-0.1, 0.0, 0.0, 0.0]])
+def test_invalid_reserves_are_rejected(reserves):
+    with pytest.raises(ValueError):
+        LLMScheduler(MemoryBudgetStore(), default_limits=LIMITS, reserves=reserves)
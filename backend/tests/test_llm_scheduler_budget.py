@@ -0,0 +1,35 @@
+from src.application.llm_scheduler.budget import Budget, ModelLimits
+
+LIMITS = ModelLimits(requests_per_minute=30, tokens_per_minute=6000)
+
+
+def test_take_spends_a_request_within_the_budget():
+    budget = Budget.full(LIMITS, now=0.0)
+
+    assert budget.take(LIMITS, now=0.0, tokens=1000, reserve=0.0) == 0.0
+    assert budget.requests == 29
+    assert budget.tokens == 5000
+
+
+def test_take_waits_for_the_reserve():
+    budget = Budget.full(LIMITS, now=0.0)
+    budget.tokens = 3000
+
+    assert budget.take(LIMITS, now=0.0, tokens=1000, reserve=0.5) > 0
+    assert budget.tokens == 3000
+
+
+def test_take_spends_a_large_reserved_request_on_a_full_bucket():
+    for tokens, reserve in ((4600, 0.25), (3500, 0.5), (10000, 0.5)):
+        budget = Budget.full(LIMITS, now=0.0)
+        budget.tokens = 0.0
+
+        assert budget.take(LIMITS, now=0.0, tokens=tokens, reserve=reserve) > 0
+        assert budget.take(LIMITS, now=60.0, tokens=tokens, reserve=reserve) == 0.0
+
+
+def test_take_spends_a_reserved_request_on_a_full_request_bucket():
+    limits = ModelLimits(requests_per_minute=1, tokens_per_minute=6000)
+    budget = Budget.full(limits, now=0.0)
+
+    assert budget.take(limits, now=0.0, tokens=100, reserve=0.5) == 0.0
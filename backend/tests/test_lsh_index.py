@@ -0,0 +1,94 @@
+import random
+import uuid
+
+import numpy as np
+
+from src.data.deduplicate_documents import MinHashDeduplicator
+from src.data.lsh_index import LSHIndex
+
+_VOCABULARY = [f"word{i}" for i in range(2_000)]
+
+
+def _texts(seed: int, count: int) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_VOCABULARY) for _ in range(100)) for _ in range(count)]
+
+
+def _point_ids(count: int) -> list[str]:
+    return [str(uuid.uuid4()) for _ in range(count)]
+
+
+def test_query_finds_duplicates_within_the_group(tmp_path):
+    deduplicator = MinHashDeduplicator()
+    texts = _texts(seed=0, count=10)
+    signatures = deduplicator.signatures(texts)
+    index = LSHIndex(tmp_path, deduplicator)
+    index.add(_point_ids(10), signatures, group="socrates")
+
+    queried = deduplicator.signatures([texts[3], *_texts(seed=1, count=2)])
+
+    assert index.query(queried, "socrates", _point_ids(3)).tolist() == [True, False, False]
+    assert not index.query(queried, "plato", _point_ids(3)).any()
+
+
+def test_query_never_matches_its_own_point(tmp_path):
+    deduplicator = MinHashDeduplicator()
+    signatures = deduplicator.signatures(_texts(seed=0, count=5))
+    point_ids = _point_ids(5)
+    index = LSHIndex(tmp_path, deduplicator)
+    index.add(point_ids, signatures, group="socrates")
+
+    assert not index.query(signatures, "socrates", point_ids).any()
+    assert index.query(signatures, "socrates", _point_ids(5)).all()
+
+
+def test_excluded_and_removed_entries_are_ignored(tmp_path):
+    deduplicator = MinHashDeduplicator()
+    signatures = deduplicator.signatures(_texts(seed=0, count=4))
+    point_ids = _point_ids(4)
+    index = LSHIndex(tmp_path, deduplicator)
+    index.add(point_ids, signatures, group="socrates")
+
+    index.remove([point_ids[0]])
+    duplicates = index.query(signatures, "socrates", _point_ids(4), exclude={point_ids[1]})
+
+    assert duplicates.tolist() == [False, False, True, True]
+
+    # Adding a point again makes it live again.
+    index.add([point_ids[0]], signatures[:1], group="socrates")
+    assert index.query(signatures[:1], "socrates", _point_ids(1)).all()
+
+
+def test_compact_keeps_only_the_live_latest_entries(tmp_path):
+    deduplicator = MinHashDeduplicator()
+    old_signatures, new_signatures = np.split(deduplicator.signatures(_texts(seed=0, count=6)), 2)
+    point_ids = _point_ids(3)
+    index = LSHIndex(tmp_path, deduplicator)
+    index.add(point_ids, old_signatures, group="socrates")
+    index.add(point_ids[:2], new_signatures[:2], group="socrates")
+    index.remove([point_ids[1]])
+
+    index.compact()
+    reloaded = LSHIndex.load(tmp_path, deduplicator)
+
+    assert len(reloaded.segments) == 1 and not reloaded.tombstones
+    assert len(reloaded) == 2
+    assert len(list(tmp_path.glob("*.npy"))) == 5
+    duplicates = reloaded.query(
+        np.concatenate([old_signatures, new_signatures]), "socrates", _point_ids(6)
+    )
+    # Point 0 was superseded by its new signature, point 1 was removed.
+    assert duplicates.tolist() == [False, False, True, True, False, False]
+
+
+def test_load_resets_when_the_minhash_params_change(tmp_path):
+    deduplicator = MinHashDeduplicator(seed=1)
+    index = LSHIndex(tmp_path, deduplicator)
+    index.add(_point_ids(3), deduplicator.signatures(_texts(seed=0, count=3)), group="socrates")
+
+    assert len(LSHIndex.load(tmp_path, MinHashDeduplicator(seed=1))) == 3
+
+    reloaded = LSHIndex.load(tmp_path, MinHashDeduplicator(seed=2))
+
+    assert len(reloaded) == 0
+    assert not list(tmp_path.glob("*.npy"))
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+
+from src.application.rag.embeddings import (  # noqa: E402
+    get_huggingface_embedding_model,
+    get_onnx_embedding_model,
+)
+from src.application.rag.onnx_embeddings import (  # noqa: E402
+    MODEL_FILE_NAME,
+    QUANTIZED_MODEL_FILE_NAME,
+)
+from src.config import settings  # noqa: E402
+
+SENTENCES = [
+    "Socrates taught in the agora of Athens and wrote nothing down himself.",
+    "What is the unexamined life, and why isn't it worth living?",
+    "Leonardo da Vinci filled his notebooks with mirror writing.",
+    "Ada Lovelace wrote the first algorithm meant to be run by a machine.",
+    "Hello!",
+    "The categorical imperative asks whether a maxim could become a universal law.",
+    "Turing asked whether machines can think, then replaced the question with a game.",
+    "Nietzsche declared that God is dead, and that we have killed him.",
+]
+
+
+def exported(model_file_name: str) -> pytest.MarkDecorator:
+    return pytest.mark.skipif(
+        not (settings.RAG_ONNX_MODEL_DIR / model_file_name).exists(),
+        reason="The ONNX model isn't exported, run `make export-onnx-embedding-model`.",
+    )
+
+
+@pytest.fixture(scope="module")
+def reference_embeddings() -> np.ndarray:
+    model = get_huggingface_embedding_model(settings.RAG_TEXT_EMBEDDING_MODEL_ID, "cpu")
+    return np.asarray(model.embed_documents(SENTENCES))
+
+
+@pytest.mark.parametrize(
+    "quantized",
+    [
+        pytest.param(False, marks=exported(MODEL_FILE_NAME), id="fp32"),
+        pytest.param(True, marks=exported(QUANTIZED_MODEL_FILE_NAME), id="int8"),
+    ],
+)
+def test_onnx_embeddings_agree_with_the_pytorch_model(reference_embeddings, quantized):
+    model = get_onnx_embedding_model(
+        model_id=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
+        model_dir=settings.RAG_ONNX_MODEL_DIR,
+        quantized=quantized,
+    )
+    embeddings = np.asarray(model.embed_documents(SENTENCES))
+
+    reference = reference_embeddings / np.linalg.norm(reference_embeddings, axis=1, keepdims=True)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    similarities = (reference * embeddings).sum(axis=1)
+
+    assert similarities.min() >= 0.99, similarities
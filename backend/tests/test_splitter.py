@@ -0,0 +1,95 @@
+import random
+
+import pytest
+from langchain_core.documents import Document
+
+from src.application.rag.splitter import (
+    BatchTokenTextSplitter,
+    count_tokens,
+    get_recursive_splitter,
+    get_splitter,
+)
+
+_WORDS = [
+    "the", "soul", "is", "immortal", "and", "virtue", "knowledge", "of", "Socrates",
+    "asked", "naïve", "über", "東京", "—", "🙂", "question", "city", "justice",
+]
+
+
+def _sample_text(seed: int, num_paragraphs: int = 40) -> str:
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(num_paragraphs):
+        lines = [
+            " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 40)))
+            for _ in range(rng.randint(1, 6))
+        ]
+        paragraphs.append("\n".join(lines))
+    return "\n\n".join(paragraphs)
+
+
+def _random_chars(alphabet: str, length: int) -> str:
+    # Random rather than repeated, so every chunk is found at its own position.
+    rng = random.Random(0)
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def _assert_covers_in_order(text: str, chunks: list[str]) -> None:
+    position = covered = 0
+    for chunk in chunks:
+        index = text.find(chunk, position)
+        assert index >= 0
+        assert not text[covered:index].strip()
+        covered = max(covered, index + len(chunk))
+        position = index + 1
+    assert not text[covered:].strip()
+
+
+@pytest.mark.parametrize("chunk_size", [16, 64, 256])
+def test_chunks_fit_and_record_their_token_count(chunk_size):
+    texts = [_sample_text(seed) for seed in range(5)]
+    splitter = BatchTokenTextSplitter(chunk_size=chunk_size, chunk_overlap=int(chunk_size * 0.15))
+
+    chunks = splitter.split_documents([Document(page_content=text) for text in texts])
+    token_counts = count_tokens([chunk.page_content for chunk in chunks])
+
+    assert all(token_count <= chunk_size for token_count in token_counts)
+    assert [chunk.metadata["token_count"] for chunk in chunks] == token_counts
+
+
+@pytest.mark.parametrize("chunk_size", [16, 64, 256])
+def test_chunks_cover_the_text_in_order(chunk_size):
+    text = _sample_text(seed=0)
+    splitter = BatchTokenTextSplitter(chunk_size=chunk_size, chunk_overlap=int(chunk_size * 0.15))
+
+    _assert_covers_in_order(text, splitter.split_text(text))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        _random_chars("abcdefghijklmnopqrstuvwxyz", 5_000),
+        _random_chars("東京大阪語書", 3_000),
+        _random_chars("🙂🏛🦉📜", 2_000),
+        "",
+        "  \n\n \t ",
+        "a",
+    ],
+    ids=["no-separator", "cjk", "emoji", "empty", "whitespace", "one-char"],
+)
+def test_splitting_terminates_on_degenerate_texts(text):
+    splitter = BatchTokenTextSplitter(chunk_size=32, chunk_overlap=4)
+
+    chunks = splitter.split_text(text)
+
+    assert all(token_count <= 32 for token_count in count_tokens(chunks))
+    _assert_covers_in_order(text, chunks)
+
+
+def test_chunk_count_is_close_to_the_recursive_splitter():
+    documents = [Document(page_content=_sample_text(seed)) for seed in range(5)]
+
+    chunks = get_splitter(128).split_documents(documents)
+    recursive_chunks = get_recursive_splitter(128).split_documents(documents)
+
+    assert abs(len(chunks) - len(recursive_chunks)) <= 0.1 * len(recursive_chunks)
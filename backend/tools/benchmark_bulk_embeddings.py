@@ -0,0 +1,166 @@
+import asyncio
+import random
+import time
+from pathlib import Path
+
+import click
+import numpy as np
+from langchain_core.documents import Document
+from loguru import logger
+
+from src.application.rag.bulk_embeddings import BulkEmbedder, get_length_buckets
+from src.application.rag.embeddings import get_embedding_model
+from src.application.rag.splitter import get_splitter
+from src.config import settings
+
+
+def load_chunks(
+    text_files: tuple[Path, ...], num_chunks: int, chunk_size: int, seed: int
+) -> list[str]:
+    """Split the text files into chunks, or generate chunks of mixed lengths.
+
+    Generated chunks are mostly close to the chunk size, with a tail of short
+    ones, like the last chunks of documents.
+    """
+
+    if text_files:
+        documents = [Document(page_content=path.read_text()) for path in text_files]
+        chunks = get_splitter(chunk_size).split_documents(documents)
+        chunks = [chunk.page_content for chunk in chunks]
+        return [chunks[i % len(chunks)] for i in range(num_chunks)]
+
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(5_000)]
+    max_words = int(chunk_size * 0.75)
+    lengths = [
+        max_words if rng.random() < 0.6 else rng.randint(5, max_words) for _ in range(num_chunks)
+    ]
+
+    return [" ".join(rng.choices(vocabulary, k=length)) for length in lengths]
+
+
+def get_padding_fraction(token_lengths: np.ndarray, batches: list[np.ndarray]) -> float:
+    """Fraction of the tokens in padded batches that are padding."""
+
+    padded = sum(len(batch) * token_lengths[batch].max() for batch in batches)
+
+    return 1 - token_lengths.sum() / padded
+
+
+def run_current(embedding_model, chunks: list[str], batch_size: int) -> np.ndarray:
+    """Embed in arrival order and in-process, like ingestion used to."""
+
+    vectors = []
+    for i in range(0, len(chunks), batch_size):
+        vectors.extend(embedding_model.embed_documents(chunks[i : i + batch_size]))
+
+    return np.asarray(vectors, dtype=np.float32)
+
+
+async def run_bulk(embedder: BulkEmbedder, chunks: list[str]) -> np.ndarray:
+    vectors = np.zeros((len(chunks), settings.RAG_TEXT_EMBEDDING_MODEL_DIM), dtype=np.float32)
+    async for indices, batch_vectors in embedder.embed(chunks):
+        vectors[indices] = batch_vectors
+
+    return vectors
+
+
+@click.command()
+@click.option(
+    "--text-file",
+    "text_files",
+    type=click.Path(exists=True, path_type=Path),
+    multiple=True,
+    help="Embed chunks of these text files instead of generated chunks.",
+)
+@click.option("--num-chunks", type=int, default=2000, show_default=True)
+@click.option("--chunk-size", type=int, default=settings.RAG_CHUNK_SIZE, show_default=True)
+@click.option(
+    "--batch-size",
+    type=int,
+    default=settings.LONG_TERM_MEMORY_EMBEDDING_BATCH_SIZE,
+    show_default=True,
+)
+@click.option(
+    "--workers",
+    type=int,
+    multiple=True,
+    default=[1, 2, 4],
+    show_default=True,
+    help="Numbers of embedding processes to benchmark. Can be passed multiple times.",
+)
+@click.option("--seed", type=int, default=42, show_default=True)
+def main(
+    text_files: tuple[Path, ...],
+    num_chunks: int,
+    chunk_size: int,
+    batch_size: int,
+    workers: tuple[int, ...],
+    seed: int,
+) -> None:
+    """Compare the ingestion embedding throughput before and after length bucketing.
+
+    The current path embeds chunks in arrival order in one process. The bulk
+    path embeds length-bucketed batches with a pool of worker processes. Model
+    loading isn't timed.
+
+    Args:
+        text_files: Text files whose chunks are embedded instead of generated chunks.
+        num_chunks: Number of chunks to embed.
+        chunk_size: Number of tokens of each chunk.
+        batch_size: Number of chunks per batch.
+        workers: Numbers of embedding processes to benchmark.
+        seed: Random seed.
+    """
+
+    chunks = load_chunks(text_files, num_chunks, chunk_size, seed)
+    embedding_model = get_embedding_model(
+        settings.RAG_TEXT_EMBEDDING_MODEL_ID, device=settings.RAG_DEVICE
+    )
+
+    tokenizer = getattr(getattr(embedding_model, "client", None), "tokenizer", None)
+    if tokenizer is not None:
+        token_lengths = np.asarray([len(ids) for ids in tokenizer(chunks)["input_ids"]])
+        arrival_batches = [
+            np.arange(i, min(i + batch_size, len(chunks)))
+            for i in range(0, len(chunks), batch_size)
+        ]
+        bucketed_batches = get_length_buckets([len(chunk) for chunk in chunks], batch_size)
+        logger.info(
+            f"Padding: {get_padding_fraction(token_lengths, arrival_batches):.1%} of the tokens "
+            f"in arrival order, {get_padding_fraction(token_lengths, bucketed_batches):.1%} "
+            "with length buckets."
+        )
+
+    # Warm up the model before measuring.
+    embedding_model.embed_documents(chunks[:batch_size])
+
+    start = time.perf_counter()
+    reference = run_current(embedding_model, chunks, batch_size)
+    current_seconds = time.perf_counter() - start
+    logger.info(f"Current path: {len(chunks) / current_seconds:,.1f} chunks/s")
+
+    for num_workers in workers:
+        with BulkEmbedder(
+            embedding_model,
+            model_id=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
+            device=settings.RAG_DEVICE,
+            batch_size=batch_size,
+            workers=num_workers,
+        ) as embedder:
+            # Wait for every worker to load the model.
+            asyncio.run(run_bulk(embedder, chunks[: batch_size * embedder.workers]))
+
+            start = time.perf_counter()
+            vectors = asyncio.run(run_bulk(embedder, chunks))
+            seconds = time.perf_counter() - start
+
+        max_difference = np.abs(vectors - reference).max()
+        logger.info(
+            f"Bulk path, {embedder.workers} processes: {len(chunks) / seconds:,.1f} chunks/s "
+            f"({current_seconds / seconds:.2f}x), max vector difference {max_difference:.1e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import asyncio
+import time
+import uuid
+from pathlib import Path
+
+import click
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+from loguru import logger
+
+from src.application.conversation_service.checkpointer import (
+    close_checkpointer,
+    get_checkpointer,
+)
+from src.application.conversation_service.reset_conversation import (
+    reset_conversations_with_prefix,
+)
+from src.config import settings
+
+
+def build_graph() -> StateGraph:
+    """Two-node graph that answers instantly, so a turn only costs its checkpoints."""
+
+    async def respond(state: MessagesState) -> dict:
+        return {"messages": [AIMessage(content=state["messages"][-1].content)]}
+
+    async def summarize(state: MessagesState) -> dict:
+        return {}
+
+    graph_builder = StateGraph(MessagesState)
+    graph_builder.add_node("respond", respond)
+    graph_builder.add_node("summarize", summarize)
+    graph_builder.add_edge(START, "respond")
+    graph_builder.add_edge("respond", "summarize")
+    graph_builder.add_edge("summarize", END)
+
+    return graph_builder
+
+
+async def run_backend(
+    num_threads: int, num_turns: int, message_chars: int, concurrency: int
+) -> list[float]:
+    """Play `num_turns` turns on `num_threads` threads and return the turn latencies."""
+
+    prefix = f"benchmark-{uuid.uuid4().hex[:8]}-"
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    try:
+        async with get_checkpointer() as checkpointer:
+            graph = build_graph().compile(checkpointer=checkpointer)
+
+            async def play(thread_index: int) -> None:
+                config = {"configurable": {"thread_id": f"{prefix}{thread_index}"}}
+                for turn in range(num_turns):
+                    message = HumanMessage(content=f"{turn} " + "x" * message_chars)
+                    async with semaphore:
+                        start = time.perf_counter()
+                        await graph.ainvoke({"messages": [message]}, config)
+                        latencies.append(time.perf_counter() - start)
+
+            try:
+                await asyncio.gather(*(play(i) for i in range(num_threads)))
+            finally:
+                await reset_conversations_with_prefix(prefix)
+    finally:
+        await close_checkpointer()
+
+    return latencies
+
+
+@click.command()
+@click.option(
+    "--backend",
+    "backends",
+    type=click.Choice(["mongo", "sqlite"]),
+    multiple=True,
+    default=["mongo", "sqlite"],
+    show_default=True,
+    help="Checkpointer backends to benchmark. Can be passed multiple times.",
+)
+@click.option("--threads", "num_threads", type=int, default=20, show_default=True)
+@click.option("--turns", "num_turns", type=int, default=10, show_default=True)
+@click.option("--message-chars", type=int, default=400, show_default=True)
+@click.option(
+    "--concurrency",
+    type=int,
+    default=8,
+    show_default=True,
+    help="Number of turns in flight at once.",
+)
+@click.option(
+    "--sqlite-path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=Path("data/benchmark_checkpoints.sqlite"),
+    show_default=True,
+)
+@click.option(
+    "--commit-interval-ms",
+    type=float,
+    multiple=True,
+    default=[settings.SQLITE_COMMIT_INTERVAL_MS],
+    show_default=True,
+    help="SQLite commit intervals to benchmark. Can be passed multiple times.",
+)
+@click.option("--cache/--no-cache", default=False, show_default=True)
+def main(
+    backends: tuple[str, ...],
+    num_threads: int,
+    num_turns: int,
+    message_chars: int,
+    concurrency: int,
+    sqlite_path: Path,
+    commit_interval_ms: tuple[float, ...],
+    cache: bool,
+) -> None:
+    """Compare the per-turn checkpoint latency of the MongoDB and SQLite backends.
+
+    Each turn runs a graph whose nodes answer instantly, so its latency is the
+    time spent reading the thread's checkpoint and writing the new ones. The
+    benchmark threads are deleted afterwards.
+
+    Args:
+        backends: Checkpointer backends to benchmark.
+        num_threads: Number of conversation threads.
+        num_turns: Number of turns per thread.
+        message_chars: Number of characters of each player message.
+        concurrency: Number of turns in flight at once.
+        sqlite_path: SQLite database used by the benchmark.
+        commit_interval_ms: SQLite commit intervals to benchmark.
+        cache: Whether the latest checkpoints are cached in memory.
+    """
+
+    settings.CHECKPOINT_CACHE_ENABLED = cache
+    settings.SQLITE_CHECKPOINT_PATH = sqlite_path
+
+    runs = []
+    for backend in backends:
+        if backend == "sqlite":
+            runs.extend(("sqlite", interval) for interval in commit_interval_ms)
+        else:
+            runs.append((backend, None))
+
+    for backend, interval in runs:
+        settings.CHECKPOINTER_BACKEND = backend
+        name = backend
+        if interval is not None:
+            settings.SQLITE_COMMIT_INTERVAL_MS = interval
+            name = f"sqlite, commits every {interval:g} ms"
+
+        start = time.perf_counter()
+        try:
+            latencies = asyncio.run(run_backend(num_threads, num_turns, message_chars, concurrency))
+        except Exception as e:
+            logger.warning(f"Skipping {name}: {e}")
+            continue
+        seconds = time.perf_counter() - start
+
+        latencies_ms = np.asarray(latencies) * 1000
+        logger.info(
+            f"{name}: {len(latencies) / seconds:,.1f} turns/s, per turn "
+            f"p50 {np.percentile(latencies_ms, 50):.2f} ms, "
+            f"p95 {np.percentile(latencies_ms, 95):.2f} ms, "
+            f"max {latencies_ms.max():.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
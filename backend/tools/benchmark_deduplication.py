@@ -0,0 +1,169 @@
+import random
+import re
+import time
+
+import click
+import numpy as np
+from loguru import logger
+
+from src.data.deduplicate_documents import MinHashDeduplicator, cluster_duplicates
+
+
+def generate_chunks(
+    num_chunks: int,
+    num_agents: int,
+    duplicate_rate: float,
+    chunk_words: int,
+    seed: int,
+) -> tuple[list[str], np.ndarray, set[tuple[int, int]]]:
+    """Generate random chunks with planted near-duplicates.
+
+    Near-duplicates are copies of an earlier chunk of the same agent with 2% of
+    their words replaced, so their shingle Jaccard similarity stays around 0.9.
+
+    Returns:
+        tuple[list[str], np.ndarray, set[tuple[int, int]]]: The chunks, the agent
+            of each chunk and the planted duplicate pairs.
+    """
+
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(50_000)]
+    num_edits = max(1, chunk_words // 50)
+
+    chunks: list[str] = []
+    agents = np.empty(num_chunks, dtype=np.int64)
+    planted: set[tuple[int, int]] = set()
+    last_chunk_of_agent: dict[int, list[int]] = {}
+    for i in range(num_chunks):
+        agent = rng.randrange(num_agents)
+        agents[i] = agent
+        previous = last_chunk_of_agent.setdefault(agent, [])
+        if previous and rng.random() < duplicate_rate:
+            original = rng.choice(previous)
+            words = chunks[original].split()
+            for position in rng.sample(range(len(words)), num_edits):
+                words[position] = rng.choice(vocabulary)
+            planted.add((original, i))
+        else:
+            words = rng.choices(vocabulary, k=chunk_words)
+        chunks.append(" ".join(words))
+        previous.append(i)
+        del previous[:-100]  # Duplicates come from the agent's recent chunks
+
+    return chunks, agents, planted
+
+
+def run_datasketch(chunks: list[str], threshold: float, num_perm: int) -> float:
+    """Time the previous per-shingle `datasketch` implementation."""
+
+    from datasketch import MinHash, MinHashLSH
+
+    start = time.perf_counter()
+    minhashes = []
+    for chunk in chunks:
+        minhash = MinHash(num_perm=num_perm)
+        words = re.findall(r"\w+", chunk.lower())
+        for i in range(len(words) - 3):
+            minhash.update(" ".join(words[i : i + 3]).encode("utf-8"))
+        minhashes.append(minhash)
+
+    lsh = MinHashLSH(threshold=threshold, num_perm=num_perm)
+    for i, minhash in enumerate(minhashes):
+        lsh.insert(i, minhash)
+
+    duplicates = set()
+    for i, minhash in enumerate(minhashes):
+        for j in lsh.query(minhash):
+            if j != i and minhashes[i].jaccard(minhashes[j]) >= threshold:
+                duplicates.add(tuple(sorted((i, j))))
+
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option(
+    "--num-chunks",
+    type=int,
+    multiple=True,
+    default=[10_000, 100_000],
+    show_default=True,
+    help="Corpus sizes to benchmark. Repeat the option for several sizes, e.g. up to 1000000.",
+)
+@click.option("--num-agents", type=int, default=100, show_default=True)
+@click.option("--duplicate-rate", type=float, default=0.1, show_default=True)
+@click.option("--chunk-words", type=int, default=150, show_default=True)
+@click.option("--threshold", type=float, default=0.7, show_default=True)
+@click.option("--num-perm", type=int, default=128, show_default=True)
+@click.option(
+    "--datasketch-max-chunks",
+    type=int,
+    default=10_000,
+    show_default=True,
+    help="Also time the previous datasketch implementation up to this corpus size.",
+)
+@click.option("--seed", type=int, default=42, show_default=True)
+def main(
+    num_chunks: tuple[int, ...],
+    num_agents: int,
+    duplicate_rate: float,
+    chunk_words: int,
+    threshold: float,
+    num_perm: int,
+    datasketch_max_chunks: int,
+    seed: int,
+) -> None:
+    """Benchmark the vectorized MinHash deduplication across all agents in one pass.
+
+    Args:
+        num_chunks: Corpus sizes to benchmark.
+        num_agents: Number of agents the chunks are spread over.
+        duplicate_rate: Fraction of chunks planted as near-duplicates.
+        chunk_words: Number of words per chunk.
+        threshold: Jaccard similarity threshold.
+        num_perm: Number of MinHash permutations.
+        datasketch_max_chunks: Largest corpus also run through datasketch.
+        seed: Random seed.
+    """
+
+    deduplicator = MinHashDeduplicator(threshold=threshold, num_perm=num_perm)
+    logger.info(
+        f"LSH with {deduplicator.num_bands} bands of {deduplicator.band_size} rows."
+    )
+
+    for size in num_chunks:
+        chunks, agents, planted = generate_chunks(
+            size, num_agents, duplicate_rate, chunk_words, seed
+        )
+
+        start = time.perf_counter()
+        signatures = deduplicator.signatures(chunks)
+        signature_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pairs, _ = deduplicator.find_duplicates(signatures, groups=agents)
+        pair_seconds = time.perf_counter() - start
+
+        # Pairs are star-shaped, so a planted pair counts as found when both of
+        # its chunks end up in the same cluster.
+        clusters = cluster_duplicates(size, pairs)
+        found = sum(clusters[i] == clusters[j] for i, j in planted)
+        recall = found / len(planted) if planted else 1.0
+        total_seconds = signature_seconds + pair_seconds
+
+        logger.info(
+            f"{size} chunks: {size / total_seconds:,.0f} chunks/s "
+            f"(signatures {signature_seconds:.2f}s, pairs {pair_seconds:.2f}s), "
+            f"{len(pairs)} pairs, planted recall {recall:.3f}, "
+            f"signatures {signatures.nbytes / 1e6:.0f} MB"
+        )
+
+        if size <= datasketch_max_chunks:
+            datasketch_seconds = run_datasketch(chunks, threshold, num_perm)
+            logger.info(
+                f"{size} chunks with datasketch: {size / datasketch_seconds:,.0f} chunks/s "
+                f"({datasketch_seconds / total_seconds:.1f}x slower)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import click
+from langchain_core.embeddings import Embeddings
+
+from src.application.rag.embeddings import get_embedding_model
+from src.config import settings
+
+
+def load_queries(dataset_file: Path) -> list[str]:
+    with open(dataset_file, "r") as f:
+        samples = json.load(f)["samples"]
+
+    return [
+        message["content"]
+        for sample in samples
+        for message in sample["messages"]
+        if message["role"] == "user"
+    ]
+
+
+def run_benchmark(
+    embedding_model: Embeddings, queries: list[str], concurrency: int
+) -> dict:
+    """Embed every query one at a time from `concurrency` threads, like the retriever tool does."""
+
+    def embed(query: str) -> float:
+        start = time.perf_counter()
+        embedding_model.embed_query(query)
+        return time.perf_counter() - start
+
+    # Warm up the model (and the server connection) before measuring.
+    embedding_model.embed_query(queries[0])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(embed, queries))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "throughput_qps": len(queries) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+    }
+
+
+@click.command()
+@click.option(
+    "--dataset-file",
+    type=click.Path(exists=True, path_type=Path),
+    default=settings.EVALUATION_DATASET_FILE_PATH,
+    help="Dataset whose user messages are used as queries.",
+)
+@click.option("--num-queries", type=int, default=2000, help="Total number of queries to embed.")
+@click.option(
+    "--concurrency",
+    type=int,
+    multiple=True,
+    default=[1, 8, 32],
+    help="Number of concurrent callers. Can be passed multiple times.",
+)
+def main(dataset_file: Path, num_queries: int, concurrency: tuple[int, ...]) -> None:
+    """CLI command to compare the in-process embedding path with the shared embedding server.
+
+    The embedding server must already be running (`make embedding-server`).
+
+    Args:
+        dataset_file: Dataset whose user messages are used as queries.
+        num_queries: Total number of queries to embed.
+        concurrency: Number of concurrent callers.
+    """
+    queries = load_queries(dataset_file)
+    queries = [queries[i % len(queries)] for i in range(num_queries)]
+
+    backends = {
+        "local": get_embedding_model(
+            model_name=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
+            device=settings.RAG_DEVICE,
+            backend="local",
+        ),
+        "server": get_embedding_model(
+            model_name=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
+            device=settings.RAG_DEVICE,
+            backend="server",
+        ),
+    }
+
+    click.echo(f"{'backend':<10}{'concurrency':>12}{'qps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for workers in concurrency:
+        for name, embedding_model in backends.items():
+            result = run_benchmark(embedding_model, queries, workers)
+            click.echo(
+                f"{name:<10}{workers:>12}{result['throughput_qps']:>10.1f}"
+                f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator
+
+import click
+import numpy as np
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from loguru import logger
+
+from src.application.llm_scheduler import RoutedChatModel
+from src.application.metrics import metrics
+
+
+class FakeSlowChatModel(BaseChatModel):
+    """Offline chat model with a heavy-tailed time to first token.
+
+    Most calls answer after about `first_token_seconds`, but a fraction of
+    them straggle for `straggler_factor` times longer, like an overloaded
+    replica would.
+    """
+
+    model_name: str
+    first_token_seconds: float
+    straggler_rate: float
+    straggler_factor: float = 10.0
+    num_chunks: int = 20
+    chunk_seconds: float = 0.005
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-slow"
+
+    def _get_first_token_delay(self) -> float:
+        delay = random.lognormvariate(0, 0.25) * self.first_token_seconds
+        if random.random() < self.straggler_rate:
+            delay *= self.straggler_factor
+
+        return delay
+
+    def _generate(self, messages: list[BaseMessage], *args: Any, **kwargs: Any) -> ChatResult:
+        time.sleep(self._get_first_token_delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    async def _agenerate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        await asyncio.sleep(self._get_first_token_delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    async def _astream(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._get_first_token_delay())
+        for i in range(self.num_chunks):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"{i} "))
+            await asyncio.sleep(self.chunk_seconds)
+
+
+async def run_requests(
+    model: RoutedChatModel, num_requests: int, concurrency: int
+) -> list[float]:
+    """Stream `num_requests` answers and return their times to first token."""
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def request(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            first_token = None
+            async for _ in model.astream([HumanMessage(content=f"Question {i}")]):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+            latencies.append(first_token)
+
+    await asyncio.gather(*(request(i) for i in range(num_requests)))
+
+    return latencies
+
+
+@click.command()
+@click.option("--requests", "num_requests", type=int, default=300, show_default=True)
+@click.option("--concurrency", type=int, default=16, show_default=True)
+@click.option(
+    "--first-token-ms",
+    type=float,
+    default=300,
+    show_default=True,
+    help="Typical time to first token of the primary model.",
+)
+@click.option(
+    "--fallback-first-token-ms",
+    type=float,
+    default=None,
+    help="Typical time to first token of the fallback model. Same as the primary's by default, "
+    "so hedging only wins by dodging stragglers.",
+)
+@click.option("--straggler-rate", type=float, default=0.05, show_default=True)
+@click.option(
+    "--hedge-after-ms",
+    type=float,
+    multiple=True,
+    default=[500.0, 800.0],
+    show_default=True,
+    help="Hedging deadlines to benchmark. Can be passed multiple times.",
+)
+@click.option("--seed", type=int, default=42, show_default=True)
+def main(
+    num_requests: int,
+    concurrency: int,
+    first_token_ms: float,
+    fallback_first_token_ms: float | None,
+    straggler_rate: float,
+    hedge_after_ms: tuple[float, ...],
+    seed: int,
+) -> None:
+    """Compare the time to first token of streamed calls with and without hedging.
+
+    Runs offline against fake models whose first token sometimes straggles,
+    and reports the latency percentiles, how often calls were hedged and how
+    often the hedge won.
+
+    Args:
+        num_requests: Number of streamed calls per run.
+        concurrency: Number of calls in flight at once.
+        first_token_ms: Typical time to first token of the primary model.
+        fallback_first_token_ms: Typical time to first token of the fallback model.
+            Same as the primary's if None.
+        straggler_rate: Fraction of the calls that straggle.
+        hedge_after_ms: Hedging deadlines to benchmark.
+        seed: Seed of the latency draws.
+    """
+
+    if fallback_first_token_ms is None:
+        fallback_first_token_ms = first_token_ms
+    logger.info(
+        f"Typical first token: primary {first_token_ms:g} ms, "
+        f"fallback {fallback_first_token_ms:g} ms"
+        + (
+            ", the hedge also wins by calling a faster model"
+            if fallback_first_token_ms < first_token_ms
+            else ""
+        )
+    )
+
+    models = [
+        FakeSlowChatModel(
+            model_name="primary",
+            first_token_seconds=first_token_ms / 1000,
+            straggler_rate=straggler_rate,
+        ),
+        FakeSlowChatModel(
+            model_name="fallback",
+            first_token_seconds=fallback_first_token_ms / 1000,
+            straggler_rate=straggler_rate,
+        ),
+    ]
+
+    baseline_p99 = None
+    for hedge_after in (0.0, *hedge_after_ms):
+        random.seed(seed)
+        route = f"benchmark_{hedge_after:g}"
+        model = RoutedChatModel(
+            route=route, models=models, hedge_first_token_after=hedge_after / 1000
+        )
+        latencies_ms = np.asarray(asyncio.run(run_requests(model, num_requests, concurrency)))
+        latencies_ms *= 1000
+
+        p99 = np.percentile(latencies_ms, 99)
+        hedges = metrics.counter(f"llm_routing.hedges.{route}")
+        hedge_wins = metrics.counter(f"llm_routing.hedge_wins.{route}")
+        name = f"hedge after {hedge_after:g} ms" if hedge_after else "no hedging"
+        improvement = ""
+        if baseline_p99 is None:
+            baseline_p99 = p99
+        else:
+            improvement = f" ({(p99 - baseline_p99) / baseline_p99:+.0%} vs no hedging)"
+
+        logger.info(
+            f"{name}: first token p50 {np.percentile(latencies_ms, 50):.0f} ms, "
+            f"p95 {np.percentile(latencies_ms, 95):.0f} ms, p99 {p99:.0f} ms{improvement}; "
+            f"hedged {hedges / num_requests:.1%} of calls, the hedge won {hedge_wins:g} times"
+        )
+
+
+if __name__ == "__main__":
+    main()
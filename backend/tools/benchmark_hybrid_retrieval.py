@@ -0,0 +1,116 @@
+import random
+import statistics
+import time
+
+import click
+
+from src.application.rag.embeddings import get_embedding_model
+from src.application.rag.qdrant import get_qdrant_client
+from src.application.rag.retriever import AsyncQdrantRetriever, get_agent_filter
+from src.application.rag.sparse_embeddings import BM25SparseEmbeddings
+from src.config import settings
+
+
+def sample_queries(num_queries: int, query_words: int, seed: int) -> list[dict]:
+    """Build known-item queries from random windows of the stored chunks.
+
+    Each query's only relevant result is the chunk its words were taken from.
+    """
+
+    rng = random.Random(seed)
+    points = []
+    offset = None
+    while True:
+        batch, offset = get_qdrant_client().scroll(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            limit=1000,
+            offset=offset,
+            with_payload=True,
+        )
+        points.extend(point for point in batch if point.payload.get("metadata", {}).get("agent_id"))
+        if offset is None:
+            break
+
+    queries = []
+    for point in rng.sample(points, min(num_queries, len(points))):
+        words = point.payload["page_content"].split()
+        start = rng.randrange(max(1, len(words) - query_words))
+        queries.append(
+            {
+                "id": point.id,
+                "agent_id": point.payload["metadata"]["agent_id"],
+                "text": " ".join(words[start : start + query_words]),
+            }
+        )
+
+    return queries
+
+
+def evaluate(retriever: AsyncQdrantRetriever, queries: list[dict], ks: list[int]) -> dict:
+    hits = {k: 0 for k in ks}
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        docs = retriever.invoke(query["text"], filter=get_agent_filter(query["agent_id"]))
+        latencies.append(time.perf_counter() - start)
+
+        ids = [doc.metadata["_id"] for doc in docs]
+        for k in ks:
+            hits[k] += query["id"] in ids[:k]
+
+    latencies.sort()
+    return {
+        "recall": {k: hits[k] / len(queries) for k in ks},
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+    }
+
+
+@click.command()
+@click.option("--num-queries", type=int, default=500, help="Number of known-item queries.")
+@click.option("--query-words", type=int, default=8, help="Number of words per query.")
+@click.option("--k", "ks", type=int, multiple=True, default=[1, 3, 5, 10], help="Cutoffs for recall@k.")
+@click.option("--seed", type=int, default=42)
+def main(num_queries: int, query_words: int, ks: tuple[int, ...], seed: int) -> None:
+    """CLI command to compare recall@k and latency of dense-only and hybrid retrieval.
+
+    Needs a long-term memory ingested with RAG_RETRIEVAL_MODE=hybrid, so the
+    collection holds both dense and BM25 sparse vectors.
+
+    Args:
+        num_queries: Number of known-item queries.
+        query_words: Number of words per query.
+        ks: Cutoffs for recall@k.
+        seed: Random seed used to sample the queries.
+    """
+    ks = sorted(ks)
+    queries = sample_queries(num_queries, query_words, seed)
+    embedding_model = get_embedding_model(
+        model_name=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
+        device=settings.RAG_DEVICE,
+    )
+
+    retrievers = {
+        "dense": AsyncQdrantRetriever(
+            embedding=embedding_model,
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            k=ks[-1],
+        ),
+        "hybrid": AsyncQdrantRetriever(
+            embedding=embedding_model,
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            k=ks[-1],
+            sparse_embedding=BM25SparseEmbeddings(),
+        ),
+    }
+
+    header = "".join(f"{f'R@{k}':>8}" for k in ks)
+    click.echo(f"{'mode':<8}{header}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, retriever in retrievers.items():
+        result = evaluate(retriever, queries, ks)
+        recall = "".join(f"{result['recall'][k]:>8.3f}" for k in ks)
+        click.echo(f"{name:<8}{recall}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
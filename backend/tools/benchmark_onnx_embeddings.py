@@ -0,0 +1,91 @@
+import sys
+import time
+
+import click
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.application.rag.embeddings import get_embedding_model, get_onnx_embedding_model
+from src.config import settings
+from tools.benchmark_embeddings import load_queries
+
+
+def measure_throughput(embedding_model: Embeddings, texts: list[str], repeats: int) -> float:
+    embedding_model.embed_documents(texts[:8])
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        embedding_model.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+
+    return repeats * len(texts) / elapsed
+
+
+def cosine_agreement(reference: list[list[float]], candidate: list[list[float]]) -> np.ndarray:
+    reference = np.asarray(reference)
+    candidate = np.asarray(candidate)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate /= np.linalg.norm(candidate, axis=1, keepdims=True)
+    return (reference * candidate).sum(axis=1)
+
+
+@click.command()
+@click.option(
+    "--quantized/--no-quantized",
+    default=settings.RAG_ONNX_QUANTIZED,
+    help="Benchmark the int8-quantized ONNX model.",
+)
+@click.option("--repeats", type=int, default=10, help="Number of passes over the texts.")
+@click.option(
+    "--min-cosine",
+    type=float,
+    default=0.98,
+    help="Minimum cosine similarity between torch and ONNX vectors for the parity check to pass.",
+)
+def main(quantized: bool, repeats: int, min_cosine: float) -> None:
+    """CLI command to check parity and compare throughput of the ONNX and PyTorch embedding backends.
+
+    Exits with a non-zero status when any ONNX vector disagrees with its PyTorch
+    counterpart by more than `--min-cosine`.
+
+    Args:
+        quantized: Benchmark the int8-quantized ONNX model.
+        repeats: Number of passes over the texts.
+        min_cosine: Minimum cosine similarity for the parity check to pass.
+    """
+    texts = load_queries(settings.EVALUATION_DATASET_FILE_PATH)
+
+    torch_model = get_embedding_model(
+        model_name=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
+        device="cpu",
+        backend="local",
+    )
+    onnx_model = get_onnx_embedding_model(
+        model_id=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
+        model_dir=settings.RAG_ONNX_MODEL_DIR,
+        quantized=quantized,
+    )
+
+    similarities = cosine_agreement(
+        torch_model.embed_documents(texts), onnx_model.embed_documents(texts)
+    )
+    click.echo(
+        f"Cosine agreement over {len(texts)} texts: "
+        f"min={similarities.min():.4f} mean={similarities.mean():.4f}"
+    )
+
+    torch_throughput = measure_throughput(torch_model, texts, repeats)
+    onnx_throughput = measure_throughput(onnx_model, texts, repeats)
+    click.echo(f"torch: {torch_throughput:.1f} texts/s")
+    click.echo(
+        f"onnx{' (int8)' if quantized else ''}: {onnx_throughput:.1f} texts/s "
+        f"({onnx_throughput / torch_throughput:.2f}x)"
+    )
+
+    if similarities.min() < min_cosine:
+        click.echo(f"Parity check failed: min cosine below {min_cosine}", err=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
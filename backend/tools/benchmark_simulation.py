@@ -0,0 +1,246 @@
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+import click
+import numpy as np
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.graph import END, START, MessagesState, StateGraph
+from loguru import logger
+
+from src.application.conversation_service.checkpointer import (
+    close_checkpointer,
+    get_checkpointer,
+)
+from src.application.conversation_service.reset_conversation import (
+    reset_conversations_with_prefix,
+)
+from src.application.simulation import SimulationEngine, get_npcs
+from src.config import settings
+from src.domain.agent_factory import AgentsFactory
+
+
+def get_latency(mean_seconds: float) -> float:
+    return random.lognormvariate(0, 0.3) * mean_seconds
+
+
+class FakeThoughtsChatModel(BaseChatModel):
+    """Offline chat model answering the idle thoughts prompt after a delay."""
+
+    latency_seconds: float
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-thoughts"
+
+    def _get_result(self, messages: list[BaseMessage]) -> ChatResult:
+        ids = re.findall(r"- id: (\S+)", str(messages[-1].content))
+        content = json.dumps({"thoughts": [{"id": id, "thought": "Hmm."} for id in ids]})
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": 200 + 100 * len(ids),
+                "output_tokens": 30 * len(ids),
+                "total_tokens": 200 + 130 * len(ids),
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: list[BaseMessage], *args: Any, **kwargs: Any) -> ChatResult:
+        time.sleep(get_latency(self.latency_seconds))
+        return self._get_result(messages)
+
+    async def _agenerate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        await asyncio.sleep(get_latency(self.latency_seconds))
+        return self._get_result(messages)
+
+
+class FakeTurnChatModel(BaseChatModel):
+    """Offline chat model answering an agent turn after a delay."""
+
+    latency_seconds: float
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-turn"
+
+    def _get_result(self) -> ChatResult:
+        message = AIMessage(
+            content="Interesting, tell me more.",
+            usage_metadata={"input_tokens": 900, "output_tokens": 60, "total_tokens": 960},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: list[BaseMessage], *args: Any, **kwargs: Any) -> ChatResult:
+        time.sleep(get_latency(self.latency_seconds))
+        return self._get_result()
+
+    async def _agenerate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        await asyncio.sleep(get_latency(self.latency_seconds))
+        return self._get_result()
+
+
+def build_graph(turn_seconds: float) -> StateGraph:
+    """Workflow whose conversation node calls a model answering after a delay."""
+
+    model = FakeTurnChatModel(latency_seconds=turn_seconds)
+
+    async def conversation_node(state: MessagesState) -> dict:
+        return {"messages": [await model.ainvoke(state["messages"])]}
+
+    def connector_node(state: MessagesState) -> dict:
+        return {}
+
+    graph_builder = StateGraph(MessagesState)
+    graph_builder.add_node("conversation_node", conversation_node)
+    graph_builder.add_node("connector_node", connector_node)
+    graph_builder.add_edge(START, "conversation_node")
+    graph_builder.add_edge("conversation_node", "connector_node")
+    graph_builder.add_edge("connector_node", END)
+
+    return graph_builder
+
+
+async def run_benchmark(
+    num_npcs: int,
+    num_ticks: int,
+    concurrency: int,
+    thought_batch_size: int,
+    turn_seconds: float,
+    seed: int,
+) -> list:
+    """Run `num_ticks` ticks of `num_npcs` NPCs and return the statistics of the ticks."""
+
+    thread_prefix = f"benchmark-{uuid.uuid4().hex[:8]}"
+    try:
+        async with get_checkpointer() as checkpointer:
+            engine = SimulationEngine(
+                graph=build_graph(turn_seconds).compile(checkpointer=checkpointer),
+                thoughts_llm=FakeThoughtsChatModel(latency_seconds=turn_seconds),
+                npcs=get_npcs(num_npcs, thread_prefix=thread_prefix),
+                concurrency=concurrency,
+                # The budget scales with the town, so every planned action runs.
+                tick_token_budget=num_npcs * 2 * settings.SIMULATION_TURN_TOKENS_ESTIMATE,
+                turn_tokens_estimate=settings.SIMULATION_TURN_TOKENS_ESTIMATE,
+                thought_batch_size=thought_batch_size,
+                exchange_probability=settings.SIMULATION_EXCHANGE_PROBABILITY,
+                thought_probability=settings.SIMULATION_THOUGHT_PROBABILITY,
+                seed=seed,
+            )
+            try:
+                return await engine.run(num_ticks)
+            finally:
+                for agent_id in AgentsFactory.get_available_agents():
+                    await reset_conversations_with_prefix(f"{agent_id}-{thread_prefix}-")
+    finally:
+        await close_checkpointer()
+
+
+@click.command()
+@click.option(
+    "--npcs",
+    "npc_counts",
+    type=int,
+    multiple=True,
+    default=[10, 100, 1000],
+    show_default=True,
+    help="Town sizes to benchmark. Can be passed multiple times.",
+)
+@click.option("--ticks", "num_ticks", type=int, default=3, show_default=True)
+@click.option(
+    "--concurrency", type=int, default=settings.SIMULATION_CONCURRENCY, show_default=True
+)
+@click.option(
+    "--thought-batch-size",
+    "thought_batch_sizes",
+    type=int,
+    multiple=True,
+    default=[1, settings.SIMULATION_THOUGHT_BATCH_SIZE],
+    show_default=True,
+    help="Idle thoughts batch sizes to benchmark. Can be passed multiple times.",
+)
+@click.option(
+    "--turn-ms",
+    type=float,
+    default=400,
+    show_default=True,
+    help="Typical latency of an LLM call.",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(["mongo", "sqlite"]),
+    default="sqlite",
+    show_default=True,
+    help="Checkpointer backend the NPC turns are persisted to.",
+)
+@click.option(
+    "--sqlite-path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=Path("data/benchmark_checkpoints.sqlite"),
+    show_default=True,
+)
+@click.option("--seed", type=int, default=42, show_default=True)
+def main(
+    npc_counts: tuple[int, ...],
+    num_ticks: int,
+    concurrency: int,
+    thought_batch_sizes: tuple[int, ...],
+    turn_ms: float,
+    backend: str,
+    sqlite_path: Path,
+    seed: int,
+) -> None:
+    """Measure the tick duration and throughput of the simulation as the town grows.
+
+    Runs offline: the conversation model and the idle thoughts model are
+    replaced by fakes answering after a delay, but the NPC turns go through
+    the real checkpointer. The benchmark threads are deleted afterwards.
+
+    Args:
+        npc_counts: Town sizes to benchmark.
+        num_ticks: Number of ticks per run.
+        concurrency: Agent turns and LLM calls in flight at once.
+        thought_batch_sizes: Idle thoughts batch sizes to benchmark.
+        turn_ms: Typical latency of an LLM call.
+        backend: Checkpointer backend.
+        sqlite_path: SQLite database used by the benchmark.
+        seed: Seed of the latency draws.
+    """
+
+    settings.CHECKPOINTER_BACKEND = backend
+    settings.SQLITE_CHECKPOINT_PATH = sqlite_path
+
+    for num_npcs in npc_counts:
+        for thought_batch_size in thought_batch_sizes:
+            random.seed(seed)
+            ticks = asyncio.run(
+                run_benchmark(
+                    num_npcs, num_ticks, concurrency, thought_batch_size, turn_ms / 1000, seed
+                )
+            )
+
+            tick_seconds = np.array([tick.seconds for tick in ticks])
+            actions = sum(sum(tick.actions.values()) for tick in ticks)
+            calls = sum(tick.calls for tick in ticks)
+            logger.info(
+                f"{num_npcs} NPCs, idle thoughts batched by {thought_batch_size}: "
+                f"tick p50 {np.percentile(tick_seconds, 50):.2f}s, max {tick_seconds.max():.2f}s, "
+                f"{actions / tick_seconds.sum():,.1f} actions/s, "
+                f"{calls / num_ticks:,.1f} calls per tick, "
+                f"{sum(tick.failed for tick in ticks)} failed"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import itertools
+import time
+
+import click
+import numpy as np
+from loguru import logger
+from qdrant_client import models
+
+from src.application.rag.qdrant import get_qdrant_client
+from src.application.rag.vector_index import VectorIndexConfig
+from src.config import settings
+
+BENCHMARK_COLLECTION_NAME = f"{settings.QDRANT_COLLECTION_NAME}-index-benchmark"
+
+
+def load_vectors(source: str, num_vectors: int, seed: int) -> np.ndarray:
+    if source == "synthetic":
+        rng = np.random.default_rng(seed)
+        vectors = rng.standard_normal((num_vectors, settings.RAG_TEXT_EMBEDDING_MODEL_DIM))
+    else:
+        vectors = []
+        offset = None
+        while len(vectors) < num_vectors:
+            points, offset = get_qdrant_client().scroll(
+                collection_name=settings.QDRANT_COLLECTION_NAME,
+                limit=1000,
+                offset=offset,
+                with_vectors=True,
+            )
+            vectors.extend(
+                point.vector[""] if isinstance(point.vector, dict) else point.vector
+                for point in points
+            )
+            if offset is None:
+                break
+        vectors = np.asarray(vectors[:num_vectors])
+
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def sample_queries(vectors: np.ndarray, num_queries: int, seed: int) -> np.ndarray:
+    """Perturb stored vectors, so queries are close to but not exactly on the data."""
+
+    rng = np.random.default_rng(seed + 1)
+    queries = vectors[rng.choice(len(vectors), num_queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(
+        queries.shape[1]
+    )
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def build_collection(config: VectorIndexConfig, vectors: np.ndarray, batch_size: int = 1000) -> float:
+    client = get_qdrant_client()
+    if client.collection_exists(BENCHMARK_COLLECTION_NAME):
+        client.delete_collection(BENCHMARK_COLLECTION_NAME)
+
+    start = time.perf_counter()
+    client.create_collection(
+        collection_name=BENCHMARK_COLLECTION_NAME,
+        vectors_config=config.vectors_config(),
+        hnsw_config=config.hnsw_config(),
+        quantization_config=config.quantization_config(),
+        # Index right away, even for small corpora below the default threshold.
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=1),
+    )
+    for start_index in range(0, len(vectors), batch_size):
+        batch = vectors[start_index : start_index + batch_size]
+        client.upsert(
+            collection_name=BENCHMARK_COLLECTION_NAME,
+            points=models.Batch(
+                ids=list(range(start_index, start_index + len(batch))),
+                vectors=batch.tolist(),
+            ),
+        )
+
+    while client.get_collection(BENCHMARK_COLLECTION_NAME).status != models.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+    return time.perf_counter() - start
+
+
+def search(config: VectorIndexConfig, queries: np.ndarray, k: int) -> tuple[list[list[int]], float]:
+    client = get_qdrant_client()
+    search_params = config.search_params()
+
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        response = client.query_points(
+            collection_name=BENCHMARK_COLLECTION_NAME,
+            query=query.tolist(),
+            limit=k,
+            search_params=search_params,
+        )
+        results.append([point.id for point in response.points])
+    elapsed = time.perf_counter() - start
+
+    return results, len(queries) / elapsed
+
+
+@click.command()
+@click.option(
+    "--source",
+    type=click.Choice(["collection", "synthetic"]),
+    default="collection",
+    help="Benchmark the vectors of the long-term memory collection or random vectors.",
+)
+@click.option("--num-vectors", type=int, default=100_000, help="Maximum number of indexed vectors.")
+@click.option("--num-queries", type=int, default=500)
+@click.option("--k", type=int, default=settings.RAG_TOP_K, help="Cutoff for recall@k.")
+@click.option("--m", "ms", type=int, multiple=True, default=[8, 16, 32], help="HNSW m values to sweep.")
+@click.option("--ef-construct", "ef_constructs", type=int, multiple=True, default=[100, 200])
+@click.option("--ef", "efs", type=int, multiple=True, default=[32, 64, 128, 256], help="Search-time ef values to sweep.")
+@click.option(
+    "--quantization",
+    "quantizations",
+    type=click.Choice(["none", "scalar", "binary"]),
+    multiple=True,
+    default=["none", "scalar", "binary"],
+)
+@click.option("--on-disk/--in-memory", default=False, help="Store the original vectors on disk.")
+@click.option("--seed", type=int, default=42)
+def main(
+    source: str,
+    num_vectors: int,
+    num_queries: int,
+    k: int,
+    ms: tuple[int, ...],
+    ef_constructs: tuple[int, ...],
+    efs: tuple[int, ...],
+    quantizations: tuple[str, ...],
+    on_disk: bool,
+    seed: int,
+) -> None:
+    """CLI command to sweep HNSW and quantization settings on a local Qdrant.
+
+    For every configuration it reports recall@k against exact search, QPS and
+    the estimated RAM of the index, so settings can be chosen as the corpus grows.
+    The sweep runs on a temporary collection that is deleted at the end.
+
+    Args:
+        source: Benchmark the vectors of the long-term memory collection or random vectors.
+        num_vectors: Maximum number of indexed vectors.
+        num_queries: Number of queries per configuration.
+        k: Cutoff for recall@k.
+        ms: HNSW m values to sweep.
+        ef_constructs: HNSW ef_construct values to sweep.
+        efs: Search-time ef values to sweep.
+        quantizations: Quantization modes to sweep.
+        on_disk: Store the original vectors on disk.
+        seed: Random seed for the synthetic vectors and the queries.
+    """
+    vectors = load_vectors(source, num_vectors, seed)
+    queries = sample_queries(vectors, min(num_queries, len(vectors)), seed)
+    logger.info(f"Benchmarking {len(vectors)} vectors with {len(queries)} queries")
+
+    # Vectors are normalized, so exact cosine search is a dot product.
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+
+    click.echo(
+        f"{'m':>4}{'ef_con':>8}{'quant':>8}{'ef':>6}{f'R@{k}':>8}{'qps':>10}{'ram MB':>10}{'build s':>10}"
+    )
+    try:
+        for m, ef_construct, quantization in itertools.product(ms, ef_constructs, quantizations):
+            config = VectorIndexConfig(
+                dim=vectors.shape[1],
+                hnsw_m=m,
+                hnsw_ef_construct=ef_construct,
+                on_disk=on_disk,
+                quantization=quantization,
+            )
+            build_time = build_collection(config, vectors)
+            memory_mb = config.estimate_memory_bytes(len(vectors)) / 1024**2
+
+            for ef in efs:
+                config.search_hnsw_ef = ef
+                results, qps = search(config, queries, k)
+                recall = np.mean(
+                    [len(set(result) & set(expected)) / k for result, expected in zip(results, exact)]
+                )
+                click.echo(
+                    f"{m:>4}{ef_construct:>8}{quantization:>8}{ef:>6}{recall:>8.3f}"
+                    f"{qps:>10.1f}{memory_mb:>10.1f}{build_time:>10.1f}"
+                )
+    finally:
+        get_qdrant_client().delete_collection(BENCHMARK_COLLECTION_NAME)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import click
+import numpy as np
+from langchain_core.documents import Document
+from loguru import logger
+
+from src.application.rag.splitter import count_tokens, get_recursive_splitter, get_splitter
+from src.config import settings
+from src.data.extract import extract
+from src.domain.adaptive_agent import AdaptiveAgentExtract
+from src.domain.agent_factory import AgentsFactory
+
+
+def load_documents(metadata_file: Path, text_files: tuple[Path, ...]) -> list[Document]:
+    if text_files:
+        return [
+            Document(page_content=path.read_text(), metadata={"source": str(path)})
+            for path in text_files
+        ]
+
+    agents_factory = AgentsFactory()
+    documents = []
+    for agent_extract in AdaptiveAgentExtract.from_json(metadata_file):
+        agent = agents_factory.get_agent(agent_extract.id)
+        documents.extend(extract(agent, agent_extract.urls))
+
+    return documents
+
+
+def get_chunk_ends(document: Document, chunks: list[Document]) -> set[int]:
+    """Character offsets where each chunk of `document` ends."""
+
+    ends = set()
+    cursor = 0
+    for chunk in chunks:
+        position = document.page_content.find(chunk.page_content, cursor)
+        if position == -1:
+            position = document.page_content.find(chunk.page_content)
+        if position == -1:
+            continue
+        ends.add(position + len(chunk.page_content))
+        cursor = position + 1
+
+    return ends
+
+
+def split_per_document(splitter, documents: list[Document]) -> list[list[Document]]:
+    return [splitter.split_documents([document]) for document in documents]
+
+
+def report(name: str, chunks: list[Document], seconds: float, num_chars: int) -> None:
+    token_counts = np.asarray(count_tokens([chunk.page_content for chunk in chunks]))
+    logger.info(
+        f"{name}: {len(chunks)} chunks in {seconds:.2f}s "
+        f"({num_chars / seconds / 1e6:.2f} MB/s), tokens per chunk "
+        f"mean {token_counts.mean():.1f} / max {token_counts.max()}"
+    )
+
+
+@click.command()
+@click.option(
+    "--metadata-file",
+    type=click.Path(exists=True, path_type=Path),
+    default=settings.EXTRACTION_METADATA_FILE_PATH,
+    help="Extraction metadata of the agents whose sources are split.",
+)
+@click.option(
+    "--text-file",
+    "text_files",
+    type=click.Path(exists=True, path_type=Path),
+    multiple=True,
+    help="Split these local text files instead of the agents' sources.",
+)
+@click.option("--chunk-size", type=int, default=settings.RAG_CHUNK_SIZE, show_default=True)
+@click.option(
+    "--workers",
+    type=int,
+    default=0,
+    help="Processes used by the batch-tokenizing splitter. 0 uses every CPU core.",
+)
+def main(
+    metadata_file: Path, text_files: tuple[Path, ...], chunk_size: int, workers: int
+) -> None:
+    """Compare the batch-tokenizing splitter against the recursive tiktoken splitter.
+
+    Reports throughput and chunk sizes of both splitters, and how many chunks
+    and chunk boundaries they have in common.
+
+    Args:
+        metadata_file: Extraction metadata of the agents whose sources are split.
+        text_files: Local text files split instead of the agents' sources.
+        chunk_size: Number of tokens of each chunk.
+        workers: Processes used by the batch-tokenizing splitter.
+    """
+
+    documents = load_documents(metadata_file, text_files)
+    num_chars = sum(len(document.page_content) for document in documents)
+    logger.info(f"Splitting {len(documents)} documents ({num_chars / 1e6:.2f} MB).")
+
+    recursive_splitter = get_recursive_splitter(chunk_size)
+    start = time.perf_counter()
+    recursive_chunks = split_per_document(recursive_splitter, documents)
+    report(
+        "recursive", sum(recursive_chunks, []), time.perf_counter() - start, num_chars
+    )
+
+    splitter = get_splitter(chunk_size)
+    start = time.perf_counter()
+    batch_chunks = split_per_document(splitter, documents)
+    report("batch", sum(batch_chunks, []), time.perf_counter() - start, num_chars)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers or None, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        parallel_chunks = list(pool.map(splitter.split_documents, [[d] for d in documents]))
+    report(
+        f"batch, {pool._max_workers} processes",
+        sum(parallel_chunks, []),
+        time.perf_counter() - start,
+        num_chars,
+    )
+
+    same_chunks = same_ends = total_chunks = total_ends = 0
+    for document, old, new in zip(documents, recursive_chunks, batch_chunks):
+        old_texts = {chunk.page_content for chunk in old}
+        same_chunks += sum(chunk.page_content in old_texts for chunk in new)
+        total_chunks += len(new)
+
+        old_ends = get_chunk_ends(document, old)
+        new_ends = get_chunk_ends(document, new)
+        same_ends += len(old_ends & new_ends)
+        total_ends += len(new_ends)
+
+    logger.info(
+        f"Identical chunks: {same_chunks / max(total_chunks, 1):.1%}, "
+        f"identical chunk boundaries: {same_ends / max(total_ends, 1):.1%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
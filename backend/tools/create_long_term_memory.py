@@ -14,16 +14,22 @@ from src.domain.adaptive_agent import AdaptiveAgentExtract
     default=settings.EXTRACTION_METADATA_FILE_PATH,
     help="Path to the innovators extraction metadata JSON file.",
 )
-def main(metadata_file: Path) -> None:
+@click.option(
+    "--full-rebuild",
+    is_flag=True,
+    help="Drop the collection and re-index every agent instead of syncing incrementally.",
+)
+def main(metadata_file: Path, full_rebuild: bool) -> None:
     """CLI command to create long-term memory for innovators.
 
     Args:
         metadata_file: Path to the innovators extraction metadata JSON file.
+        full_rebuild: Drop the collection and re-index every agent.
     """
     agents = AdaptiveAgentExtract.from_json(metadata_file)
 
     long_term_memory_creator = LongTermMemoryCreator.build_from_settings()
-    long_term_memory_creator(agents)
+    long_term_memory_creator(agents, full_rebuild=full_rebuild)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,6 @@
 #delete the long term memory collection from qdrant
 
-from qdrant_client import QdrantClient
+from src.application.rag.qdrant import delete_collection
 from src.config import settings
 
-client = QdrantClient(url=settings.QDRANT_URL)
-client.delete_collection(settings.QDRANT_COLLECTION_NAME)
+delete_collection(settings.QDRANT_COLLECTION_NAME)
@@ -1 +1,64 @@
-pass
\ No newline at end of file
+import json
+from pathlib import Path
+
+import click
+from loguru import logger
+
+from src.application.evaluation import (
+    EvaluationRunner,
+    ResponseCache,
+    evaluate_agent,
+    upload_dataset,
+)
+from src.config import settings
+from src.infrastructure.opik_utils import configure
+
+
+@click.command()
+@click.option(
+    "--name",
+    type=str,
+    default="agent_evaluation_dataset",
+    show_default=True,
+    help="Name of the Opik dataset.",
+)
+@click.option(
+    "--data-path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=settings.EVALUATION_DATASET_FILE_PATH,
+    show_default=True,
+)
+@click.option("--workers", type=int, default=settings.EVALUATION_WORKERS, show_default=True)
+@click.option("--nb-samples", type=int, default=None, help="Evaluate only this many samples.")
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse the agent outputs cached by previous runs.",
+)
+def main(name: str, data_path: Path, workers: int, nb_samples: int | None, cache: bool) -> None:
+    """CLI command to evaluate the agents on the evaluation dataset.
+
+    Args:
+        name: Name of the Opik dataset the samples are uploaded to.
+        data_path: JSON file of the evaluation samples.
+        workers: Number of samples replayed and scored at once.
+        nb_samples: Number of samples to evaluate.
+        cache: Whether to reuse the cached agent outputs.
+    """
+
+    configure()
+
+    dataset = upload_dataset(name=name, data_path=data_path)
+    runner = EvaluationRunner(
+        workers=workers,
+        cache=ResponseCache(settings.EVALUATION_CACHE_DIR) if cache else None,
+        max_retries=settings.EVALUATION_MAX_RETRIES,
+    )
+    report = evaluate_agent(dataset, runner=runner, nb_samples=nb_samples)
+
+    logger.info(f"Evaluation report:\n{json.dumps(report, indent=2)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import time
+from pathlib import Path
+
+import click
+import numpy as np
+from loguru import logger
+
+from src.application.rag import get_embedding_model
+from src.application.rag.router import RagRouter, load_rag_decisions
+from src.config import settings
+
+
+def rescore(decisions: list[dict], router: RagRouter) -> None:
+    """
+    Replace the logged router decisions with those of `router`, e.g. after retraining.
+    """
+    embedding_model = get_embedding_model(
+        model_name=settings.RAG_TEXT_EMBEDDING_MODEL_ID, device=settings.RAG_DEVICE
+    )
+    for decision in decisions:
+        start = time.perf_counter()
+        vector = embedding_model.embed_query(decision["query"])
+        decision["router_retrieved"], decision["router_score"] = router.should_retrieve(
+            decision["agent_id"], vector
+        )
+        decision["router_seconds"] = time.perf_counter() - start
+
+
+@click.command()
+@click.option(
+    "--decisions-file",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=settings.RAG_ROUTER_DECISIONS_PATH,
+    show_default=True,
+)
+@click.option(
+    "--rescore/--no-rescore",
+    "should_rescore",
+    default=False,
+    help="Decide again with the current router instead of reading the logged decisions.",
+)
+@click.option(
+    "--router-file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=settings.RAG_ROUTER_PATH,
+    show_default=True,
+    help="Router to rescore the decisions with.",
+)
+def main(decisions_file: Path, should_rescore: bool, router_file: Path) -> None:
+    """CLI command to compare the RAG router with the conversation model's decisions.
+
+    Reads the decisions logged in shadow mode, and reports how often the
+    router agrees with the tool calls of the conversation model, what the
+    router costs on every message, and the latency it saves: with the router
+    on, the tool-calling pass of the messages that need retrieval is skipped.
+
+    Args:
+        decisions_file: Path to the shadow mode decisions log.
+        should_rescore: Whether to decide again with the router in `router_file`.
+        router_file: Path of the router to rescore with.
+    """
+
+    decisions = load_rag_decisions(decisions_file)
+    if not decisions:
+        logger.warning(f"No decisions in {decisions_file}. Run in shadow mode to log some.")
+        return
+    if should_rescore:
+        rescore(decisions, RagRouter.load(router_file))
+
+    llm = np.array([decision["llm_retrieved"] for decision in decisions])
+    router = np.array([decision["router_retrieved"] for decision in decisions])
+    router_ms = np.array([decision["router_seconds"] for decision in decisions]) * 1000
+    decision_ms = np.array([decision["decision_seconds"] for decision in decisions]) * 1000
+
+    true_positives = (llm & router).sum()
+    logger.info(
+        f"{len(decisions)} messages, {llm.mean():.1%} retrieved by the model: "
+        f"router accuracy {(llm == router).mean():.1%}, "
+        f"precision {true_positives / max(router.sum(), 1):.1%}, "
+        f"recall {true_positives / max(llm.sum(), 1):.1%}"
+    )
+    logger.info(
+        f"Missed retrievals {(llm & ~router).sum()}, extra retrievals {(~llm & router).sum()}"
+    )
+    logger.info(
+        f"Router overhead: p50 {np.percentile(router_ms, 50):.1f} ms, "
+        f"p95 {np.percentile(router_ms, 95):.1f} ms"
+    )
+    if llm.any():
+        tool_call_ms = decision_ms[llm]
+        saved_ms = tool_call_ms.mean() - router_ms[llm].mean()
+        logger.info(
+            f"Tool-calling pass on the messages that retrieve: "
+            f"p50 {np.percentile(tool_call_ms, 50):.0f} ms, "
+            f"p95 {np.percentile(tool_call_ms, 95):.0f} ms; "
+            f"saved {saved_ms:.0f} ms per retrieving message, "
+            f"{llm.mean() * tool_call_ms.mean() - router_ms.mean():.0f} ms per message overall"
+        )
+
+
+if __name__ == "__main__":
+    main()
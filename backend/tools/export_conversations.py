@@ -0,0 +1,162 @@
+import asyncio
+import gzip
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import IO
+
+import click
+from loguru import logger
+
+from src.application.conversation_service.checkpointer import close_checkpointer
+from src.application.conversation_service.export_conversations import (
+    decode_cursor,
+    export_conversations,
+)
+
+
+def open_output(output: Path | None, append: bool) -> IO[str]:
+    """Open the output file, gzipped if its name ends with `.gz`, or stdout."""
+
+    if output is None:
+        return sys.stdout
+
+    mode = "at" if append else "wt"
+    if output.suffix == ".gz":
+        # Appending to a gzip file adds a member, which readers concatenate.
+        return gzip.open(output, mode, encoding="utf-8")
+
+    return output.open(mode, encoding="utf-8")
+
+
+def read_last_cursor(output: Path) -> str | None:
+    """Cursor of the last complete record of a previous export, read line by line.
+
+    A record cut off by an interrupted export is truncated away. A cut-off gzip
+    stream can't be appended to, so it is an error.
+    """
+
+    if output.suffix == ".gz":
+        cursor = None
+        try:
+            with gzip.open(output, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.endswith("\n"):
+                        cursor = json.loads(line)["cursor"]
+        except EOFError:
+            raise click.ClickException(
+                f"{output} is truncated. Export into a new file with --cursor {cursor}."
+            )
+        return cursor
+
+    cursor = None
+    end = 0
+    with output.open("rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            cursor = json.loads(line)["cursor"]
+            end += len(line)
+    with output.open("r+b") as f:
+        f.truncate(end)
+
+    return cursor
+
+
+async def export(
+    f: IO[str],
+    agent_id: str | None,
+    since: datetime | None,
+    until: datetime | None,
+    cursor: str | None,
+) -> tuple[int, str | None]:
+    num_records = 0
+    try:
+        async for record in export_conversations(
+            agent_id=agent_id, since=since, until=until, cursor=cursor
+        ):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            num_records += 1
+            cursor = record["cursor"]
+            if num_records % 1000 == 0:
+                logger.info(f"Exported {num_records} threads")
+    finally:
+        await close_checkpointer()
+
+    return num_records, cursor
+
+
+@click.command()
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="NDJSON file to write, gzipped if it ends with .gz. Defaults to stdout.",
+)
+@click.option("--agent-id", type=str, default=None, help="Only export the agent's threads.")
+@click.option(
+    "--since",
+    type=click.DateTime(),
+    default=None,
+    help="Only export threads last updated at or after this UTC time.",
+)
+@click.option(
+    "--until",
+    type=click.DateTime(),
+    default=None,
+    help="Only export threads last updated before this UTC time.",
+)
+@click.option(
+    "--cursor", type=str, default=None, help="Resume after the record with this cursor token."
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="Resume an interrupted export into --output after its last complete record.",
+)
+def main(
+    output: Path | None,
+    agent_id: str | None,
+    since: datetime | None,
+    until: datetime | None,
+    cursor: str | None,
+    resume: bool,
+) -> None:
+    """CLI command to export the latest message history of every thread as NDJSON.
+
+    Args:
+        output: File to write, or None for stdout.
+        agent_id: Agent whose threads are exported.
+        since: Only export threads last updated at or after this time.
+        until: Only export threads last updated before this time.
+        cursor: Cursor token of the last record of a previous export.
+        resume: Whether to resume the export already in `output`.
+    """
+
+    if resume:
+        if output is None or cursor is not None:
+            raise click.UsageError("--resume requires --output and no --cursor.")
+        if output.exists():
+            cursor = read_last_cursor(output)
+            logger.info(f"Resuming {output} after cursor {cursor}")
+
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--cursor")
+
+    f = open_output(output, append=resume)
+    try:
+        num_records, last_cursor = asyncio.run(export(f, agent_id, since, until, cursor))
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+    logger.info(f"Exported {num_records} threads, last cursor: {last_cursor}")
+
+
+if __name__ == "__main__":
+    main()
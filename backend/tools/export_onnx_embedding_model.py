@@ -0,0 +1,90 @@
+import json
+from pathlib import Path
+
+import click
+from loguru import logger
+
+from src.application.rag.onnx_embeddings import (
+    MODEL_FILE_NAME,
+    MODEL_INFO_FILE_NAME,
+    QUANTIZED_MODEL_FILE_NAME,
+)
+from src.config import settings
+
+
+@click.command()
+@click.option(
+    "--model-id",
+    type=str,
+    default=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
+    help="Hugging Face id of the sentence-transformers model to export.",
+)
+@click.option(
+    "--output-dir",
+    type=click.Path(path_type=Path),
+    default=settings.RAG_ONNX_MODEL_DIR,
+    help="Directory where the ONNX model and tokenizer are written.",
+)
+@click.option(
+    "--quantize/--no-quantize",
+    default=True,
+    help="Also write an int8 dynamically-quantized copy of the model.",
+)
+def main(model_id: str, output_dir: Path, quantize: bool) -> None:
+    """CLI command to export the embedding model to ONNX for the `onnx` embedding backend.
+
+    Exporting needs PyTorch and transformers; serving the exported model does not.
+
+    Args:
+        model_id: Hugging Face id of the sentence-transformers model to export.
+        output_dir: Directory where the ONNX model and tokenizer are written.
+        quantize: Also write an int8 dynamically-quantized copy of the model.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModel.from_pretrained(model_id)
+    model.eval()
+
+    # Writes tokenizer.json, which is loaded with the Rust `tokenizers` library at runtime.
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["An example sentence to trace the model."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    model_path = output_dir / MODEL_FILE_NAME
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            str(model_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+        )
+    logger.info(f"Exported {model_id} to {model_path}")
+
+    # Lets the backend refuse to serve a model other than the configured one.
+    model_info = {"model_id": model_id, "dimension": model.config.hidden_size}
+    (output_dir / MODEL_INFO_FILE_NAME).write_text(json.dumps(model_info, indent=2))
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_model_path = output_dir / QUANTIZED_MODEL_FILE_NAME
+        quantize_dynamic(
+            model_input=str(model_path),
+            model_output=str(quantized_model_path),
+            weight_type=QuantType.QInt8,
+        )
+        logger.info(f"Wrote int8-quantized model to {quantized_model_path}")
+
+
+if __name__ == "__main__":
+    main()
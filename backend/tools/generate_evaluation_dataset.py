@@ -0,0 +1,108 @@
+import asyncio
+from pathlib import Path
+
+import click
+from loguru import logger
+
+from src.application.evaluation import (
+    EvaluationDatasetGenerator,
+    get_generation_llm,
+    get_generation_requests_per_minute,
+    iter_extracted_chunks,
+    iter_memory_chunks,
+    merge_shards,
+)
+from src.config import settings
+from src.domain.adaptive_agent import AdaptiveAgentExtract
+
+
+@click.command()
+@click.option(
+    "--source",
+    type=click.Choice(["memory", "extraction"]),
+    default="memory",
+    show_default=True,
+    help="Read the chunks from the long-term memory, or extract them from the agents' sources.",
+)
+@click.option(
+    "--metadata-file",
+    type=click.Path(exists=True, path_type=Path),
+    default=settings.EXTRACTION_METADATA_FILE_PATH,
+    help="Path to the agents extraction metadata JSON file, for the extraction source.",
+)
+@click.option("--agent-id", "agent_ids", multiple=True, help="Only generate for these agents.")
+@click.option(
+    "--workers", type=int, default=settings.EVALUATION_GENERATION_WORKERS, show_default=True
+)
+@click.option(
+    "--requests-per-minute",
+    type=float,
+    default=None,
+    help="Maximum rate of the generation requests, when the LLM scheduler is disabled. "
+    "Defaults to EVALUATION_GENERATION_REQUESTS_PER_MINUTE.",
+)
+@click.option(
+    "--output-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=settings.EVALUATION_GENERATION_DIR,
+    show_default=True,
+    help="Directory of the JSONL shards. A run resumes from the conversations already in it.",
+)
+@click.option(
+    "--dataset-file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Also merge the shards into this evaluation dataset JSON file.",
+)
+def main(
+    source: str,
+    metadata_file: Path,
+    agent_ids: tuple[str, ...],
+    workers: int,
+    requests_per_minute: float | None,
+    output_dir: Path,
+    dataset_file: Path | None,
+) -> None:
+    """CLI command to generate evaluation conversations from the agents' documents.
+
+    Args:
+        source: Where the chunks come from, `memory` or `extraction`.
+        metadata_file: Path to the agents extraction metadata JSON file.
+        agent_ids: Agents to generate conversations for. All of them if empty.
+        workers: Number of generation requests in flight.
+        requests_per_minute: Maximum rate of generation requests. Only allowed when the
+            LLM scheduler is disabled, as the scheduler already paces and retries them.
+        output_dir: Directory of the JSONL shards.
+        dataset_file: Evaluation dataset file to merge the shards into.
+    """
+
+    if requests_per_minute is not None and settings.LLM_SCHEDULER_ENABLED:
+        raise click.UsageError(
+            "--requests-per-minute can't be used while the LLM scheduler paces the "
+            "requests. Set LLM_SCHEDULER_ENABLED=false to pace them here instead."
+        )
+
+    if source == "memory":
+        chunks = iter_memory_chunks(list(agent_ids) or None)
+    else:
+        agents = AdaptiveAgentExtract.from_json(metadata_file)
+        if agent_ids:
+            agents = [agent for agent in agents if agent.id in agent_ids]
+        chunks = iter_extracted_chunks(agents, settings.RAG_CHUNK_SIZE)
+
+    generator = EvaluationDatasetGenerator(
+        get_generation_llm(),
+        output_dir=output_dir,
+        workers=workers,
+        requests_per_minute=requests_per_minute or get_generation_requests_per_minute(),
+        shard_size=settings.EVALUATION_GENERATION_SHARD_SIZE,
+    )
+    asyncio.run(generator.generate(chunks))
+
+    if dataset_file is not None:
+        num_samples = merge_shards(output_dir, dataset_file)
+        logger.info(f"Wrote {num_samples} samples to {dataset_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import asyncio
+
+import click
+from loguru import logger
+
+from src.application.conversation_service.reset_conversation import (
+    reset_agent_conversations,
+    reset_conversation_state,
+    reset_conversations_with_prefix,
+    reset_specific_conversation,
+)
+
+
+@click.command()
+@click.option("--thread-id", type=str, default=None, help="Reset only this thread.")
+@click.option(
+    "--prefix", type=str, default=None, help="Reset every thread whose ID starts with this prefix."
+)
+@click.option(
+    "--agent-id",
+    type=str,
+    default=None,
+    help="Reset the agent's main thread and its `{agent_id}-{uuid}` threads.",
+)
+def main(thread_id: str | None, prefix: str | None, agent_id: str | None) -> None:
+    """CLI command to reset the stored conversation state.
+
+    Without options every conversation is reset.
+
+    Args:
+        thread_id: Thread to reset.
+        prefix: Thread ID prefix of the threads to reset.
+        agent_id: Agent whose threads are reset.
+    """
+
+    if sum(value is not None for value in (thread_id, prefix, agent_id)) > 1:
+        raise click.UsageError("Pass at most one of --thread-id, --prefix or --agent-id.")
+
+    if thread_id is not None:
+        result = asyncio.run(reset_specific_conversation(thread_id))
+    elif prefix is not None:
+        result = asyncio.run(reset_conversations_with_prefix(prefix))
+    elif agent_id is not None:
+        result = asyncio.run(reset_agent_conversations(agent_id))
+    else:
+        result = asyncio.run(reset_conversation_state())
+
+    if not result["success"]:
+        raise click.ClickException(result["message"])
+
+    logger.info(result["message"])
+    for collection_name, counts in result["details"].items():
+        logger.info(f"  {collection_name}: {counts['documents_deleted']} documents deleted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import asyncio
+from pathlib import Path
+
+import click
+
+from src.application.rag.embedding_server import EmbeddingServer
+from src.application.rag.embeddings import get_embedding_model
+from src.config import settings
+
+
+@click.command()
+@click.option(
+    "--socket-path",
+    type=click.Path(path_type=Path),
+    default=settings.RAG_EMBEDDING_SERVER_SOCKET_PATH,
+    help="Unix socket the embedding server listens on.",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(["local", "onnx"]),
+    default="local",
+    help="Embedding backend the server runs.",
+)
+@click.option(
+    "--max-batch-size",
+    type=int,
+    default=settings.RAG_EMBEDDING_SERVER_MAX_BATCH_SIZE,
+    help="Maximum number of texts embedded in a single batch.",
+)
+@click.option(
+    "--max-wait-ms",
+    type=float,
+    default=settings.RAG_EMBEDDING_SERVER_MAX_WAIT_MS,
+    help="Maximum time a request waits for a batch to fill up.",
+)
+def main(socket_path: Path, backend: str, max_batch_size: int, max_wait_ms: float) -> None:
+    """CLI command to run the node-local embedding server shared by all API workers.
+
+    Args:
+        socket_path: Unix socket the embedding server listens on.
+        backend: Embedding backend the server runs.
+        max_batch_size: Maximum number of texts embedded in a single batch.
+        max_wait_ms: Maximum time a request waits for a batch to fill up.
+    """
+    embedding_model = get_embedding_model(
+        model_name=settings.RAG_TEXT_EMBEDDING_MODEL_ID,
+        device=settings.RAG_DEVICE,
+        backend=backend,
+    )
+    server = EmbeddingServer(
+        embedding_model=embedding_model,
+        socket_path=socket_path,
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+    )
+
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
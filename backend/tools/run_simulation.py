@@ -0,0 +1,72 @@
+import asyncio
+
+import click
+
+from src.application.conversation_service.checkpointer import (
+    close_checkpointer,
+    get_checkpointer,
+)
+from src.application.conversation_service.workflow import create_workflow_graph
+from src.application.simulation import SimulationEngine, WorldEvent, get_npcs
+from src.config import settings
+
+
+async def run_simulation(
+    num_npcs: int | None, num_ticks: int | None, tick_seconds: float, events: tuple[str, ...]
+) -> None:
+    try:
+        async with get_checkpointer() as checkpointer:
+            graph = create_workflow_graph().compile(checkpointer=checkpointer)
+            engine = SimulationEngine.build_from_settings(graph, get_npcs(num_npcs))
+            for event in events:
+                engine.post_event(WorldEvent(description=event))
+
+            await engine.run(num_ticks, tick_seconds)
+    finally:
+        await close_checkpointer()
+
+
+@click.command()
+@click.option(
+    "--npcs",
+    "num_npcs",
+    type=int,
+    default=None,
+    help="Number of NPCs, cycling through the agents. One per agent by default.",
+)
+@click.option(
+    "--ticks",
+    "num_ticks",
+    type=int,
+    default=None,
+    help="Number of ticks to run. Runs until interrupted by default.",
+)
+@click.option(
+    "--tick-seconds", type=float, default=settings.SIMULATION_TICK_SECONDS, show_default=True
+)
+@click.option(
+    "--event",
+    "events",
+    multiple=True,
+    help="World event every NPC reacts to at the first tick. Can be passed multiple times.",
+)
+def main(
+    num_npcs: int | None, num_ticks: int | None, tick_seconds: float, events: tuple[str, ...]
+) -> None:
+    """CLI command to run the autonomous simulation of the town's NPCs.
+
+    NPC turns are persisted to the conversation checkpoints, on threads of
+    their own, and their LLM requests run as batch work, after the players'.
+
+    Args:
+        num_npcs: Number of NPCs.
+        num_ticks: Number of ticks to run.
+        tick_seconds: Minimum duration of a tick.
+        events: World events posted before the first tick.
+    """
+
+    asyncio.run(run_simulation(num_npcs, num_ticks, tick_seconds, events))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import asyncio
+
+import click
+from loguru import logger
+
+from src.application.conversation_service.mongo import shard_conversation_collections
+from src.config import settings
+
+
+@click.command()
+def main() -> None:
+    """CLI command to shard the conversation checkpoint collections on `thread_id`.
+
+    Run it once against the `mongos` router of a sharded cluster. Threads are
+    keyed by agent and player, so hashing them spreads player sessions evenly
+    over the shards.
+    """
+
+    asyncio.run(shard_conversation_collections())
+    logger.info(
+        f"Sharded {settings.MONGO_STATE_CHECKPOINT_COLLECTION} and "
+        f"{settings.MONGO_STATE_WRITES_COLLECTION} on a hash of thread_id."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+from pathlib import Path
+
+import click
+import numpy as np
+from loguru import logger
+
+from src.application.rag import get_embedding_model
+from src.application.rag.router import (
+    LogisticRegression,
+    RagRouter,
+    build_topic_centroids,
+    load_rag_decisions,
+)
+from src.config import settings
+from src.domain.agent_factory import AgentsFactory
+
+
+def tune_threshold(scores: np.ndarray, labels: np.ndarray, min_recall: float) -> float:
+    """
+    Most accurate threshold that still retrieves for `min_recall` of the
+    messages the conversation model retrieved for.
+    """
+    best_threshold, best_accuracy = 0.0, -1.0
+    for threshold in np.unique(scores):
+        predictions = scores >= threshold
+        recall = predictions[labels == 1].mean() if labels.any() else 1.0
+        accuracy = (predictions == labels).mean()
+        if recall >= min_recall and accuracy > best_accuracy:
+            best_threshold, best_accuracy = float(threshold), accuracy
+
+    return best_threshold
+
+
+def log_accuracy(name: str, predictions: np.ndarray, labels: np.ndarray) -> None:
+    true_positives = (predictions & (labels == 1)).sum()
+    precision = true_positives / max(predictions.sum(), 1)
+    recall = true_positives / max(labels.sum(), 1)
+    logger.info(
+        f"{name}: accuracy {(predictions == labels).mean():.1%}, "
+        f"precision {precision:.1%}, recall {recall:.1%} on {len(labels)} held-out messages"
+    )
+
+
+@click.command()
+@click.option("--agent-id", "agent_ids", multiple=True, help="Only build topics for these agents.")
+@click.option(
+    "--topics", type=int, default=settings.RAG_ROUTER_TOPICS_PER_AGENT, show_default=True
+)
+@click.option(
+    "--decisions-file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=settings.RAG_ROUTER_DECISIONS_PATH,
+    show_default=True,
+    help="Decisions logged in shadow mode, to tune the router on. Skipped if missing.",
+)
+@click.option(
+    "--classifier/--no-classifier",
+    default=False,
+    help="Score the messages with a logistic regression trained on the decisions.",
+)
+@click.option(
+    "--min-recall",
+    type=float,
+    default=0.95,
+    show_default=True,
+    help="Share of the model's retrievals the tuned router must keep.",
+)
+@click.option("--test-fraction", type=float, default=0.2, show_default=True)
+@click.option("--min-decisions", type=int, default=50, show_default=True)
+@click.option("--seed", type=int, default=42, show_default=True)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=settings.RAG_ROUTER_PATH,
+    show_default=True,
+)
+def main(
+    agent_ids: tuple[str, ...],
+    topics: int,
+    decisions_file: Path,
+    classifier: bool,
+    min_recall: float,
+    test_fraction: float,
+    min_decisions: int,
+    seed: int,
+    output: Path,
+) -> None:
+    """CLI command to train the local RAG router.
+
+    Clusters each agent's chunks in the long-term memory into topic centroids.
+    With enough decisions logged in shadow mode, the retrieval threshold is
+    tuned on them, optionally with a classifier, and the router's accuracy
+    against the conversation model is reported on held-out messages.
+
+    Args:
+        agent_ids: Agents to build topics for. All of them if empty.
+        topics: Maximum number of topic centroids per agent.
+        decisions_file: Path to the shadow mode decisions log.
+        classifier: Whether to train a logistic regression on the decisions.
+        min_recall: Share of the model's retrievals the router must keep.
+        test_fraction: Share of the decisions held out for the accuracy report.
+        min_decisions: Decisions needed to tune the router.
+        seed: Seed of the topics and of the train/test split.
+        output: Path of the trained router.
+    """
+
+    centroids = build_topic_centroids(list(agent_ids) or AgentsFactory.get_available_agents(), topics)
+    logger.info(f"Built {sum(len(c) for c in centroids.values())} topics for {len(centroids)} agents")
+    router = RagRouter(centroids, threshold=settings.RAG_ROUTER_THRESHOLD)
+
+    decisions = load_rag_decisions(decisions_file) if decisions_file.exists() else []
+    decisions = [decision for decision in decisions if decision["agent_id"] in centroids]
+    labels = np.array([decision["llm_retrieved"] for decision in decisions], dtype=int)
+    if len(decisions) < min_decisions or len(set(labels)) < 2:
+        logger.warning(
+            f"Only {len(decisions)} usable decisions in {decisions_file}: keeping the default "
+            f"threshold {router.threshold}. Run in shadow mode to log more."
+        )
+        router.save(output)
+        logger.info(f"Saved the RAG router to {output}")
+        return
+
+    embedding_model = get_embedding_model(
+        model_name=settings.RAG_TEXT_EMBEDDING_MODEL_ID, device=settings.RAG_DEVICE
+    )
+    vectors = np.asarray(
+        embedding_model.embed_documents([decision["query"] for decision in decisions]),
+        dtype=np.float32,
+    )
+    agents = [decision["agent_id"] for decision in decisions]
+
+    order = np.random.default_rng(seed).permutation(len(decisions))
+    num_test = max(1, int(len(decisions) * test_fraction))
+    test, train = order[:num_test], order[num_test:]
+
+    similarities = np.array(
+        [router.get_topic_similarity(agent, vector) for agent, vector in zip(agents, vectors)]
+    )
+    router.threshold = tune_threshold(similarities[train], labels[train], min_recall)
+    log_accuracy(
+        f"Topic centroids (threshold {router.threshold:.3f})",
+        similarities[test] >= router.threshold,
+        labels[test],
+    )
+
+    if classifier:
+        features = np.stack(
+            [router.get_features(agent, vector) for agent, vector in zip(agents, vectors)]
+        )
+        router.classifier = LogisticRegression.fit(features[train], labels[train])
+        probabilities = router.classifier.predict_proba(features)
+        router.threshold = tune_threshold(probabilities[train], labels[train], min_recall)
+        log_accuracy(
+            f"Classifier (threshold {router.threshold:.3f})",
+            probabilities[test] >= router.threshold,
+            labels[test],
+        )
+
+    router.save(output)
+    logger.info(f"Saved the RAG router to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,8 @@ public class WebSocketChatClient : MonoBehaviour
     [SerializeField] private bool autoConnect = true;
     [SerializeField] private float reconnectDelay = 5f;
     [SerializeField] private bool enableDetailedLogging = true;
+    [Tooltip("Identifies this player's conversations on the server. Left empty, a persistent random id is used.")]
+    [SerializeField] private string playerId = "";
     [SerializeField]
     private string[] alternativeUrls = {
         "ws://127.0.0.1:8000/ws/chat",
@@ -52,6 +54,17 @@ public class WebSocketChatClient : MonoBehaviour
 
     void Start()
     {
+        if (string.IsNullOrEmpty(playerId))
+        {
+            playerId = PlayerPrefs.GetString("PlayerId", "");
+            if (string.IsNullOrEmpty(playerId))
+            {
+                playerId = Guid.NewGuid().ToString();
+                PlayerPrefs.SetString("PlayerId", playerId);
+                PlayerPrefs.Save();
+            }
+        }
+
         if (autoConnect)
         {
             StartCoroutine(ConnectToServer());
@@ -359,7 +372,7 @@ public class WebSocketChatClient : MonoBehaviour
             currentAgentId = agentId;
 
             // Create JSON message
-            string jsonMessage = $"{{\"message\": \"{EscapeJsonString(message)}\", \"agent_id\": \"{EscapeJsonString(agentId)}\"}}";
+            string jsonMessage = $"{{\"message\": \"{EscapeJsonString(message)}\", \"agent_id\": \"{EscapeJsonString(agentId)}\", \"player_id\": \"{EscapeJsonString(playerId)}\"}}";
 
             Debug.Log($"📤 Sending: {jsonMessage}");
 